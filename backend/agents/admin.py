@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Company, CompanyRawData
+from .models import Company, CompanyRawData, ResearchBatch, ResearchJob
 
 admin.site.register(Company)
-admin.site.register(CompanyRawData)
\ No newline at end of file
+admin.site.register(CompanyRawData, raw_id_fields=['blob'])  # A <select> would decompress every blob
+admin.site.register(ResearchJob)
+admin.site.register(ResearchBatch)
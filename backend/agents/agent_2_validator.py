@@ -1,28 +1,178 @@
 import os
+import re
 import json
-from openai import AzureOpenAI
+import time
+import asyncio
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
+from .context_packer import pack_context, count_tokens
+from . import metrics
+from .llm_limits import create_completion, acreate_completion
 
 load_dotenv()
 
 client = AzureOpenAI(
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2024-02-15-preview"
+    api_version="2024-02-15-preview",
+    max_retries=0  # Retries (429 / Retry-After) are handled by llm_limits
 )
 
-def validate_and_extract(company_name, user_requirement, raw_text_list):
+# Same deployment, for the ASGI pipeline (no thread held while waiting on Azure)
+async_client = AsyncAzureOpenAI(
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+    api_version="2024-02-15-preview",
+    max_retries=0  # Retries (429 / Retry-After) are handled by llm_limits
+)
+
+# ==============================================================================
+# ⏩ STREAMING: forward the answer's text fields while Azure is still writing them
+# ==============================================================================
+AGENT2_STREAMING = os.getenv("AGENT2_STREAMING", "True") == "True"       # Off -> one blocking call, as before
+STREAM_FIELDS = ("summary", "Key_Answer", "Details")                     # JSON string fields sent as `partial` events
+STREAM_FLUSH_INTERVAL = float(os.getenv("AGENT2_STREAM_FLUSH_INTERVAL", "0.2"))  # Min seconds between events per field
+COMPETITORS_RE = re.compile(r'"Competitors"\s*:\s*(\[[^\]]*\])')
+HEX_RE = re.compile(r'[0-9a-fA-F]*')
+
+class _PartialJsonFields:
     """
-    Agent 2 (Azure): Context-Aware Validator + Knowledge Fallback.
+    Incremental reader for the string values of STREAM_FIELDS in a JSON document that
+    arrives in arbitrary chunks. feed() returns the newly decoded text per field; escape
+    sequences split across chunks are held back until complete.
     """
-    yield {"type": "log", "message": f"Agent 2: Verifying data specifically for '{company_name}'..."}
-    
-    combined_text = ""
-    for idx, text in enumerate(raw_text_list):
-        combined_text += f"\n--- SOURCE {idx+1} ---\n{text[:5000]}" 
-    
-    combined_text = combined_text[:30000]
+    def __init__(self, fields=STREAM_FIELDS):
+        self._key_re = re.compile(r'"(%s)"\s*:\s*"' % "|".join(re.escape(f) for f in fields))
+        self._buf = ""
+        self._pos = 0
+        self._field = None  # Field whose string value we are inside, if any
+
+    def feed(self, chunk):
+        self._buf += chunk
+        out = {}
+        while True:
+            if self._field is None:
+                match = self._key_re.search(self._buf, self._pos)
+                if not match:
+                    # Keep enough tail to match a key split across chunks
+                    self._pos = max(self._pos, len(self._buf) - 40)
+                    return out
+                self._field, self._pos = match.group(1), match.end()
+
+            text, closed = self._read_string()
+            if text:
+                out[self._field] = out.get(self._field, "") + text
+            if not closed:
+                return out
+            self._field = None
+
+    def _read_string(self):
+        buf, i, parts = self._buf, self._pos, []
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self._pos = i + 1
+                return "".join(parts), True
+            if ch != "\\":
+                parts.append(ch)
+                i += 1
+                continue
+            # Escape sequence: \n, \", \uXXXX (surrogate pairs need both halves)
+            if i + 1 >= len(buf):
+                break
+            size = _escape_size(buf, i)
+            if size is None:
+                break
+            try:
+                parts.append(json.loads(f'"{buf[i:i + size]}"'))
+            except ValueError:
+                parts.append(buf[i:i + size])
+            i += size
+        self._pos = i
+        return "".join(parts), False
+
+def _escape_size(buf, i):
+    """
+    Length of the escape at buf[i] (\\n, \\uXXXX, or a surrogate pair), None while it is still incomplete.
+    A malformed \\u (e.g. \\u00zz) is 2 long, so it is passed through as written and what follows is read on.
+    """
+    if buf[i + 1] != "u":
+        return 2
+    code = buf[i + 2:i + 6]
+    if not HEX_RE.fullmatch(code):
+        return 2
+    if len(code) < 4:
+        return None
+    if not 0xD800 <= int(code, 16) <= 0xDBFF:
+        return 6
+    # High surrogate: takes the low half with it when one follows
+    low = buf[i + 6:i + 12]
+    if not "\\u".startswith(low[:2]) or not HEX_RE.fullmatch(low[2:]):
+        return 6
+    return 12 if len(low) == 6 else None
+
+class _PartialEvents:
+    """
+    Turns streamed content into coalesced `partial` events (at most one per field per flush
+    interval), plus one internal `competitors` event as soon as that list is complete.
+    """
+    def __init__(self):
+        self.content = ""
+        self._fields = _PartialJsonFields()
+        self._pending = {}
+        self._last_flush = 0.0  # First text goes out immediately
+        self._competitors_seen = False
+
+    def feed(self, delta):
+        self.content += delta
+        for field, text in self._fields.feed(delta).items():
+            self._pending[field] = self._pending.get(field, "") + text
+
+        events = self._competitors_event()
+        if self._pending and time.monotonic() - self._last_flush >= STREAM_FLUSH_INTERVAL:
+            events += self.flush()
+        return events
+
+    def _competitors_event(self):
+        # Lets the coordinator start competitor research before the answer is finished
+        if self._competitors_seen:
+            return []
+        match = COMPETITORS_RE.search(self.content)
+        if not match:
+            return []
+        self._competitors_seen = True
+        try:
+            names = [n.strip() for n in json.loads(match.group(1)) if isinstance(n, str) and n.strip()]
+        except ValueError:
+            return []
+        return [{"type": "competitors", "names": names}] if names else []
+
+    def flush(self):
+        events = [
+            {"type": "partial", "agent": "agent_2", "field": field, "delta": text}
+            for field, text in self._pending.items()
+        ]
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        return events
+
+def _token_counts(counts, messages, content, usage=None):
+    # Streamed answers carry no usage block on this API version, so those are estimated
+    if usage is not None:
+        counts["prompt_tokens"] = usage.prompt_tokens
+        counts["completion_tokens"] = usage.completion_tokens
+        return
+    counts["prompt_tokens"] = sum(count_tokens(m["content"]) for m in messages)
+    counts["completion_tokens"] = count_tokens(content)
 
+def _chunk_text(chunk):
+    # Azure sends a first chunk with no choices (content filter results)
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+def _build_messages(company_name, user_requirement, combined_text):
+    # combined_text: pack_context() output, the passages most relevant to the question
     # 🟢 OPTIMIZED PROMPT: ALLOWS INTERNAL KNOWLEDGE FALLBACK
     prompt = f"""
     You are a Senior Market Strategy Consultant.
@@ -40,6 +190,7 @@ def validate_and_extract(company_name, user_requirement, raw_text_list):
     3. **FILTER**: Ignore data belonging to other companies (e.g. ignore 'Adam Mosseri' if asking about Google).
     4. **COMPETITORS**: List 3-5 major competitors.
     5. **SUMMARY**: Write a professional executive summary about {company_name}.
+    6. **PROFILE**: Fill "company_profile" from the Scraped Web Data only. Use null for anything the data does not state.
     
     OUTPUT JSON FORMAT:
     {{
@@ -50,30 +201,113 @@ def validate_and_extract(company_name, user_requirement, raw_text_list):
             "Competitors": ["Comp1", "Comp2"],
             "Details": "Additional context..."
         }},
+        "company_profile": {{
+            "cin": "21-character Corporate Identification Number or null",
+            "incorporation_date": "YYYY-MM-DD or null",
+            "legal_status": "Active / Strike Off / ... or null",
+            "estimated_revenue": "e.g. INR 500 Cr (FY24) or null",
+            "employee_count": 1200,
+            "tech_stack": ["Tech1", "Tech2"],
+            "official_website": "https://... or null"
+        }},
         "confidence_score": "High/Medium/Low"
     }}
     """
+    return [
+        {"role": "system", "content": "You are a helpful market analyst. Output valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _chat_kwargs(company_name, user_requirement, combined_text):
+    return dict(
+        model=os.getenv("AZURE_DEPLOYMENT_NAME"),
+        messages=_build_messages(company_name, user_requirement, combined_text),
+        temperature=0.3, # Slightly higher temperature to allow knowledge retrieval
+        response_format={"type": "json_object"}
+    )
+
+def _packing_event(stats):
+    return {"type": "log", "message": (
+        f"Agent 2: Using {stats['kept']}/{stats['passages']} passages from {stats['sources']} sources "
+        f"(~{stats['tokens']} tokens)."
+    )}
+
+def _result_events(company_name, result):
+    if result.get("answer_found"):
+        yield {"type": "log", "message": f"✅ Agent 2: Validated info for {company_name}."}
+    else:
+        yield {"type": "log", "message": f"⚠️ Agent 2: Limited data found for {company_name}."}
+
+    yield {"type": "result", "payload": result}
+
+def _error_events(e):
+    yield {"type": "log", "message": f"Validation Error: {e}"}
+    yield {"type": "result", "payload": {"answer_found": False, "error": str(e)}}
+
+def validate_and_extract(company_name, user_requirement, raw_text_list):
+    """
+    Agent 2 (Azure): Context-Aware Validator + Knowledge Fallback.
+    """
+    yield {"type": "log", "message": f"Agent 2: Verifying data specifically for '{company_name}'..."}
 
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("AZURE_DEPLOYMENT_NAME"),
-            messages=[
-                {"role": "system", "content": "You are a helpful market analyst. Output valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3, # Slightly higher temperature to allow knowledge retrieval
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        
-        if result.get("answer_found"):
-            yield {"type": "log", "message": f"✅ Agent 2: Validated info for {company_name}."}
-        else:
-            yield {"type": "log", "message": f"⚠️ Agent 2: Limited data found for {company_name}."}
-            
-        yield {"type": "result", "payload": result}
+        with metrics.span("agent_2.pack_context"):
+            combined_text, stats = pack_context(company_name, user_requirement, raw_text_list)
+        yield _packing_event(stats)
 
+        kwargs = _chat_kwargs(company_name, user_requirement, combined_text)
+        with metrics.span("agent_2.llm") as llm:  # create_completion waits for quota, then takes an llm slot
+            if AGENT2_STREAMING:
+                # Same request, streamed: `partial` events carry the text fields as they are written
+                stream = _PartialEvents()
+                for chunk in create_completion(client, **kwargs, stream=True):
+                    yield from stream.feed(_chunk_text(chunk))
+                yield from stream.flush()
+                content = stream.content
+                _token_counts(llm, kwargs["messages"], content)
+            else:
+                response = create_completion(client, **kwargs)
+                content = response.choices[0].message.content
+                _token_counts(llm, kwargs["messages"], content, response.usage)
+        result = json.loads(content)
     except Exception as e:
-        yield {"type": "log", "message": f"Validation Error: {e}"}
-        yield {"type": "result", "payload": {"answer_found": False, "error": str(e)}}
+        yield from _error_events(e)
+        return
+
+    yield from _result_events(company_name, result)
+
+async def avalidate_and_extract(company_name, user_requirement, raw_text_list):
+    """
+    Agent 2, async: same prompt and events as validate_and_extract, on the async Azure client.
+    """
+    yield {"type": "log", "message": f"Agent 2: Verifying data specifically for '{company_name}'..."}
+
+    try:
+        # Tokenizing and ranking is CPU work; keep it off the event loop
+        with metrics.span("agent_2.pack_context"):
+            combined_text, stats = await asyncio.to_thread(pack_context, company_name, user_requirement, raw_text_list)
+        yield _packing_event(stats)
+
+        kwargs = _chat_kwargs(company_name, user_requirement, combined_text)
+        with metrics.span("agent_2.llm") as llm:
+            if AGENT2_STREAMING:
+                stream = _PartialEvents()
+                async with await acreate_completion(async_client, **kwargs, stream=True) as completion:
+                    async for chunk in completion:
+                        for event in stream.feed(_chunk_text(chunk)):
+                            yield event
+                for event in stream.flush():
+                    yield event
+                content = stream.content
+                await asyncio.to_thread(_token_counts, llm, kwargs["messages"], content)
+            else:
+                response = await acreate_completion(async_client, **kwargs)
+                content = response.choices[0].message.content
+                _token_counts(llm, kwargs["messages"], content, response.usage)
+        result = json.loads(content)
+        events = _result_events(company_name, result)
+    except Exception as e:
+        events = _error_events(e)
+
+    for event in events:
+        yield event
@@ -1,22 +1,25 @@
 import os
 import json
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from dotenv import load_dotenv
+from .llm_limits import create_completion, acreate_completion
+from . import metrics
 
 load_dotenv()
 client = AzureOpenAI(
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2024-02-15-preview"
+    api_version="2024-02-15-preview",
+    max_retries=0  # Retries (429 / Retry-After) are handled by llm_limits
+)
+async_client = AsyncAzureOpenAI(
+    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+    api_version="2024-02-15-preview",
+    max_retries=0  # Retries (429 / Retry-After) are handled by llm_limits
 )
 
-def compare_companies(primary_company, primary_data, competitor_data_list):
-    """
-    Agent 3: Competitive Comparison.
-    Dynamically builds the table structure to ensure ALL competitors are included.
-    """
-    print(f"Agent 3: Comparing {primary_company} against {len(competitor_data_list)} competitors...")
-
+def _chat_kwargs(primary_company, primary_data, competitor_data_list):
     # 1. Prepare Data Context
     competitor_context = ""
     competitor_names = []
@@ -62,17 +65,49 @@ def compare_companies(primary_company, primary_data, competitor_data_list):
         "market_position_summary": "A 2-sentence summary comparing these companies."
     }}
     """
+    return dict(
+        model=os.getenv("AZURE_DEPLOYMENT_NAME"),
+        messages=[
+            {"role": "system", "content": "You are a helpful API that outputs only JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0,
+        response_format={"type": "json_object"}
+    )
+
+def _usage_counts(counts, response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        counts["prompt_tokens"] = usage.prompt_tokens
+        counts["completion_tokens"] = usage.completion_tokens
+
+def compare_companies(primary_company, primary_data, competitor_data_list):
+    """
+    Agent 3: Competitive Comparison.
+    Dynamically builds the table structure to ensure ALL competitors are included.
+    """
+    print(f"Agent 3: Comparing {primary_company} against {len(competitor_data_list)} competitors...")
+
+    try:
+        with metrics.span("agent_3.llm") as llm:
+            response = create_completion(client, **_chat_kwargs(primary_company, primary_data, competitor_data_list))
+            _usage_counts(llm, response)
+        return json.loads(response.choices[0].message.content)
+
+    except Exception as e:
+        print(f"Agent 3 Error: {e}")
+        return {"error": str(e)}
+
+async def acompare_companies(primary_company, primary_data, competitor_data_list):
+    """
+    Agent 3, async: same prompt and output as compare_companies, on the async Azure client.
+    """
+    print(f"Agent 3: Comparing {primary_company} against {len(competitor_data_list)} competitors...")
 
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("AZURE_DEPLOYMENT_NAME"),
-            messages=[
-                {"role": "system", "content": "You are a helpful API that outputs only JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
+        with metrics.span("agent_3.llm") as llm:
+            response = await acreate_completion(async_client, **_chat_kwargs(primary_company, primary_data, competitor_data_list))
+            _usage_counts(llm, response)
         return json.loads(response.choices[0].message.content)
 
     except Exception as e:
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class AgentsConfig(AppConfig):
     name = 'agents'
+
+    def ready(self):
+        from .fields import register_sqlite_functions
+        connection_created.connect(register_sqlite_functions, dispatch_uid='agents_sqlite_functions')
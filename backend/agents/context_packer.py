@@ -0,0 +1,175 @@
+import os
+import re
+import time
+import threading
+import numpy as np
+
+# ==============================================================================
+# 🎯 CONTEXT PACKING: best-matching passages for Agent 2, within a token budget
+# ==============================================================================
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT2_CONTEXT_TOKENS", "6000"))    # Tokens of scraped text per prompt
+CHUNK_WORDS = int(os.getenv("AGENT2_CHUNK_WORDS", "120"))                 # Target passage size
+TOKENIZER_ENCODING = os.getenv("AGENT2_TOKENIZER", "o200k_base")          # tiktoken encoding of the deployment
+NEAR_DUPLICATE_JACCARD = 0.8                                              # Passages this similar to a kept one are dropped
+TOKENIZER_RETRY_MIN = 5                                                   # First wait before retrying a failed tokenizer load (s)
+TOKENIZER_RETRY_MAX = 300                                                 # Waits double up to this
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "the", "to", "was", "were", "what", "when", "where", "which", "who",
+    "with", "how", "many", "much", "does", "do", "their", "this", "that", "about",
+}
+
+_encoder = None
+_encoder_retry_at = 0.0   # While the tokenizer is unavailable: when to try loading it again
+_encoder_backoff = 0.0
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """
+    tiktoken encoder, loaded once. None while tiktoken or its encoding file is unavailable;
+    a failed load is retried with a growing backoff, so a transient download error does not
+    leave the process on the length estimate for good.
+    """
+    global _encoder, _encoder_retry_at, _encoder_backoff
+    with _encoder_lock:
+        if _encoder is None and time.monotonic() >= _encoder_retry_at:
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                _encoder_backoff = 0.0
+            except Exception as e:
+                _encoder_backoff = min(max(_encoder_backoff * 2, TOKENIZER_RETRY_MIN), TOKENIZER_RETRY_MAX)
+                _encoder_retry_at = time.monotonic() + _encoder_backoff
+                print(f"DEBUG: Tokenizer unavailable ({e}); estimating tokens from length, retrying in {_encoder_backoff:g}s")
+        return _encoder
+
+
+def count_tokens(text):
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def _terms(text):
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def split_passages(text, chunk_words=CHUNK_WORDS):
+    """
+    Paragraph-aware chunks of roughly `chunk_words` words: short paragraphs are merged,
+    long ones are cut on sentence boundaries.
+    """
+    passages, current, size = [], [], 0
+    for para in re.split(r"\n\s*\n|\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        pieces = [para] if len(para.split()) <= chunk_words else re.split(r"(?<=[.!?])\s+", para)
+        for piece in pieces:
+            words = len(piece.split())
+            if current and size + words > chunk_words:
+                passages.append(" ".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += words
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def bm25_scores(query_terms, passage_terms):
+    """BM25 of every passage against the query, computed over a (passages x query terms) matrix."""
+    vocab = sorted(set(query_terms))
+    if not vocab or not passage_terms:
+        return np.zeros(len(passage_terms))
+    index = {term: i for i, term in enumerate(vocab)}
+
+    tf = np.zeros((len(passage_terms), len(vocab)), dtype=np.float32)
+    for row, terms in enumerate(passage_terms):
+        for term in terms:
+            col = index.get(term)
+            if col is not None:
+                tf[row, col] += 1
+
+    lengths = np.array([len(terms) for terms in passage_terms], dtype=np.float32)
+    avg_len = max(lengths.mean(), 1.0)
+    df = (tf > 0).sum(axis=0)
+    n = len(passage_terms)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len)
+    weights = tf * (BM25_K1 + 1) / (tf + norm[:, None])
+    return weights @ idf
+
+
+def _shingles(terms, size=3):
+    if len(terms) < size:
+        return {" ".join(terms)}
+    return {" ".join(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def _is_near_duplicate(shingles, kept):
+    for other in kept:
+        union = len(shingles | other)
+        if union and len(shingles & other) / union >= NEAR_DUPLICATE_JACCARD:
+            return True
+    return False
+
+
+def pack_context(company_name, user_requirement, raw_text_list, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Returns (context, stats). Sources are split into passages, ranked with BM25 against
+    the requirements, and the best ones are kept until `token_budget` is spent
+    (near-duplicates skipped). Kept passages stay under their SOURCE header, in page order.
+    """
+    passages = []  # (source_idx, position, text)
+    for source_idx, text in enumerate(raw_text_list):
+        for position, passage in enumerate(split_passages(text or "")):
+            passages.append((source_idx, position, passage))
+
+    passage_terms = [_terms(p[2]) for p in passages]
+    # Company name terms appear everywhere; BM25's idf keeps them from dominating
+    scores = bm25_scores(_terms(f"{user_requirement} {company_name}"), passage_terms)
+
+    # Highest score first; ties (e.g. no match at all) fall back to source order, as before
+    order = sorted(range(len(passages)), key=lambda i: (-scores[i], passages[i][0], passages[i][1]))
+
+    kept, kept_shingles, used, duplicates = [], [], 0, 0
+    for i in order:
+        if not passage_terms[i]:
+            continue
+        shingles = _shingles(passage_terms[i])
+        if _is_near_duplicate(shingles, kept_shingles):
+            duplicates += 1
+            continue
+        tokens = count_tokens(passages[i][2])
+        if used + tokens > token_budget:
+            continue
+        kept.append(i)
+        kept_shingles.append(shingles)
+        used += tokens
+
+    by_source = {}
+    for i in sorted(kept, key=lambda i: (passages[i][0], passages[i][1])):
+        by_source.setdefault(passages[i][0], []).append(passages[i][2])
+
+    context = "".join(
+        f"\n--- SOURCE {source_idx+1} ---\n" + "\n".join(texts) for source_idx, texts in by_source.items()
+    )
+
+    stats = {
+        "passages": len(passages),
+        "kept": len(kept),
+        "duplicates": duplicates,
+        "sources": len(by_source),
+        "tokens": used,
+        "budget": token_budget,
+    }
+    return context, stats
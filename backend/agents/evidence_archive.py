@@ -0,0 +1,215 @@
+import io
+import os
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+import zstandard
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import CompanyRawData, EvidenceBlob
+from .search.evidence_index import unindex_evidence, repair_fts_index
+
+# ==============================================================================
+# 🗄️ EVIDENCE ARCHIVE: old CompanyRawData moved out to monthly zstd JSONL files
+# ==============================================================================
+# Layout: <EVIDENCE_ARCHIVE_DIR>/<YYYY-MM>/evidence-<run>.jsonl.zst, one directory per month of
+# the row's timestamp, one file per month per run. Every batch is its own zstd frame, written and
+# fsynced before its rows are deleted, so a crash loses nothing: at worst the rows of the last
+# batch are archived twice (same `id`), or a torn final frame is skipped by the reader.
+ARCHIVE_DIR = os.getenv("EVIDENCE_ARCHIVE_DIR") or os.path.join(settings.BASE_DIR, "evidence_archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("EVIDENCE_ARCHIVE_AFTER_DAYS", "180"))   # Rows older than this leave the hot table
+ARCHIVE_BATCH_SIZE = int(os.getenv("EVIDENCE_ARCHIVE_BATCH_SIZE", "500"))   # Rows read, written and deleted together
+ARCHIVE_ZSTD_LEVEL = 12                                                      # Written once, read rarely: favour ratio
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    'id', 'company_id', 'company__name', 'user_prompt', 'source_domain', 'source_url',
+    'found_cin', 'content_hash', 'blob_id', 'blob__text', 'timestamp',
+)
+
+
+def _record(row):
+    return {
+        "id": row['id'],
+        "company_id": row['company_id'],
+        "company": row['company__name'],
+        "user_prompt": row['user_prompt'],
+        "source_domain": row['source_domain'],
+        "source_url": row['source_url'],
+        "found_cin": row['found_cin'],
+        "content_hash": row['content_hash'],
+        "raw_text": row['blob__text'] or "",
+        "timestamp": row['timestamp'].isoformat(),
+    }
+
+
+class _MonthFile:
+    """Append-only archive file of one month for this run; each write_batch() adds one zstd frame."""
+
+    def __init__(self, directory, month, run):
+        os.makedirs(os.path.join(directory, month), exist_ok=True)
+        self.path = os.path.join(directory, month, f"evidence-{run}.jsonl.zst")
+        self.fh = open(self.path, "ab")
+        self.compressor = zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL)
+
+    def write_batch(self, records):
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        self.fh.write(self.compressor.compress(data))
+        self.fh.flush()
+        os.fsync(self.fh.fileno())  # On disk before the rows are deleted
+
+    def close(self):
+        self.fh.close()
+
+
+def _delete_batch(ids, blob_ids):
+    # Index, rows, then blobs: taking a row out of the SQLite FTS index needs its old text.
+    # PROTECT keeps a blob another row still points at; a concurrent store_evidence()
+    # reusing one of these blobs fails its insert and keeps its evidence out of the locker.
+    with transaction.atomic():
+        unindex_evidence(ids)
+        CompanyRawData.objects.filter(id__in=ids).delete()
+        EvidenceBlob.objects.filter(id__in=blob_ids, rows__isnull=True).delete()
+
+
+def archive_evidence(older_than_days=ARCHIVE_AFTER_DAYS, directory=ARCHIVE_DIR,
+                     batch_size=ARCHIVE_BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Moves CompanyRawData older than `older_than_days` into the archive, `batch_size` rows at a time
+    (keyset over id, so memory stays at one batch). `dry_run` only counts. `progress`, if given,
+    is called with a one-line summary after every batch (the command passes its stdout.write).
+    Returns {"rows", "cutoff", "blobs_before", "blobs_after", "files"}.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    run = timezone.now().strftime("%Y%m%dT%H%M%S")
+    files = {}
+    moved = 0
+    blobs_before = EvidenceBlob.objects.count()
+    last_id = 0
+
+    try:
+        while True:
+            batch = list(
+                CompanyRawData.objects.filter(id__gt=last_id, timestamp__lt=cutoff)
+                .order_by('id').values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+
+            by_month = {}
+            for row in batch:
+                by_month.setdefault(row['timestamp'].strftime("%Y-%m"), []).append(_record(row))
+            if not dry_run:
+                for month, records in by_month.items():
+                    if month not in files:
+                        files[month] = _MonthFile(directory, month, run)
+                    files[month].write_batch(records)
+                _delete_batch([row['id'] for row in batch], {row['blob_id'] for row in batch if row['blob_id']})
+            moved += len(batch)
+            if progress:
+                progress(f"{'Would archive' if dry_run else 'Archived'} {moved} evidence rows "
+                         f"(up to id {last_id}, {', '.join(sorted(by_month))})")
+    finally:
+        for f in files.values():
+            f.close()
+
+    return {
+        "rows": moved,
+        "cutoff": cutoff.isoformat(),
+        "blobs_before": blobs_before,
+        "blobs_after": EvidenceBlob.objects.count(),
+        "files": sorted(f.path for f in files.values()),
+    }
+
+
+def compact(vacuum=False):
+    """
+    Gives the space of archived rows back. SQLite: rebuilds the FTS5 index if rows were deleted
+    around it, merges its segments (and VACUUMs the file if asked: that rewrites the database
+    under an exclusive lock). Postgres: VACUUM ANALYZE, so the
+    freed pages are reused by new evidence instead of growing the tables.
+    """
+    vendor = connection.vendor
+    repair_fts_index()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'agents_evidence_fts'")
+            if cursor.fetchone():
+                cursor.execute("INSERT INTO agents_evidence_fts(agents_evidence_fts) VALUES ('optimize')")
+            if vacuum:
+                cursor.execute("VACUUM")
+        elif vendor == 'postgresql':
+            cursor.execute("VACUUM (ANALYZE) agents_companyrawdata, agents_evidenceblob")
+
+
+# ------------------------------------------------------------------------------
+# Reading the archive back
+# ------------------------------------------------------------------------------
+def _iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        # Records are stored in UTC; compare like with like, as strings
+        value = (timezone.make_aware(value) if timezone.is_naive(value) else value).astimezone(dt_timezone.utc)
+    return value.isoformat()
+
+
+def _read_file(path):
+    with open(path, "rb") as fh:
+        reader = zstandard.ZstdDecompressor().stream_reader(fh, read_across_frames=True)
+        try:
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                yield json.loads(line)
+        except (zstandard.ZstdError, json.JSONDecodeError, UnicodeDecodeError) as e:
+            # A run that died mid-write; the rows of that batch were never deleted (see the header)
+            logger.warning("Archive %s: torn final batch skipped (%s)", path, e)
+
+
+def iter_archive(company=None, domain=None, since=None, until=None, contains=None, directory=ARCHIVE_DIR):
+    """
+    Lazily yields archived evidence records (dicts, oldest month first), one file open and one
+    zstd frame decompressed at a time. `since` (inclusive) / `until` (exclusive) take
+    'YYYY-MM[-DD...]', a date or a datetime, and also pick which month directories are opened at all; `contains` is a case-insensitive
+    substring of raw_text. A crash during archiving can leave a row in two files with the same id.
+    """
+    if not os.path.isdir(directory):
+        return
+    since, until = _iso(since), _iso(until)
+    first, last = since and since[:7], until and until[:7]  # 'YYYY-MM' month directories
+    needle = contains.lower() if contains else None
+
+    for month in sorted(os.listdir(directory)):
+        if (first and month < first) or (last and month > last):
+            continue
+        month_dir = os.path.join(directory, month)
+        for name in sorted(os.listdir(month_dir)):
+            if not name.endswith(".jsonl.zst"):
+                continue
+            for record in _read_file(os.path.join(month_dir, name)):
+                if company and record["company"] != company:
+                    continue
+                if domain and record["source_domain"] != domain:
+                    continue
+                if (since and record["timestamp"] < since) or (until and record["timestamp"] >= until):
+                    continue
+                if needle and needle not in record["raw_text"].lower():
+                    continue
+                yield record
+
+
+def archive_stats(directory=ARCHIVE_DIR):
+    """{month: {"files", "bytes"}} of what is on disk, without decompressing anything."""
+    stats = {}
+    if not os.path.isdir(directory):
+        return stats
+    for month in sorted(os.listdir(directory)):
+        month_dir = os.path.join(directory, month)
+        names = [n for n in os.listdir(month_dir) if n.endswith(".jsonl.zst")]
+        stats[month] = {
+            "files": len(names),
+            "bytes": sum(os.path.getsize(os.path.join(month_dir, n)) for n in names),
+        }
+    return stats
@@ -0,0 +1,247 @@
+import os
+import time
+import atexit
+import signal
+import asyncio
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import trafilatura
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+# ==============================================================================
+# 🏭 EXTRACTION POOL: trafilatura runs in worker processes, off the request threads
+# ==============================================================================
+# Parsing HTML (and PDF filings) is pure CPU and holds the GIL, so done inline it stalls SSE
+# flushing and socket I/O for every other stream in the worker. Each page is its own pool task,
+# so results come back (and Agent 1 accepts them) in the order they finish.
+# This module is also what the pool processes import, so it must not pull in Django.
+EXTRACT_WORKERS = int(os.getenv("ROC_EXTRACT_WORKERS", "2"))               # Processes per web worker; 0 = extract in-thread
+EXTRACT_CPU_SECONDS = float(os.getenv("ROC_EXTRACT_CPU_SECONDS", "5"))     # CPU time allowed per document
+EXTRACT_CPU_GRACE = 10                                                     # Seconds past the budget before the hard kill
+EXTRACT_MAX_TASKS = int(os.getenv("ROC_EXTRACT_MAX_TASKS", "200"))         # Recycle a process after N pages (lxml fragmentation)
+PARENT_CHECK_INTERVAL = 2                                                  # Seconds between a worker's "is my web worker alive" checks
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_stats = {"submitted": 0, "completed": 0, "cpu_limited": 0, "timeouts": 0, "crashed": 0, "pool_restarts": 0, "inline": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def extract_stats():
+    """Snapshot of this process's extraction counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class ExtractionError(Exception):
+    """The page went over its CPU/time budget or took its pool process down; nothing was extracted."""
+
+
+# ------------------------------------------------------------------------------
+# Worker side
+# ------------------------------------------------------------------------------
+class _CpuLimitExceeded(BaseException):
+    # BaseException so trafilatura's own `except Exception` fallbacks can't swallow it
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _watch_parent(parent_pid):
+    """
+    Pool processes are children of the forkserver, not of the web worker, and each holds both
+    ends of its task queue: if the web worker dies without shutting the pool down, they would
+    wait on that queue forever (keeping the forkserver alive with them). Exit along with it.
+    """
+    while True:
+        time.sleep(PARENT_CHECK_INTERVAL)
+        try:
+            os.kill(parent_pid, 0)
+        except ProcessLookupError:
+            os._exit(0)
+        except PermissionError:
+            pass  # Still there, under another user (can't happen for our own parent, but harmless)
+
+
+def _init_worker(parent_pid):
+    signal.signal(signal.SIGPROF, _on_cpu_limit)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the parent; it shuts the pool down
+    threading.Thread(target=_watch_parent, args=(parent_pid,), name="parent-watch", daemon=True).start()
+
+
+def _set_cpu_backstop(cpu_seconds):
+    """
+    SIGPROF is only handled between Python bytecodes, and a single lxml parse of a large
+    page can run for seconds in C. If a page is still going EXTRACT_CPU_GRACE seconds past
+    its budget, RLIMIT_CPU kills the process outright; the parent sees a broken pool and
+    starts a new one (failing the other pages in flight on it, hence the generous grace).
+    """
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds + EXTRACT_CPU_GRACE) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _run_in_worker(fn, args, cpu_seconds):
+    """Returns (fn(*args), hit_cpu_limit)."""
+    _set_cpu_backstop(cpu_seconds)
+    signal.setitimer(signal.ITIMER_PROF, cpu_seconds)
+    try:
+        return fn(*args), False
+    except _CpuLimitExceeded:
+        return None, True
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+# ------------------------------------------------------------------------------
+# Parent side
+# ------------------------------------------------------------------------------
+def _mp_context():
+    # Never fork: the web worker has live threads, DB connections and sockets.
+    # forkserver preloads trafilatura once, so each new pool process starts in milliseconds.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=_mp_context(),
+                initializer=_init_worker,
+                initargs=(os.getpid(),),
+                max_tasks_per_child=EXTRACT_MAX_TASKS or None,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    """A pool process died (CPU backstop, OOM): every task on it has failed, so start a fresh pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return  # Another thread already replaced it
+        _pool = None
+        _count("pool_restarts")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_pool():
+    """On interpreter exit: stop the pool (its processes exit, then the forkserver with them)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(fn, args):
+    pool = _get_pool()
+    try:
+        future = pool.submit(_run_in_worker, fn, args, EXTRACT_CPU_SECONDS)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        pool = _get_pool()
+        future = pool.submit(_run_in_worker, fn, args, EXTRACT_CPU_SECONDS)
+    _count("submitted")
+    return pool, future
+
+
+def _result(pool, future):
+    try:
+        result, cpu_limited = future.result(timeout=0)
+    except BrokenProcessPool:
+        print("DEBUG: Extraction process died; restarting the pool")
+        _count("crashed")
+        _discard_pool(pool)
+        raise ExtractionError("extraction process died")
+    if cpu_limited:
+        print(f"DEBUG: Extraction hit the {EXTRACT_CPU_SECONDS}s CPU limit")
+        _count("cpu_limited")
+        raise ExtractionError(f"over the {EXTRACT_CPU_SECONDS}s CPU limit")
+    _count("completed")
+    return result
+
+
+def _call(fn, args, timeout):
+    if EXTRACT_WORKERS <= 0:
+        _count("inline")
+        return fn(*args)
+
+    pool, future = _submit(fn, args)
+    done, _ = concurrent.futures.wait([future], timeout=timeout)
+    if not done:
+        future.cancel()  # Still queued -> never runs; already running -> bounded by the CPU limit
+        _count("timeouts")
+        raise ExtractionError(f"not done after {timeout:.1f}s")
+    return _result(pool, future)
+
+
+async def _acall(fn, args, timeout):
+    if EXTRACT_WORKERS <= 0:
+        _count("inline")
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout)
+
+    pool, future = _submit(fn, args)
+    try:
+        # On timeout or task cancellation, cancelling the wrapper cancels the pool future too
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        _count("timeouts")
+        raise ExtractionError(f"not done after {timeout:.1f}s")
+    except BrokenProcessPool:
+        pass  # Counted and handled by _result
+    return _result(pool, future)
+
+
+def extract(html, timeout=None):
+    """
+    trafilatura.extract(html) on the process pool; blocks this thread (without the GIL) until done.
+    `html` is the raw response bytes (trafilatura detects the encoding).
+    Raises ExtractionError if the page is over its CPU budget, the pool process died or `timeout` passed.
+    """
+    return _call(trafilatura.extract, (html,), timeout)
+
+
+async def aextract(html, timeout=None):
+    """extract() for the ASGI pipeline: awaits the pool result without holding a thread."""
+    return await _acall(trafilatura.extract, (html,), timeout)
+
+
+def parse_pdf(path, source_url=None, timeout=None):
+    """
+    roc_parser.parse_filing on the process pool -> RocFiling. Only the path crosses the process
+    boundary; the worker opens the file itself. Same budget and errors as extract().
+    """
+    from .sources.roc import roc_parser
+    return _call(roc_parser.parse_filing, (path, source_url), timeout)
+
+
+async def aparse_pdf(path, source_url=None, timeout=None):
+    from .sources.roc import roc_parser
+    return await _acall(roc_parser.parse_filing, (path, source_url), timeout)
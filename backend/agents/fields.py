@@ -0,0 +1,84 @@
+import os
+import zlib
+import threading
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # Writes fall back to zlib; zstd blobs already stored then can't be read
+
+# ==============================================================================
+# 🗜️ COMPRESSED TEXT: str in Python, a zstd frame in a binary column
+# ==============================================================================
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", "9"))  # ~15 KB pages: level 9 still compresses in well under a ms
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"  # Every zstd frame starts with this; anything else is zlib
+SQLITE_FUNCTION = "evidence_text"  # SQL name of decompress_text on SQLite connections (FTS5 view + triggers)
+
+_local = threading.local()  # zstd (de)compressor objects must not be shared between threads
+
+
+def _compressor():
+    if not hasattr(_local, "compressor"):
+        _local.compressor = zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL)
+    return _local.compressor
+
+
+def _decompressor():
+    if not hasattr(_local, "decompressor"):
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return _local.decompressor
+
+
+def compress_text(text):
+    data = text.encode("utf-8")
+    if zstandard is None:
+        return zlib.compress(data, 9)
+    return _compressor().compress(data)
+
+
+def decompress_text(data):
+    data = bytes(data)  # Postgres hands back a memoryview
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("This blob is zstd-compressed; install `zstandard` to read it")
+        return _decompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+
+class CompressedTextField(models.BinaryField):
+    """A text field stored compressed: assign and read str, the column holds the compressed bytes."""
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else decompress_text(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress_text(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, str):
+            value = compress_text(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        # dumpdata / loaddata carry the text itself, not base64 of the compressed bytes
+        return self.value_from_object(obj)
+
+
+# The agents_evidence_text view of migration 0012 calls evidence_text(), which only exists on
+# connections Django opened (apps.py connects this handler). The app keeps the FTS5 index itself
+# (agents/search/evidence_index), so a raw sqlite3 connection (the sqlite3 shell, a backup script)
+# can write to every table; only reading the view, snippet() or an FTS5 'rebuild' fails there with
+# "no such function: evidence_text". Register it first, e.g. conn.create_function("evidence_text", 1, decompress_text).
+def register_sqlite_functions(sender, connection, **kwargs):
+    """connection_created handler: the evidence search view decompresses inside SQLite."""
+    if connection.vendor != "sqlite":
+        return
+
+    def evidence_text(data):
+        return None if data is None else decompress_text(data)
+
+    connection.connection.create_function(SQLITE_FUNCTION, 1, evidence_text, deterministic=True)
@@ -0,0 +1,139 @@
+import re
+import hashlib
+from datetime import date
+from urllib.parse import urlsplit
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from .models import Company
+
+# ==============================================================================
+# 🏅 GOLDEN RECORD: Agent 2's validated answer mapped onto the Company row
+# ==============================================================================
+# Only values that parse cleanly are written, and an empty answer never wipes a stored one.
+# Company.field_updated_at records, per field, when a run last confirmed it.
+CIN_RE = re.compile(r"^[LU]\d{5}[A-Z]{2}\d{4}[A-Z]{3}\d{6}$")
+NUMBER_RE = re.compile(r"\d[\d,]*")
+
+# What the list/detail endpoints return, in order
+COMPANY_FIELDS = (
+    "id", "name", "cin", "domain", "description", "incorporation_date", "legal_status",
+    "estimated_revenue", "employee_count", "tech_stack", "logo_url", "field_updated_at",
+    "created_at", "last_updated",
+)
+
+
+def _text(value, max_length=None):
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        return None
+    value = str(value).strip()
+    if not value or value.lower() in ("null", "none", "n/a", "unknown", "not found"):
+        return None
+    return value[:max_length] if max_length else value
+
+
+def _cin(value):
+    value = (_text(value) or "").upper().replace(" ", "")
+    return value if CIN_RE.match(value) else None
+
+
+def _date(value):
+    try:
+        parsed = date.fromisoformat((_text(value) or "")[:10])
+    except ValueError:
+        return None
+    return parsed if parsed <= date.today() else None
+
+
+def _employees(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if value > 0 else None
+    match = NUMBER_RE.search(_text(value) or "")
+    if not match:
+        return None
+    count = int(match.group().replace(",", ""))
+    return count if count > 0 else None
+
+
+def _tech_stack(value):
+    if not isinstance(value, list):
+        return None
+    stack = [t for t in (_text(v, 100) for v in value) if t]
+    return stack or None
+
+
+def _website(value):
+    # Stored as the site's origin; the search hit may point at a deep page
+    parts = urlsplit(_text(value, 500) or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc.lower()}/"
+
+
+def profile_updates(final_insight, official_domain=None):
+    """Agent 2 payload -> {Company field: clean value}, leaving out everything it didn't establish."""
+    if not final_insight or final_insight.get("error") or not final_insight.get("answer_found"):
+        return {}
+    profile = final_insight.get("company_profile") or {}
+    if not isinstance(profile, dict):
+        profile = {}
+
+    updates = {
+        "cin": _cin(profile.get("cin")),
+        "incorporation_date": _date(profile.get("incorporation_date")),
+        "legal_status": _text(profile.get("legal_status"), 50),
+        "estimated_revenue": _text(profile.get("estimated_revenue"), 100),
+        "employee_count": _employees(profile.get("employee_count")),
+        "tech_stack": _tech_stack(profile.get("tech_stack")),
+        # The homepage Agent 1 picked from search beats the model's recollection
+        "domain": _website(official_domain) or _website(profile.get("official_website")),
+        "description": _text(final_insight.get("summary")),
+    }
+    return {field: value for field, value in updates.items() if value is not None}
+
+
+def update_golden_record(company_name, final_insight, official_domain=None):
+    """Writes profile_updates() onto the Company row. Returns the fields that changed value."""
+    updates = profile_updates(final_insight, official_domain)
+    if not updates:
+        return []
+
+    with transaction.atomic():
+        company, _ = Company.objects.select_for_update().get_or_create(name=company_name)
+        # cin is unique: a CIN already held by another record is more likely a mix-up than a move
+        if "cin" in updates and Company.objects.filter(cin=updates["cin"]).exclude(pk=company.pk).exists():
+            print(f"DEBUG: CIN {updates['cin']} already belongs to another company, not assigned to {company_name}")
+            del updates["cin"]
+
+        now = timezone.now().isoformat()
+        changed = [field for field, value in updates.items() if getattr(company, field) != value]
+        for field, value in updates.items():
+            setattr(company, field, value)
+        company.field_updated_at = {**(company.field_updated_at or {}), **dict.fromkeys(updates, now)}
+        company.save(update_fields=[*updates, "field_updated_at", "last_updated"])
+    return changed
+
+
+def save_golden_record(company_name, final_insight, official_domain=None):
+    """update_golden_record() for the pipeline: never raises, returns the log events to send."""
+    try:
+        changed = update_golden_record(company_name, final_insight, official_domain)
+    except Exception as e:
+        print(f"DEBUG: Golden record update failed: {e}")
+        return []
+    if not changed:
+        return []
+    return [{'type': 'log', 'message': f"Company record updated: {', '.join(changed)}."}]
+
+
+# ------------------------------------------------------------------------------
+# Read path (GET /api/companies/)
+# ------------------------------------------------------------------------------
+def company_etag(*parts):
+    return '"' + hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:32] + '"'
+
+
+def list_state(queryset):
+    """(count, newest last_updated) of a queryset: one aggregate over the last_updated index."""
+    state = queryset.aggregate(n=Count("id"), newest=Max("last_updated"))
+    return state["n"], state["newest"]
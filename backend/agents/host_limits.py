@@ -0,0 +1,150 @@
+import os
+import time
+import random
+import asyncio
+import tempfile
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: the limits are per process there
+    fcntl = None
+
+# ==============================================================================
+# 🚧 HOST LIMITS: searches, page fetches and LLM calls in flight across every process on the host
+# ==============================================================================
+# A limit of N is N lock files; a slot is an flock held on one of them. Every gunicorn worker and
+# research_worker process draws from the same N (the per-process pools and semaphores still apply
+# inside each process), and a process that dies drops its locks with it, so a crash never leaks
+# a slot. Same scope as the shared token bucket in llm_limits.
+HOST_LIMITS_DIR = os.getenv("HOST_LIMITS_DIR") or os.path.join(tempfile.gettempdir(), "marketlens_limits")
+HOST_SEARCH_LIMIT = int(os.getenv("HOST_SEARCH_LIMIT", "4"))   # DDGS queries in flight on the host (0 = no limit)
+HOST_FETCH_LIMIT = int(os.getenv("HOST_FETCH_LIMIT", "16"))    # Page downloads in flight on the host (0 = no limit)
+HOST_LLM_LIMIT = int(os.getenv("HOST_LLM_LIMIT", "8"))         # Azure OpenAI calls in flight on the host (0 = no limit)
+POLL_MIN = 0.01                                                # First wait between tries for a busy limit (s)
+POLL_MAX = 0.25                                                # Waits double up to this
+
+_UNLIMITED = object()
+_LOCAL = object()
+
+
+class HostSemaphore:
+    """
+    acquire()/aacquire() return a token for release(), or None when no slot freed up within
+    `timeout`. Taking a slot never blocks: a busy limit is polled with a short backoff, so the
+    async side is safe to call on the event loop.
+    """
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._local = threading.BoundedSemaphore(limit) if limit and fcntl is None else None
+        self._stats = {"acquired": 0, "waited": 0, "timeouts": 0, "in_use": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def stats(self):
+        with self._stats_lock:
+            return {"limit": self.limit, **self._stats}
+
+    def _try(self):
+        """A held slot, or None when all of them are taken."""
+        if not self.limit:
+            return _UNLIMITED
+        if self._local is not None:
+            return _LOCAL if self._local.acquire(blocking=False) else None
+        os.makedirs(HOST_LIMITS_DIR, exist_ok=True)
+        start = random.randrange(self.limit)  # Spread callers over the files
+        for k in range(self.limit):
+            path = os.path.join(HOST_LIMITS_DIR, f"{self.name}.{(start + k) % self.limit}.lock")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def _got(self, token, waited):
+        if token is None:
+            self._count("timeouts")
+            return None
+        with self._stats_lock:
+            self._stats["acquired"] += 1
+            self._stats["waited"] += waited
+            self._stats["in_use"] += 1
+        return token
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = POLL_MIN
+        token = self._try()
+        waited = token is None
+        while token is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            time.sleep(delay if remaining is None else min(delay, remaining))
+            delay = min(delay * 2, POLL_MAX)
+            token = self._try()
+        return self._got(token, waited)
+
+    async def aacquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = POLL_MIN
+        token = self._try()
+        waited = token is None
+        while token is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            await asyncio.sleep(delay if remaining is None else min(delay, remaining))
+            delay = min(delay * 2, POLL_MAX)
+            token = self._try()
+        return self._got(token, waited)
+
+    def release(self, token):
+        if token is None or token is _UNLIMITED:
+            return
+        self._count("in_use", -1)
+        if token is _LOCAL:
+            self._local.release()
+        else:
+            os.close(token)  # Closing the descriptor drops its flock
+
+    def _timeout(self, timeout):
+        return TimeoutError(f"No free {self.name} slot on this host within {timeout:g}s.")
+
+    @contextlib.contextmanager
+    def slot(self, timeout=None):
+        token = self.acquire(timeout)
+        if token is None:
+            raise self._timeout(timeout)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, timeout=None):
+        token = await self.aacquire(timeout)
+        if token is None:
+            raise self._timeout(timeout)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+
+searches = HostSemaphore("search", HOST_SEARCH_LIMIT)
+fetches = HostSemaphore("fetch", HOST_FETCH_LIMIT)
+llm_calls = HostSemaphore("llm", HOST_LLM_LIMIT)
+
+
+def host_limit_stats():
+    """This process's view of each host-wide limit: slots it holds now, and how often it had to wait."""
+    return {s.name: s.stats() for s in (searches, fetches, llm_calls)}
@@ -0,0 +1,379 @@
+import os
+import time
+import socket
+import asyncio
+import weakref
+import ipaddress
+import threading
+import concurrent.futures
+from urllib.parse import urlsplit
+import httpcore
+import httpx
+
+# ==============================================================================
+# 🌐 HTTP CLIENT: one pooled client per process for all outbound web traffic
+# ==============================================================================
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))        # TCP + TLS handshake
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))             # Default per-request read timeout
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))             # Idle connections kept for reuse
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", str(5 * 1024 * 1024)))  # Bodies are cut here
+HTTP_SNIFF_BYTES = 16 * 1024                                                # Body prefix handed to a `sniff` check
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "True") == "True"                # Needs the `h2` package
+DNS_CACHE_TTL = int(os.getenv("DNS_CACHE_TTL", "300"))
+DNS_RESOLVER_THREADS = 8                                                    # Blocking getaddrinfo calls in flight
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+}
+
+try:
+    import h2  # noqa: F401
+    _HTTP2 = HTTP2_ENABLED
+except ImportError:
+    _HTTP2 = False
+
+
+class FetchResponse:
+    """
+    The parts of a response callers use; `content` is at most max_bytes long.
+    `skipped` is the reason an accept/sniff check gave for not reading the body (content is then empty).
+    """
+
+    def __init__(self, url, status_code, headers, content, truncated, http_version, skipped=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+        self.http_version = http_version
+        self.skipped = skipped
+
+
+class _BodyReader:
+    """
+    Collects a streamed body into one buffer (or writes it to `sink`, a binary file), stopping at
+    max_bytes so memory stays bounded whatever the server sends. Runs `sniff` once on the first
+    HTTP_SNIFF_BYTES.
+    """
+
+    def __init__(self, max_bytes, sniff, sink=None):
+        self.max_bytes = max_bytes
+        self.sniff = sniff
+        self.sink = sink
+        self.buffer = bytearray()
+        self.size = 0
+        self.received = 0
+        self.truncated = False
+        self.skipped = None
+
+    def feed(self, chunk):
+        """Returns False once reading should stop."""
+        self.received += len(chunk)
+        chunk = chunk[:self.max_bytes - self.size]
+        self.size += len(chunk)
+        if self.sink:
+            self.sink.write(chunk)
+            if self.sniff:  # Only the sniff window is kept in memory
+                self.buffer += chunk[:HTTP_SNIFF_BYTES - len(self.buffer)]
+        else:
+            self.buffer += chunk
+
+        if self.sniff and self.size >= min(HTTP_SNIFF_BYTES, self.max_bytes):
+            self.skipped, self.sniff = self.sniff(bytes(self.buffer[:HTTP_SNIFF_BYTES])), None
+            if self.skipped:
+                return False
+        if self.size >= self.max_bytes:
+            self.truncated = True
+            return False
+        return True
+
+    def finish(self):
+        if self.sniff and self.buffer:  # Body shorter than the sniff window
+            self.skipped = self.sniff(bytes(self.buffer))
+        if self.skipped or self.sink:
+            return b""
+        return bytes(self.buffer)
+
+
+class Divert:
+    """
+    What an `accept` check returns (instead of a skip reason) to have the body written to `sink`,
+    a binary file, under its own max_bytes and sniff rather than the caller's.
+    """
+
+    def __init__(self, sink, max_bytes, sniff=None):
+        self.sink = sink
+        self.max_bytes = max_bytes
+        self.sniff = sniff
+
+
+def _accepted(reader, accept, response):
+    """Runs `accept` on the headers; returns the reader for the body (a new one if it was diverted)."""
+    verdict = accept(response.status_code, response.headers) if accept else None
+    if isinstance(verdict, Divert):
+        return _BodyReader(verdict.max_bytes, verdict.sniff, verdict.sink)
+    reader.skipped = verdict
+    return reader
+
+
+# ------------------------------------------------------------------------------
+# Per-host stats
+# ------------------------------------------------------------------------------
+_host_stats = {}
+_host_stats_lock = threading.Lock()
+
+
+def _record(host, started, error=False, nbytes=0):
+    elapsed = time.monotonic() - started
+    with _host_stats_lock:
+        stats = _host_stats.setdefault(host, {
+            "requests": 0, "errors": 0, "bytes": 0, "total_seconds": 0.0, "max_seconds": 0.0
+        })
+        stats["requests"] += 1
+        stats["errors"] += int(error)
+        stats["bytes"] += nbytes
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+def host_stats():
+    """Snapshot of request count, errors, bytes and latency per host for this process."""
+    with _host_stats_lock:
+        return {
+            host: {**stats, "avg_seconds": stats["total_seconds"] / stats["requests"] if stats["requests"] else 0.0}
+            for host, stats in _host_stats.items()
+        }
+
+
+# ------------------------------------------------------------------------------
+# DNS cache: resolved addresses are reused for DNS_CACHE_TTL seconds
+# ------------------------------------------------------------------------------
+_dns_cache = {}  # (host, port) -> (address, expires_at)
+_dns_lock = threading.Lock()
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _cached_address(host, port):
+    with _dns_lock:
+        entry = _dns_cache.get((host, port))
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+    return None
+
+
+def _remember_address(host, port, infos):
+    if not infos:
+        return None
+    address = infos[0][4][0]
+    with _dns_lock:
+        _dns_cache[(host, port)] = (address, time.monotonic() + DNS_CACHE_TTL)
+    return address
+
+
+def _forget_address(host, port):
+    with _dns_lock:
+        _dns_cache.pop((host, port), None)
+
+
+_resolver = concurrent.futures.ThreadPoolExecutor(max_workers=DNS_RESOLVER_THREADS, thread_name_prefix="dns")
+
+
+def _remaining(deadline):
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+
+def _lookup_timeout(host, timeout):
+    return httpcore.ConnectTimeout(f"DNS lookup for {host} took longer than {timeout:g}s")
+
+
+class _DnsCachingBackend:
+    """
+    Wraps httpcore's network backend: connects to the cached address of a host.
+    TLS still verifies and sends SNI for the original hostname (httpcore passes it separately).
+    A lookup counts against the connect timeout, like the handshake that follows it.
+    """
+
+    def __init__(self, inner):
+        self._inner = inner
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if _is_ip(host):
+            return self._inner.connect_tcp(host, port, timeout, local_address, socket_options)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        address = _cached_address(host, port)
+        if address is None:
+            # getaddrinfo has no timeout of its own: wait for it on the resolver pool instead
+            lookup = _resolver.submit(socket.getaddrinfo, host, port, type=socket.SOCK_STREAM)
+            try:
+                infos = lookup.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                raise _lookup_timeout(host, timeout) from None
+            except socket.gaierror as e:
+                raise httpcore.ConnectError(str(e)) from e
+            address = _remember_address(host, port, infos)
+        try:
+            return self._inner.connect_tcp(address or host, port, _remaining(deadline), local_address, socket_options)
+        except Exception:
+            # The cached address may be stale; let the next attempt resolve again
+            _forget_address(host, port)
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class _AsyncDnsCachingBackend(_DnsCachingBackend):
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if _is_ip(host):
+            return await self._inner.connect_tcp(host, port, timeout, local_address, socket_options)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        address = _cached_address(host, port)
+        if address is None:
+            lookup = asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            try:
+                infos = await asyncio.wait_for(lookup, timeout)
+            except TimeoutError:
+                raise _lookup_timeout(host, timeout) from None
+            except socket.gaierror as e:
+                raise httpcore.ConnectError(str(e)) from e
+            address = _remember_address(host, port, infos)
+        try:
+            return await self._inner.connect_tcp(address or host, port, _remaining(deadline), local_address, socket_options)
+        except Exception:
+            _forget_address(host, port)
+            raise
+
+
+def _install_dns_cache(transport, backend_cls):
+    """
+    httpx has no public hook for httpcore's network_backend, so this reaches into the transport's
+    pool. httpx and httpcore are pinned in requirements.txt, and HttpClientDnsTests fails if
+    an upgrade moves the attribute; at runtime a moved attribute only costs the cache.
+    """
+    pool = getattr(transport, "_pool", None)
+    if pool is not None and hasattr(pool, "_network_backend"):
+        pool._network_backend = backend_cls(pool._network_backend)
+    else:
+        print(f"DEBUG: httpx {httpx.__version__} transport has no network backend to wrap; DNS cache off")
+    return transport
+
+
+# ------------------------------------------------------------------------------
+# Clients
+# ------------------------------------------------------------------------------
+def _limits():
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout(read=None):
+    read = HTTP_READ_TIMEOUT if read is None else read
+    return httpx.Timeout(connect=min(HTTP_CONNECT_TIMEOUT, read), read=read, write=read, pool=read)
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+
+def get_client():
+    """The process-wide sync client (thread-safe, shared by the fetch pool threads)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            transport = _install_dns_cache(httpx.HTTPTransport(http2=_HTTP2, limits=_limits()), _DnsCachingBackend)
+            _client = httpx.Client(
+                transport=transport, headers=DEFAULT_HEADERS, timeout=_timeout(), follow_redirects=True
+            )
+        return _client
+
+
+def get_async_client():
+    """The async client for the running event loop (httpx async clients can't cross loops)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        transport = _install_dns_cache(
+            httpx.AsyncHTTPTransport(http2=_HTTP2, limits=_limits()), _AsyncDnsCachingBackend
+        )
+        _async_clients[loop] = httpx.AsyncClient(
+            transport=transport, headers=DEFAULT_HEADERS, timeout=_timeout(), follow_redirects=True
+        )
+    return _async_clients[loop]
+
+
+def get(url, headers=None, timeout=None, max_bytes=HTTP_MAX_RESPONSE_BYTES, accept=None, sniff=None, sink=None):
+    """
+    GET through the shared pool. The body is read up to `max_bytes`; the rest is never downloaded.
+    accept(status_code, headers) runs before any of the body is read and sniff(first_bytes) on its
+    first HTTP_SNIFF_BYTES; either can return a reason string to stop there (see FetchResponse.skipped),
+    and accept can return a Divert to send this body elsewhere under other limits.
+    With `sink` (a binary file), the body is written there instead and `content` is empty.
+    """
+    host = urlsplit(url).hostname or ""
+    started = time.monotonic()
+    reader = _BodyReader(max_bytes, sniff, sink)
+    try:
+        with get_client().stream("GET", url, headers=headers, timeout=_timeout(timeout)) as response:
+            reader = _accepted(reader, accept, response)
+            if not reader.skipped:
+                for chunk in response.iter_bytes():
+                    if not reader.feed(chunk):
+                        break
+            content = reader.finish()
+    except Exception:
+        _record(host, started, error=True)
+        raise
+
+    _record(host, started, error=response.status_code >= 400, nbytes=reader.received)
+    return FetchResponse(
+        str(response.url), response.status_code, response.headers, content,
+        reader.truncated, response.http_version, reader.skipped,
+    )
+
+
+async def aget(url, headers=None, timeout=None, max_bytes=HTTP_MAX_RESPONSE_BYTES, accept=None, sniff=None, sink=None):
+    """Async twin of get() on the running loop's client."""
+    host = urlsplit(url).hostname or ""
+    started = time.monotonic()
+    reader = _BodyReader(max_bytes, sniff, sink)
+    try:
+        async with get_async_client().stream("GET", url, headers=headers, timeout=_timeout(timeout)) as response:
+            reader = _accepted(reader, accept, response)
+            if not reader.skipped:
+                async for chunk in response.aiter_bytes():
+                    if not reader.feed(chunk):
+                        break
+            content = reader.finish()
+    except Exception:
+        _record(host, started, error=True)
+        raise
+
+    _record(host, started, error=response.status_code >= 400, nbytes=reader.received)
+    return FetchResponse(
+        str(response.url), response.status_code, response.headers, content,
+        reader.truncated, response.http_version, reader.skipped,
+    )
+
+
+def head(url, timeout=None, follow_redirects=False):
+    host = urlsplit(url).hostname or ""
+    started = time.monotonic()
+    try:
+        response = get_client().head(url, timeout=_timeout(timeout), follow_redirects=follow_redirects)
+    except Exception:
+        _record(host, started, error=True)
+        raise
+    _record(host, started, error=response.status_code >= 400)
+    return response
@@ -0,0 +1,494 @@
+import os
+import json
+import time
+import random
+import asyncio
+import weakref
+import tempfile
+import threading
+import contextlib
+import openai
+from . import host_limits
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: the bucket is per process there
+    fcntl = None
+
+# ==============================================================================
+# 🚦 LLM LIMITS: Azure OpenAI calls in flight, per process and (host_limits.llm_calls) per host
+# ==============================================================================
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+_async_slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+
+def _async_slot():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_slots:
+        _async_slots[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _async_slots[loop]
+
+
+def _take_slot():
+    """One of this process's LLM_MAX_CONCURRENCY slots, then one of the host's. Returns their release()."""
+    _slots.acquire()
+    token = host_limits.llm_calls.acquire(timeout=AZURE_MAX_QUEUE_WAIT)
+    if token is None:
+        _slots.release()
+        raise TimeoutError("No free LLM slot on this host within AZURE_MAX_QUEUE_WAIT.")
+
+    def release():
+        host_limits.llm_calls.release(token)
+        _slots.release()
+    return release
+
+
+async def _atake_slot():
+    slot = _async_slot()
+    await slot.acquire()
+    try:
+        token = await host_limits.llm_calls.aacquire(timeout=AZURE_MAX_QUEUE_WAIT)
+    except BaseException:
+        slot.release()
+        raise
+    if token is None:
+        slot.release()
+        raise TimeoutError("No free LLM slot on this host within AZURE_MAX_QUEUE_WAIT.")
+
+    def release():
+        host_limits.llm_calls.release(token)
+        slot.release()
+    return release
+
+
+@contextlib.contextmanager
+def llm_slot():
+    """Hold an LLM slot (process and host) for a call made without create_completion()."""
+    release = _take_slot()
+    try:
+        yield
+    finally:
+        release()
+
+
+@contextlib.asynccontextmanager
+async def allm_slot():
+    release = await _atake_slot()
+    try:
+        yield
+    finally:
+        release()
+
+
+# ==============================================================================
+# 🪣 RATE LIMITER: token bucket on the deployment's TPM/RPM quota, shared by all workers on the host
+# ==============================================================================
+AZURE_TPM_LIMIT = int(os.getenv("AZURE_TPM_LIMIT", "120000"))       # Deployment tokens per minute (0 = no limit)
+AZURE_RPM_LIMIT = int(os.getenv("AZURE_RPM_LIMIT", "720"))          # Deployment requests per minute (0 = no limit)
+AZURE_EXPECTED_COMPLETION_TOKENS = int(os.getenv("AZURE_EXPECTED_COMPLETION_TOKENS", "1000"))  # Reserved per call
+# Ask for a usage chunk at the end of streams (stream_options.include_usage); needs api-version
+# 2024-09-01-preview or later. Without it, streamed calls are reconciled by counting the text.
+AZURE_STREAM_USAGE = os.getenv("AZURE_STREAM_USAGE", "False").lower() in ("true", "1", "yes")
+AZURE_MAX_RETRIES = int(os.getenv("AZURE_MAX_RETRIES", "6"))        # 429 / transient errors before giving up
+AZURE_MAX_QUEUE_WAIT = float(os.getenv("AZURE_MAX_QUEUE_WAIT", "300"))  # Seconds a call may wait for quota
+AZURE_RATE_LIMIT_STATE = os.getenv(
+    "AZURE_RATE_LIMIT_STATE", os.path.join(tempfile.gettempdir(), "marketlens_azure_bucket.json")
+)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+_stats = {
+    "calls": 0, "waiting": 0, "max_waiting": 0, "throttled_calls": 0,
+    "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "rate_limited_429": 0, "retries": 0, "failures": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def rate_limit_stats():
+    """This process's limiter counters; `waiting` is the current queue depth."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+class _SharedBucket:
+    """
+    Bucket state in a small JSON file, read-modify-written under flock, so every gunicorn
+    worker (and research_worker) on the host draws from the same quota.
+    Without fcntl it degrades to a per-process bucket behind a thread lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._memory = {}
+
+    def _file(self):
+        # Reopen after fork: processes sharing one open file would also share the flock
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextlib.contextmanager
+    def state(self):
+        with self._lock:
+            if fcntl is None:
+                yield self._memory
+                return
+            fd = self._file()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                raw = os.pread(fd, 65536, 0)
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                yield state
+                data = json.dumps(state).encode()
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, data, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+_bucket = _SharedBucket(AZURE_RATE_LIMIT_STATE)
+
+
+def _refill(state, now):
+    elapsed = max(now - state.get("updated", now), 0)
+    state["updated"] = now
+    if AZURE_TPM_LIMIT:
+        state["tokens"] = min(AZURE_TPM_LIMIT, state.get("tokens", AZURE_TPM_LIMIT) + elapsed * AZURE_TPM_LIMIT / 60)
+    if AZURE_RPM_LIMIT:
+        state["requests"] = min(AZURE_RPM_LIMIT, state.get("requests", AZURE_RPM_LIMIT) + elapsed * AZURE_RPM_LIMIT / 60)
+
+
+def _try_acquire(cost):
+    """Take `cost` tokens and one request if available. Returns 0, or the seconds to wait before retrying."""
+    cost = min(cost, AZURE_TPM_LIMIT) if AZURE_TPM_LIMIT else 0
+    now = time.time()
+    with _bucket.state() as state:
+        _refill(state, now)
+        waits = [state.get("blocked_until", 0) - now]
+        if AZURE_TPM_LIMIT and state["tokens"] < cost:
+            waits.append((cost - state["tokens"]) * 60 / AZURE_TPM_LIMIT)
+        if AZURE_RPM_LIMIT and state["requests"] < 1:
+            waits.append((1 - state["requests"]) * 60 / AZURE_RPM_LIMIT)
+        wait = max(waits)
+        if wait > 0:
+            return wait
+        if AZURE_TPM_LIMIT:
+            state["tokens"] -= cost
+        if AZURE_RPM_LIMIT:
+            state["requests"] -= 1
+        return 0
+
+
+def _refund(tokens):
+    # Reserved more than the call used: give the difference back
+    if not AZURE_TPM_LIMIT or not tokens:
+        return
+    with _bucket.state() as state:
+        _refill(state, time.time())
+        state["tokens"] = min(AZURE_TPM_LIMIT, state["tokens"] + tokens)
+
+
+async def _arefund(tokens):
+    """
+    _refund() for the async paths: the flock and file write run on the default executor, not the
+    event loop. Shielded, so the bucket still gets the tokens back if the caller is cancelled meanwhile.
+    """
+    if not AZURE_TPM_LIMIT or not tokens:
+        return
+    await asyncio.shield(asyncio.get_running_loop().run_in_executor(None, _refund, tokens))
+
+
+def _block_all(seconds):
+    """A 429 pauses every worker on the host, not just the caller."""
+    with _bucket.state() as state:
+        state["blocked_until"] = max(state.get("blocked_until", 0), time.time() + seconds)
+
+
+def prompt_tokens(messages):
+    from .context_packer import count_tokens  # Same tokenizer as the prompt budget
+    return sum(count_tokens(m.get("content") or "") + 4 for m in messages)
+
+
+def estimate_tokens(messages):
+    return prompt_tokens(messages) + AZURE_EXPECTED_COMPLETION_TOKENS
+
+
+def _retry_after(error, attempt):
+    """Seconds to wait: the server's Retry-After (ms or s) if given, else jittered exponential backoff."""
+    response = getattr(error, "response", None)
+    headers = response.headers if response is not None else {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            value = float(headers.get(header)) * scale
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            return value + random.uniform(0, 0.25 * value)
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+class _Waiter:
+    """Queue-depth and wait-time bookkeeping for one call."""
+
+    def __init__(self):
+        self.started = None
+        self.waited = 0.0
+
+    def wait(self, seconds):
+        if self.started is None:
+            self.started = time.monotonic()
+            with _stats_lock:
+                _stats["waiting"] += 1
+                _stats["max_waiting"] = max(_stats["max_waiting"], _stats["waiting"])
+                _stats["throttled_calls"] += 1
+        if time.monotonic() - self.started + seconds > AZURE_MAX_QUEUE_WAIT:
+            raise TimeoutError("Azure OpenAI quota wait exceeded AZURE_MAX_QUEUE_WAIT.")
+        # Jitter so queued callers don't all wake at the same instant
+        return min(seconds, 5.0) + random.uniform(0, 0.1)
+
+    def done(self):
+        if self.started is None:
+            return
+        self.waited = time.monotonic() - self.started
+        with _stats_lock:
+            _stats["waiting"] -= 1
+            _stats["wait_seconds_total"] += self.waited
+            _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], self.waited)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _delta_text(chunk):
+    choices = getattr(chunk, "choices", None)
+    return (choices[0].delta.content or "") if choices else ""
+
+
+def _streamed_tokens(messages, parts):
+    """What a stream used, when it ended without a usage chunk: the prompt plus the text received."""
+    from .context_packer import count_tokens
+    return prompt_tokens(messages) + count_tokens("".join(parts))
+
+
+def _on_error(error, attempt):
+    if not isinstance(error, RETRYABLE_ERRORS) or attempt >= AZURE_MAX_RETRIES:
+        _count("failures")
+        return None
+    delay = _retry_after(error, attempt)
+    if isinstance(error, openai.RateLimitError):
+        _count("rate_limited_429")
+        _block_all(delay)
+    _count("retries")
+    print(f"DEBUG: Azure call failed ({type(error).__name__}), retrying in {delay:.1f}s")
+    return delay
+
+
+def _wait_for_quota(cost):
+    waiter = _Waiter()
+    try:
+        while True:
+            wait = _try_acquire(cost)
+            if not wait:
+                return
+            time.sleep(waiter.wait(wait))
+    finally:
+        waiter.done()
+
+
+async def _await_quota(cost):
+    waiter = _Waiter()
+    try:
+        while True:
+            wait = await asyncio.to_thread(_try_acquire, cost)
+            if not wait:
+                return
+            await asyncio.sleep(waiter.wait(wait))
+    finally:
+        waiter.done()
+
+
+def _stream_kwargs(kwargs):
+    if kwargs.get("stream") and AZURE_STREAM_USAGE:
+        kwargs.setdefault("stream_options", {"include_usage": True})
+    return kwargs
+
+
+class _SettledStream:
+    """
+    A streamed completion holding its llm slot: iterate it like the stream it wraps.
+    When it ends, is closed early or is dropped unread, the slot is freed and the bucket
+    reservation settled against the usage chunk, or the prompt plus the text received.
+    """
+
+    def __init__(self, stream, cost, messages, release):
+        self.stream = stream
+        self.cost = cost
+        self.messages = messages
+        self.release = release
+        self.parts = []
+        self.used = None
+        self.settled = False
+
+    def _seen(self, chunk):
+        self.used = _usage_tokens(chunk) or self.used
+        self.parts.append(_delta_text(chunk))
+
+    def _unused(self):
+        used = self.used if self.used is not None else _streamed_tokens(self.messages, self.parts)
+        return self.cost - used
+
+    def settle(self):
+        if self.settled:
+            return
+        self.settled = True
+        try:
+            getattr(self.stream, "close", lambda: None)()
+        finally:
+            self.release()
+            _refund(self._unused())
+
+    def __iter__(self):
+        try:
+            for chunk in self.stream:
+                self._seen(chunk)
+                yield chunk
+        finally:
+            self.settle()
+
+    def __del__(self):
+        self.settle()  # A threading semaphore: safe to release from the garbage collector
+
+
+class _AsyncSettledStream(_SettledStream):
+    """
+    _SettledStream for the async client. Its slot belongs to the event loop, so it is settled on
+    the loop, never from the garbage collector: use it as `async with` (or iterate it to the end).
+    """
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                self._seen(chunk)
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self.settled:
+            return
+        self.settled = True
+        try:
+            close = getattr(self.stream, "close", None)
+            if close is not None:
+                await close()
+        finally:
+            self.release()
+            await _arefund(self._unused())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def __del__(self):
+        pass
+
+
+def create_completion(client, **kwargs):
+    """
+    client.chat.completions.create(**kwargs) behind the shared bucket: waits for quota instead
+    of failing, and retries 429s / transient errors honouring Retry-After.
+    Quota comes first, then an llm_slot() for the call itself (for stream=True, until the
+    returned iterator is exhausted or closed). The reservation is settled against the real
+    usage afterwards, and handed back in full when an attempt fails.
+    """
+    messages = kwargs.get("messages", [])
+    cost = estimate_tokens(messages)
+    _stream_kwargs(kwargs)
+    _count("calls")
+    for attempt in range(AZURE_MAX_RETRIES + 1):
+        _wait_for_quota(cost)
+
+        try:
+            release = _take_slot()
+        except BaseException:
+            _refund(cost)
+            raise
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except BaseException as e:
+            release()
+            _refund(cost)  # This attempt used nothing (or nothing we can count)
+            if not isinstance(e, Exception):
+                raise
+            delay = _on_error(e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+
+        if kwargs.get("stream"):
+            return _SettledStream(response, cost, messages, release)
+        release()
+        used = _usage_tokens(response)
+        if used is not None:
+            _refund(cost - used)
+        return response
+
+
+async def acreate_completion(client, **kwargs):
+    """
+    create_completion() for the async client; waits happen on the event loop, and the bucket's
+    file lock is only ever taken on the executor. A stream comes back as an async context manager.
+    """
+    messages = kwargs.get("messages", [])
+    cost = await asyncio.to_thread(estimate_tokens, messages)
+    _stream_kwargs(kwargs)
+    _count("calls")
+    for attempt in range(AZURE_MAX_RETRIES + 1):
+        await _await_quota(cost)
+
+        try:
+            release = await _atake_slot()
+        except BaseException:
+            await _arefund(cost)  # Cancelled or timed out while queued for a slot
+            raise
+        try:
+            response = await client.chat.completions.create(**kwargs)
+        except BaseException as e:
+            release()
+            await _arefund(cost)
+            if not isinstance(e, Exception):
+                raise
+            delay = _on_error(e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+
+        if kwargs.get("stream"):
+            return _AsyncSettledStream(response, cost, messages, release)
+        release()
+        used = _usage_tokens(response)
+        if used is not None:
+            await _arefund(cost - used)
+        return response
@@ -1,13 +1,24 @@
-import requests
+import os
+import concurrent.futures
+from datetime import timedelta
 from urllib.parse import urlparse
+from django.utils import timezone
+from . import http_client
+from .models import Company, LogoCache
 
-def get_company_logo(company_name, homepage_url):
-    """
-    Fetches the company logo using Clearbit API first, then falls back to Google Favicons.
-    Prioritizes the official homepage found during scraping.
-    """
+# ==============================================================================
+# 🖼️ LOGO CACHE: one Clearbit probe per domain, misses remembered for a shorter time
+# ==============================================================================
+LOGO_CACHE_TTL = int(os.getenv("LOGO_CACHE_TTL", str(30 * 24 * 3600)))    # Found logos
+LOGO_NEGATIVE_TTL = int(os.getenv("LOGO_NEGATIVE_TTL", str(24 * 3600)))   # Domains Clearbit doesn't know
+CLEARBIT_PREFIX = "https://logo.clearbit.com/"
+
+# Lookups run here so they never hold up a research stream
+logo_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="logo")
+
+def logo_domain(company_name, homepage_url):
     domain = ""
-    
+
     # 1. Try to extract domain from the URL found by the search agent
     if homepage_url:
         try:
@@ -15,22 +26,82 @@ def get_company_logo(company_name, homepage_url):
             domain = parsed.netloc.replace("www.", "")
         except:
             pass
-    
+
     # 2. If no URL provided, try to guess domain from company name (clean spaces)
     if not domain and company_name:
         domain = f"{company_name.replace(' ', '').lower()}.com"
 
+    return domain
+
+def _cached(domain):
+    try:
+        entry = LogoCache.objects.filter(domain=domain).first()
+    except Exception as e:
+        print(f"DEBUG: Logo cache lookup failed: {e}")
+        return None
+    if not entry:
+        return None
+    ttl = LOGO_CACHE_TTL if entry.found else LOGO_NEGATIVE_TTL
+    return entry if timezone.now() - entry.checked_at < timedelta(seconds=ttl) else None
+
+def _remember(domain, logo_url, found):
+    try:
+        LogoCache.objects.update_or_create(
+            domain=domain, defaults={"logo_url": logo_url, "found": found, "checked_at": timezone.now()}
+        )
+    except Exception as e:
+        print(f"DEBUG: Logo cache store failed: {e}")
+
+def get_company_logo(company_name, homepage_url):
+    """
+    Fetches the company logo using Clearbit API first, then falls back to Google Favicons.
+    Prioritizes the official homepage found during scraping.
+    """
+    domain = logo_domain(company_name, homepage_url)
     if not domain:
         return None
 
+    entry = _cached(domain)
+    if entry:
+        return entry.logo_url
+
     # 3. Try Clearbit API (High Quality)
     # We use a fast timeout to check if the image exists without downloading the whole thing yet
-    clearbit_url = f"https://logo.clearbit.com/{domain}"
+    clearbit_url = f"{CLEARBIT_PREFIX}{domain}"
     try:
-        if requests.head(clearbit_url, timeout=1.5).status_code == 200:
+        if http_client.head(clearbit_url, timeout=1.5).status_code == 200:
+            _remember(domain, clearbit_url, True)
             return clearbit_url
     except:
         pass
 
     # 4. Fallback to Google Favicon (Reliable)
-    return f"https://www.google.com/s2/favicons?domain={domain}&sz=128"
\ No newline at end of file
+    favicon_url = f"https://www.google.com/s2/favicons?domain={domain}&sz=128"
+    _remember(domain, favicon_url, False)
+    return favicon_url
+
+def stored_logo(company_name):
+    """
+    Clearbit logo saved on the Company record, while the LogoCache entry behind it is
+    still a fresh hit (no network). Anything else -> None, so the lookup runs again and
+    LOGO_CACHE_TTL / LOGO_NEGATIVE_TTL apply.
+    """
+    try:
+        logo_url = Company.objects.filter(name=company_name).values_list("logo_url", flat=True).first()
+    except Exception as e:
+        print(f"DEBUG: Stored logo lookup failed: {e}")
+        return None
+    if not logo_url or not logo_url.startswith(CLEARBIT_PREFIX):
+        return None  # Favicon fallbacks are never final
+    entry = _cached(logo_url[len(CLEARBIT_PREFIX):])
+    return logo_url if entry and entry.found else None
+
+def resolve_logo(company_name, homepage_url):
+    """get_company_logo() plus persisting Clearbit hits on the Company record (the favicon fallback is only streamed)."""
+    logo_url = get_company_logo(company_name, homepage_url)
+    if logo_url and logo_url.startswith(CLEARBIT_PREFIX):
+        try:
+            Company.objects.update_or_create(name=company_name, defaults={"logo_url": logo_url})
+        except Exception as e:
+            print(f"DEBUG: Saving logo failed: {e}")
+    return logo_url
@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand
+from agents.evidence_archive import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_DIR, archive_evidence, archive_stats, compact,
+)
+
+
+class Command(BaseCommand):
+    help = "Move old evidence (CompanyRawData) into monthly compressed JSONL archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=ARCHIVE_AFTER_DAYS, metavar='DAYS',
+            help="Archive rows older than this many days (default: EVIDENCE_ARCHIVE_AFTER_DAYS or 180).",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+            help="Rows read, written and deleted per transaction (default: EVIDENCE_ARCHIVE_BATCH_SIZE or 500).",
+        )
+        parser.add_argument('--dir', default=ARCHIVE_DIR, help=f"Archive directory (default: {ARCHIVE_DIR}).")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be archived; change nothing.")
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="Afterwards, VACUUM an SQLite database file (rewrites it under an exclusive lock).",
+        )
+
+    def handle(self, *args, **options):
+        result = archive_evidence(
+            older_than_days=options['older_than'], directory=options['dir'],
+            batch_size=max(1, options['batch_size']), dry_run=options['dry_run'],
+            progress=self.stdout.write if options['verbosity'] >= 1 else None,
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{result['rows']} evidence rows older than {result['cutoff']} would be archived.")
+            return
+
+        if result['rows']:
+            compact(vacuum=options['vacuum'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['rows']} evidence rows older than {result['cutoff']}; "
+            f"blobs {result['blobs_before']} -> {result['blobs_after']}."
+        ))
+        for path in result['files']:
+            self.stdout.write(f"  {path}")
+        self.stdout.write(json.dumps(archive_stats(options['dir']), indent=2))
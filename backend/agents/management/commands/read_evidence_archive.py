@@ -0,0 +1,29 @@
+import json
+from django.core.management.base import BaseCommand
+from agents.evidence_archive import ARCHIVE_DIR, iter_archive
+
+
+class Command(BaseCommand):
+    help = "Print archived evidence as JSON lines, filtered (see agents/evidence_archive.iter_archive)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="Exact company name.")
+        parser.add_argument('--domain', help="Exact source domain.")
+        parser.add_argument('--since', help="From this date, inclusive (YYYY-MM or YYYY-MM-DD).")
+        parser.add_argument('--until', help="Up to this date, exclusive (YYYY-MM or YYYY-MM-DD).")
+        parser.add_argument('--contains', help="Case-insensitive text the page must contain.")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many records (default: all).")
+        parser.add_argument('--no-text', action='store_true', help="Leave raw_text out of the output.")
+        parser.add_argument('--dir', default=ARCHIVE_DIR, help=f"Archive directory (default: {ARCHIVE_DIR}).")
+
+    def handle(self, *args, **options):
+        records = iter_archive(
+            company=options['company'], domain=options['domain'], since=options['since'],
+            until=options['until'], contains=options['contains'], directory=options['dir'],
+        )
+        for count, record in enumerate(records, 1):
+            if options['no_text']:
+                record.pop('raw_text')
+            self.stdout.write(json.dumps(record, ensure_ascii=False))
+            if count == options['limit']:
+                break
@@ -0,0 +1,44 @@
+import os
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from agents.orchestrator.job_queue import worker_loop, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Run queued research jobs (POST /api/research/ with \"background\": true)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=int(os.getenv("RESEARCH_WORKER_CONCURRENCY", "4")),
+            help="Jobs this process runs at the same time (default: RESEARCH_WORKER_CONCURRENCY or 4).",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+
+        requeued, failed = requeue_stale()
+        if requeued or failed:
+            self.stdout.write(f"Recovered stale jobs: {requeued} requeued, {failed} failed.")
+
+        stop_event = threading.Event()
+        # Finish the jobs in hand, then exit
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+        threads = [
+            threading.Thread(target=worker_loop, args=(stop_event,), name=f"research-worker-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for t in threads:
+            t.start()
+        self.stdout.write(self.style.SUCCESS(f"Research worker started with {concurrency} slot(s)."))
+
+        # Periodically recover jobs abandoned by crashed workers
+        while not stop_event.wait(60):
+            requeue_stale()
+
+        for t in threads:
+            t.join()
+        self.stdout.write("Research worker stopped.")
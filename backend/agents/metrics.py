@@ -0,0 +1,229 @@
+import os
+import time
+import bisect
+import threading
+import contextlib
+import contextvars
+from django.http import HttpResponse
+
+# ==============================================================================
+# ⏱️ METRICS: timing spans per research phase, exported in Prometheus text format
+# ==============================================================================
+# Everything here is per process (like the *_stats() counters it also exports): with several
+# gunicorn workers, each scrape sees the worker that answered it (told apart by `pid`).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # If set, /metrics needs "Authorization: Bearer <token>"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PREFIX = "marketlens"
+
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_counters = {}    # (name, labels) -> value
+_lock = threading.Lock()
+_process_started = time.time()
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        series = _histograms.setdefault(key, [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+        series[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+        series[-1] += seconds
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# ------------------------------------------------------------------------------
+# Per-request breakdown (the `timing` block of the `complete` payload)
+# ------------------------------------------------------------------------------
+class RequestTimings:
+    """Spans recorded while one research request runs, from any thread or task it started."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.token = None  # From the ContextVar.set() in start_request()
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, counts):
+        with self._lock:
+            span = self._spans.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            span["count"] += 1
+            span["total_ms"] += seconds * 1000
+            span["max_ms"] = max(span["max_ms"], seconds * 1000)
+            for key, value in counts.items():
+                span[key] = span.get(key, 0) + value
+
+    def summary(self):
+        """
+        total_ms is wall time since the request started. Spans that run in parallel
+        (searches, page fetches) overlap, so their totals can add up to more than that.
+        """
+        with self._lock:
+            spans = {
+                name: {**span, "total_ms": round(span["total_ms"], 1), "max_ms": round(span["max_ms"], 1)}
+                for name, span in self._spans.items()
+            }
+        return {"total_ms": round((time.perf_counter() - self.started) * 1000, 1), "spans": spans}
+
+
+_current = contextvars.ContextVar("research_timings", default=None)
+
+
+def start_request():
+    """
+    Makes a fresh RequestTimings the target of span() in this context (and tasks/threads started
+    from it). Pair it with end_request() in a finally.
+    """
+    timings = RequestTimings()
+    timings.token = _current.set(timings)
+    return timings
+
+
+def end_request(timings):
+    """
+    Puts back the target span() had before start_request(). A WSGI thread keeps its context from
+    one request to the next, so without this its later spans would land in a finished request.
+    """
+    try:
+        _current.reset(timings.token)
+    except ValueError:
+        # Closed from another context (a generator finalised elsewhere): that one never had it set
+        pass
+
+
+def detach():
+    """Stops recording into the inherited request (competitor tasks copy the primary's context)."""
+    _current.set(None)
+
+
+def in_context(fn):
+    """Wraps `fn` to run in a copy of the caller's context, so pool threads record into its request."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Times the block into the `<prefix>_span_seconds{span=name}` histogram and the current
+    request's breakdown. The yielded dict takes counts to add up, e.g. {"prompt_tokens": 812}.
+    """
+    counts = {}
+    started = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("span_seconds", elapsed, span=name)
+        for key, value in counts.items():
+            inc(f"span_{key}_total", value, span=name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add(name, elapsed, counts)
+
+
+# ------------------------------------------------------------------------------
+# Prometheus exposition
+# ------------------------------------------------------------------------------
+# Keys of the *_stats() snapshots that are point-in-time values rather than running counts
+GAUGE_KEYS = {"waiting", "max_waiting", "wait_seconds_max", "duplicate_rate", "avg_seconds", "max_seconds", "limit", "in_use"}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _stats_sources():
+    # Imported here: these modules pull in models and clients this one shouldn't depend on at import
+    from . import page_cache, http_client, llm_limits, research_cache, extraction_pool, host_limits
+    from .search.search_cache import search_cache_stats
+    from .validation.deduplication import dedup_stats
+    return [
+        ("page_cache", page_cache.cache_stats, None),
+        ("search_cache", search_cache_stats, None),
+        ("research_cache", research_cache.cache_stats, None),
+        ("evidence_dedup", dedup_stats, None),
+        ("azure", llm_limits.rate_limit_stats, None),
+        ("extract_pool", extraction_pool.extract_stats, None),
+        ("http_host", http_client.host_stats, "host"),
+        ("host_limit", host_limits.host_limit_stats, "resource"),
+    ]
+
+
+def _stats_lines(prefix, snapshot, label):
+    # label=None: {key: value}; otherwise {label value: {key: value}}
+    rows = [((), snapshot)] if label is None else [(((label, str(k)),), v) for k, v in snapshot.items()]
+    series = {}
+    for labels, values in rows:
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            gauge = key in GAUGE_KEYS
+            name = f"{PREFIX}_{prefix}_{key}" + ("" if gauge or key.endswith("_total") else "_total")
+            series.setdefault((name, gauge), []).append((labels, value))
+
+    lines = []
+    for (name, gauge), samples in sorted(series.items()):
+        lines.append(f"# TYPE {name} {'gauge' if gauge else 'counter'}")
+        lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in samples)
+    return lines
+
+
+def render():
+    pid = (("pid", str(os.getpid())),)
+    lines = [
+        f"# TYPE {PREFIX}_process_start_time_seconds gauge",
+        f"{PREFIX}_process_start_time_seconds{_format_labels(pid)} {_process_started}",
+    ]
+
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    for name in sorted({name for name, _ in histograms}):
+        full = f"{PREFIX}_{name}"
+        lines.append(f"# TYPE {full} histogram")
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*DURATION_BUCKETS, "+Inf"), series[:-1]):
+                cumulative += count
+                lines.append(f"{full}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {series[-1]}")
+            lines.append(f"{full}_count{_format_labels(labels)} {cumulative}")
+
+    for name in sorted({name for name, _ in counters}):
+        full = f"{PREFIX}_{name}"
+        lines.append(f"# TYPE {full} counter")
+        lines.extend(
+            f"{full}{_format_labels(labels)} {value}"
+            for (series_name, labels), value in sorted(counters.items()) if series_name == name
+        )
+
+    for prefix, source, label in _stats_sources():
+        try:
+            lines.extend(_stats_lines(prefix, source(), label))
+        except Exception as e:
+            print(f"DEBUG: Metrics source {prefix} failed: {e}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """GET /metrics -> Prometheus text format for this worker process."""
+    if METRICS_TOKEN and request.META.get("HTTP_AUTHORIZATION") != f"Bearer {METRICS_TOKEN}":
+        return HttpResponse(status=401)
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
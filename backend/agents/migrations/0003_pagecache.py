@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0002_company_cin_company_created_at_companyrawdata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.URLField(max_length=2000)),
+                ('extracted_text', models.TextField(blank=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('fetched_at', models.DateTimeField()),
+                ('last_accessed', models.DateTimeField(db_index=True)),
+                ('hit_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
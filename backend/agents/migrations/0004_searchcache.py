@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0003_pagecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('query', models.TextField()),
+                ('region', models.CharField(max_length=20)),
+                ('max_results', models.IntegerField()),
+                ('results', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('last_accessed', models.DateTimeField(db_index=True)),
+                ('hit_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0004_searchcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResearchCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('company_name', models.CharField(max_length=255)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField()),
+                ('last_accessed', models.DateTimeField()),
+                ('hit_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:05
+
+import hashlib
+
+from django.db import migrations, models
+
+# Byte-identical repeats (same company, URL and text; only user_prompt / timestamp differ) can't
+# stay under the new unique constraint. They are moved, not deleted: into this side table, which
+# no model reads, with the columns the evidence table has at this point (raw_text included).
+# Reversing this migration puts them back. After 0013/0014 the table is the only place their
+# prompts and timestamps are kept; drop it by hand once they are no longer wanted.
+DUPLICATES_TABLE = 'agents_companyrawdata_duplicates'
+COLUMNS = 'id, company_id, user_prompt, source_domain, source_url, found_cin, raw_text, timestamp, content_hash'
+
+
+def _in_batches(schema_editor, sql, ids):
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        schema_editor.execute(sql % ', '.join(['%s'] * len(chunk)), chunk)
+
+
+def backfill_content_hash(apps, schema_editor):
+    """Hash existing evidence in batches and move byte-identical repeats (keeping the oldest row) aside."""
+    CompanyRawData = apps.get_model('agents', 'CompanyRawData')
+    seen = set()
+    duplicate_ids = []
+    last_id = 0
+
+    # Keyset pagination: bounded batches, and no cursor held open across the writes
+    while True:
+        batch = list(
+            CompanyRawData.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'company_id', 'source_url', 'raw_text')[:500]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        for row in batch:
+            row.content_hash = hashlib.sha256(row.raw_text.encode('utf-8')).hexdigest()
+            key = (row.company_id, row.source_url, row.content_hash)
+            if key in seen:
+                duplicate_ids.append(row.id)
+            else:
+                seen.add(key)
+        CompanyRawData.objects.bulk_update(batch, ['content_hash'])
+
+    schema_editor.execute(
+        f"CREATE TABLE {DUPLICATES_TABLE} AS SELECT {COLUMNS} FROM agents_companyrawdata WHERE 1 = 0"
+    )
+    _in_batches(schema_editor, (
+        f"INSERT INTO {DUPLICATES_TABLE} ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM agents_companyrawdata WHERE id IN (%s)"
+    ), duplicate_ids)
+    _in_batches(schema_editor, "DELETE FROM agents_companyrawdata WHERE id IN (%s)", duplicate_ids)
+
+
+def restore_duplicates(apps, schema_editor):
+    # Runs once the constraint is gone again; ids are the rows' own, never handed out since
+    schema_editor.execute(
+        f"INSERT INTO agents_companyrawdata ({COLUMNS}) SELECT {COLUMNS} FROM {DUPLICATES_TABLE}"
+    )
+    schema_editor.execute(f"DROP TABLE {DUPLICATES_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0005_researchcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyrawdata',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(backfill_content_hash, restore_duplicates),
+        migrations.AddConstraint(
+            model_name='companyrawdata',
+            constraint=models.UniqueConstraint(fields=('company', 'source_url', 'content_hash'), name='uniq_raw_data_content'),
+        ),
+    ]
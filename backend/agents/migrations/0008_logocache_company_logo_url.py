@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0007_researchjob_researchjobevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogoCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True)),
+                ('logo_url', models.URLField(max_length=500)),
+                ('found', models.BooleanField(default=False)),
+                ('checked_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='logo_url',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+
+# Full-text index over the evidence locker. Which one depends on the database:
+# SQLite gets an external-content FTS5 table kept in sync by triggers, Postgres a GIN
+# expression index. Both are replaced in 0012, when the text moves into EvidenceBlob.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS agents_companyrawdata_fts USING fts5(
+        raw_text, source_domain, user_prompt,
+        content='agents_companyrawdata', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agents_companyrawdata_fts_ai AFTER INSERT ON agents_companyrawdata BEGIN
+        INSERT INTO agents_companyrawdata_fts(rowid, raw_text, source_domain, user_prompt)
+        VALUES (new.id, new.raw_text, new.source_domain, new.user_prompt);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agents_companyrawdata_fts_ad AFTER DELETE ON agents_companyrawdata BEGIN
+        INSERT INTO agents_companyrawdata_fts(agents_companyrawdata_fts, rowid, raw_text, source_domain, user_prompt)
+        VALUES ('delete', old.id, old.raw_text, old.source_domain, old.user_prompt);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agents_companyrawdata_fts_au AFTER UPDATE ON agents_companyrawdata BEGIN
+        INSERT INTO agents_companyrawdata_fts(agents_companyrawdata_fts, rowid, raw_text, source_domain, user_prompt)
+        VALUES ('delete', old.id, old.raw_text, old.source_domain, old.user_prompt);
+        INSERT INTO agents_companyrawdata_fts(rowid, raw_text, source_domain, user_prompt)
+        VALUES (new.id, new.raw_text, new.source_domain, new.user_prompt);
+    END
+    """,
+    # Index the rows stored before this migration
+    "INSERT INTO agents_companyrawdata_fts(agents_companyrawdata_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS agents_companyrawdata_fts_ai",
+    "DROP TRIGGER IF EXISTS agents_companyrawdata_fts_ad",
+    "DROP TRIGGER IF EXISTS agents_companyrawdata_fts_au",
+    "DROP TABLE IF EXISTS agents_companyrawdata_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS agents_companyrawdata_fts_gin ON agents_companyrawdata USING GIN ((
+        setweight(to_tsvector('english'::regconfig, coalesce(source_domain, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(user_prompt, '')), 'C') ||
+        to_tsvector('english'::regconfig, coalesce(raw_text, ''))
+    ))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS agents_companyrawdata_fts_gin",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD)
+        except Exception as e:
+            # SQLite built without FTS5: search falls back to substring matching
+            print(f"DEBUG: FTS5 index not created ({e})")
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0009_researchbatch'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
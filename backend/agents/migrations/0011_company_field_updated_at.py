@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0010_evidence_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='field_updated_at',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:06
+
+import importlib
+
+import agents.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Evidence text moves into EvidenceBlob (compressed, one row per distinct text), so the
+# 0010 index, built straight off agents_companyrawdata.raw_text, is replaced here:
+# SQLite indexes a view that decompresses through the evidence_text() SQL function
+# (registered on every connection by agents.fields.register_sqlite_functions), Postgres a
+# stored search_vector column that the app fills (agents/search/evidence_index.PG_INDEX_SQL).
+# Rows are indexed as 0013 points them at their blobs.
+
+SQLITE_FORWARD = [
+    "DROP TRIGGER IF EXISTS agents_companyrawdata_fts_ai",
+    "DROP TRIGGER IF EXISTS agents_companyrawdata_fts_ad",
+    "DROP TRIGGER IF EXISTS agents_companyrawdata_fts_au",
+    "DROP TABLE IF EXISTS agents_companyrawdata_fts",
+    """
+    CREATE VIEW IF NOT EXISTS agents_evidence_text AS
+    SELECT r.id AS id, evidence_text(b.text) AS raw_text, r.source_domain AS source_domain, r.user_prompt AS user_prompt
+    FROM agents_companyrawdata r JOIN agents_evidenceblob b ON b.id = r.blob_id
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS agents_evidence_fts USING fts5(
+        raw_text, source_domain, user_prompt,
+        content='agents_evidence_text', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    # The SELECTs match nothing while blob_id is NULL, so rows without a blob stay out of the index
+    """
+    CREATE TRIGGER IF NOT EXISTS agents_evidence_fts_ai AFTER INSERT ON agents_companyrawdata BEGIN
+        INSERT INTO agents_evidence_fts(rowid, raw_text, source_domain, user_prompt)
+        SELECT new.id, evidence_text(b.text), new.source_domain, new.user_prompt
+        FROM agents_evidenceblob b WHERE b.id = new.blob_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agents_evidence_fts_ad AFTER DELETE ON agents_companyrawdata BEGIN
+        INSERT INTO agents_evidence_fts(agents_evidence_fts, rowid, raw_text, source_domain, user_prompt)
+        SELECT 'delete', old.id, evidence_text(b.text), old.source_domain, old.user_prompt
+        FROM agents_evidenceblob b WHERE b.id = old.blob_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS agents_evidence_fts_au AFTER UPDATE OF blob_id, source_domain, user_prompt
+    ON agents_companyrawdata BEGIN
+        INSERT INTO agents_evidence_fts(agents_evidence_fts, rowid, raw_text, source_domain, user_prompt)
+        SELECT 'delete', old.id, evidence_text(b.text), old.source_domain, old.user_prompt
+        FROM agents_evidenceblob b WHERE b.id = old.blob_id;
+        INSERT INTO agents_evidence_fts(rowid, raw_text, source_domain, user_prompt)
+        SELECT new.id, evidence_text(b.text), new.source_domain, new.user_prompt
+        FROM agents_evidenceblob b WHERE b.id = new.blob_id;
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS agents_evidence_fts_ai",
+    "DROP TRIGGER IF EXISTS agents_evidence_fts_ad",
+    "DROP TRIGGER IF EXISTS agents_evidence_fts_au",
+    "DROP TABLE IF EXISTS agents_evidence_fts",
+    "DROP VIEW IF EXISTS agents_evidence_text",
+]
+
+POSTGRES_FORWARD = [
+    "DROP INDEX IF EXISTS agents_companyrawdata_fts_gin",
+    "ALTER TABLE agents_companyrawdata ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS agents_companyrawdata_search_gin ON agents_companyrawdata USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS agents_companyrawdata_search_gin",
+    "ALTER TABLE agents_companyrawdata DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def swap_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD)
+        except Exception as e:
+            # SQLite built without FTS5: search falls back to scanning in Python
+            print(f"DEBUG: FTS5 index not created ({e})")
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_new_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+def restore_old_index(apps, schema_editor):
+    # Runs last on the way back, once `blob` is gone (dropping it rebuilds the table on SQLite)
+    importlib.import_module('agents.migrations.0010_evidence_search_index').create_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0011_company_field_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_old_index),
+        migrations.CreateModel(
+            name='EvidenceBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('text', agents.fields.CompressedTextField()),
+                ('size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='companyrawdata',
+            name='blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='rows', to='agents.evidenceblob'),
+        ),
+        migrations.RunPython(swap_index, drop_new_index),
+    ]
@@ -0,0 +1,83 @@
+import hashlib
+
+from django.db import migrations, transaction
+
+# Not atomic: each batch commits on its own, so the table is only ever locked for one
+# batch of 500 rows and the app can keep writing evidence while this runs. Rows stored
+# meanwhile by the old code (blob still NULL) are picked up by the same loop.
+BATCH_SIZE = 500
+
+
+def move_to_blobs(apps, schema_editor):
+    from agents.search.evidence_index import PG_INDEX_SQL  # Same statement the app runs on new rows
+
+    CompanyRawData = apps.get_model('agents', 'CompanyRawData')
+    EvidenceBlob = apps.get_model('agents', 'EvidenceBlob')
+    db = schema_editor.connection.alias
+    last_id = 0
+
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(
+                CompanyRawData.objects.using(db).filter(id__gt=last_id, blob__isnull=True).order_by('id')
+                .only('id', 'raw_text', 'content_hash')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            hashes = [hashlib.sha256(row.raw_text.encode('utf-8')).hexdigest() for row in batch]
+            texts = {h: row.raw_text for h, row in zip(hashes, batch)}
+            blob_ids = dict(
+                EvidenceBlob.objects.using(db).filter(content_hash__in=texts).values_list('content_hash', 'id')
+            )
+            EvidenceBlob.objects.using(db).bulk_create([
+                EvidenceBlob(content_hash=h, text=text, size=len(text))
+                for h, text in texts.items() if h not in blob_ids
+            ], ignore_conflicts=True)
+            blob_ids.update(
+                EvidenceBlob.objects.using(db).filter(content_hash__in=texts).values_list('content_hash', 'id')
+            )
+
+            for row, content_hash in zip(batch, hashes):
+                row.blob_id = blob_ids[content_hash]
+                row.content_hash = row.content_hash or content_hash
+                row.raw_text = ''
+            # On SQLite the update trigger indexes each row as its blob_id is set
+            CompanyRawData.objects.using(db).bulk_update(batch, ['blob', 'content_hash', 'raw_text'])
+
+            if schema_editor.connection.vendor == 'postgresql':
+                with schema_editor.connection.cursor() as cursor:
+                    cursor.execute(PG_INDEX_SQL, [[blob_ids[h] for h in texts], list(texts.values())])
+
+
+def restore_raw_text(apps, schema_editor):
+    CompanyRawData = apps.get_model('agents', 'CompanyRawData')
+    db = schema_editor.connection.alias
+    last_id = 0
+
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(
+                CompanyRawData.objects.using(db).filter(id__gt=last_id, blob__isnull=False).order_by('id')
+                .select_related('blob')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for row in batch:
+                row.raw_text = row.blob.text
+            CompanyRawData.objects.using(db).bulk_update(batch, ['raw_text'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('agents', '0012_evidenceblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_blobs, restore_raw_text),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0013_move_raw_text_to_blobs'),
+    ]
+
+    operations = [
+        # Plain DROP / ADD COLUMN: no table rebuild on SQLite (which would take the 0012 triggers
+        # with it), and on the way back the column needs a default for the rows 0013 then refills
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    "ALTER TABLE agents_companyrawdata DROP COLUMN raw_text",
+                    reverse_sql="ALTER TABLE agents_companyrawdata ADD COLUMN raw_text text NOT NULL DEFAULT ''",
+                ),
+            ],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='companyrawdata',
+                    name='raw_text',
+                ),
+            ],
+        ),
+    ]
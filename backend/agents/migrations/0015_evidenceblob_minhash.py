@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:36
+
+from django.db import migrations, models, transaction
+
+# Not atomic, like 0013: each batch of signatures commits on its own. Blobs this hasn't
+# reached yet are hashed on the fly by deduplication._stored_signatures.
+BATCH_SIZE = 500
+
+
+def backfill_minhash(apps, schema_editor):
+    from agents.validation.deduplication import signature_bytes  # Same signature the app writes
+
+    EvidenceBlob = apps.get_model('agents', 'EvidenceBlob')
+    db = schema_editor.connection.alias
+    last_id = 0
+
+    while True:
+        with transaction.atomic(using=db):
+            batch = list(
+                EvidenceBlob.objects.using(db).filter(id__gt=last_id, minhash__isnull=True).order_by('id')
+                .only('id', 'text')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for blob in batch:
+                blob.minhash = signature_bytes(blob.text)
+            EvidenceBlob.objects.using(db).bulk_update(batch, ['minhash'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('agents', '0014_remove_companyrawdata_raw_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evidenceblob',
+            name='minhash',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(backfill_minhash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0015_evidenceblob_minhash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='researchcache',
+            name='created_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='researchcache',
+            name='last_accessed',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
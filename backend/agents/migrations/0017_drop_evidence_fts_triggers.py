@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:12
+
+import importlib
+
+from django.db import migrations
+
+# The 0012 triggers decompressed through evidence_text(), so any write to agents_companyrawdata
+# from a connection without the function (the sqlite3 shell, a backup script) failed. The app
+# keeps the FTS5 rows from now on: agents/search/evidence_index.index_new_evidence() and
+# unindex_evidence(). The index itself and the view it reads snippets through stay as they are.
+TRIGGERS = ["agents_evidence_fts_ai", "agents_evidence_fts_ad", "agents_evidence_fts_au"]
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def restore_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'agents_evidence_fts'")
+        if not cursor.fetchone():
+            return  # SQLite without FTS5: 0012 never created any
+    statements = importlib.import_module('agents.migrations.0012_evidenceblob').SQLITE_FORWARD
+    for statement in statements:
+        if "CREATE TRIGGER" in statement:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0016_researchcache_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, restore_triggers),
+    ]
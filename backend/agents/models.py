@@ -1,4 +1,32 @@
+import uuid
+import hashlib
+from django.conf import settings
 from django.db import models
+from .fields import CompressedTextField
+
+class EvidenceBlobManager(models.Manager):
+    def ids_for(self, by_hash):
+        """
+        {content_hash: text} -> {content_hash: blob id}, creating the blobs that don't exist yet.
+        Safe against a concurrent run storing the same text (the unique hash wins).
+        """
+        if not by_hash:
+            return {}
+        from .validation.deduplication import signature_bytes  # It imports these models
+        ids = dict(self.filter(content_hash__in=by_hash).values_list('content_hash', 'id'))
+        missing = [h for h in by_hash if h not in ids]
+        if missing:
+            self.bulk_create([
+                self.model(content_hash=h, text=by_hash[h], size=len(by_hash[h]), minhash=signature_bytes(by_hash[h]))
+                for h in missing
+            ], ignore_conflicts=True)
+            ids.update(self.filter(content_hash__in=missing).values_list('content_hash', 'id'))
+        return ids
+
+class CompanyRawDataQuerySet(models.QuerySet):
+    def with_text(self):
+        """Fetches the blobs in the same query, so reading `raw_text` costs no extra round trip."""
+        return self.select_related('blob')
 
 class Company(models.Model):
     """
@@ -21,18 +49,43 @@ class Company(models.Model):
     
     # Technographics (Stored as JSON)
     tech_stack = models.JSONField(default=list, blank=True) 
+
+    # Brand (resolved off the critical path, see logo_tool.resolve_logo)
+    logo_url = models.URLField(max_length=500, blank=True, null=True)
+
+    # Freshness: field name -> ISO time a research run last confirmed it (see golden_record.py)
+    field_updated_at = models.JSONField(default=dict, blank=True)
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
-    last_updated = models.DateTimeField(auto_now=True)
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)  # Drives the list ETag
 
     def __str__(self):
         return self.name
 
+class EvidenceBlob(models.Model):
+    """
+    The 'Blob Store'.
+    Evidence text, stored once per distinct content (sha256) and zstd-compressed.
+    The same page saved for several companies, or again on every rerun, is one blob.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    text = CompressedTextField()
+    size = models.IntegerField(default=0)  # Uncompressed length in characters
+    minhash = models.BinaryField(null=True)  # MinHash of the text (deduplication.signature_bytes), read by dedupe
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = EvidenceBlobManager()
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.size} chars)"
+
 class CompanyRawData(models.Model):
     """
     The 'Evidence Locker'.
     Agent 1 dumps raw text here from Zauba, Tofler, LinkedIn, etc.
+    The text itself lives in EvidenceBlob; `raw_text` reads it through.
     """
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='raw_data')
     
@@ -46,10 +99,189 @@ class CompanyRawData(models.Model):
     # Extracted metadata (Optional, just to help searching)
     found_cin = models.CharField(max_length=50, null=True, blank=True)
     
-    # The actual messy text snippet
-    raw_text = models.TextField() 
+    # The actual messy text snippet (null only on rows migration 0013 hasn't reached yet)
+    blob = models.ForeignKey(EvidenceBlob, on_delete=models.PROTECT, null=True, related_name='rows')
+    content_hash = models.CharField(max_length=64, blank=True)  # sha256 of raw_text (= blob.content_hash), for dedupe
     
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    objects = CompanyRawDataQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Re-scraping an unchanged page must not store the same evidence twice
+            models.UniqueConstraint(fields=['company', 'source_url', 'content_hash'], name='uniq_raw_data_content'),
+        ]
+
+    @staticmethod
+    def hash_text(raw_text):
+        return hashlib.sha256(raw_text.encode('utf-8')).hexdigest()
+
+    @property
+    def raw_text(self):
+        return self.blob.text if self.blob_id else ""
+
+    def __str__(self):
+        return f"{self.company.name} - {self.source_domain}"
+
+class PageCache(models.Model):
+    """
+    The 'Page Cache'.
+    Extracted text for every URL Agent 1 has read, keyed by the normalized URL.
+    Fresh rows are served without a network call; stale rows are revalidated
+    with a conditional GET using the stored ETag / Last-Modified.
+    """
+    url_key = models.CharField(max_length=64, unique=True)  # sha256 of the normalized URL
+    url = models.URLField(max_length=2000)
+
+    extracted_text = models.TextField(blank=True)
+
+    # Validators sent back on revalidation
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+
+    fetched_at = models.DateTimeField()                   # Last 200 or 304 from the origin
+    last_accessed = models.DateTimeField(db_index=True)   # Drives LRU eviction
+    hit_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.url
+
+
+class SearchCache(models.Model):
+    """
+    The 'Search Cache'.
+    DDGS hits per (normalized query, region, max_results), shared by every worker process.
+    """
+    cache_key = models.CharField(max_length=64, unique=True)  # sha256 of query|region|max_results
+    query = models.TextField()
+    region = models.CharField(max_length=20)
+    max_results = models.IntegerField()
+
+    results = models.JSONField(default=list)
+
+    created_at = models.DateTimeField()
+    last_accessed = models.DateTimeField(db_index=True)   # Drives LRU eviction
+    hit_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.query
+
+
+class LogoCache(models.Model):
+    """
+    The 'Logo Cache'.
+    Outcome of the Clearbit probe per domain. Misses are stored too (found=False)
+    so a domain without a Clearbit logo isn't probed again until its shorter TTL runs out.
+    """
+    domain = models.CharField(max_length=255, unique=True)
+    logo_url = models.URLField(max_length=500)  # Clearbit URL, or the favicon fallback when found=False
+    found = models.BooleanField(default=False)
+    checked_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.domain
+
+
+class ResearchCache(models.Model):
+    """
+    The 'Result Cache'.
+    Final `complete` payload of a research run, keyed by normalized company,
+    requirements and comparison settings, so repeats can be replayed over SSE.
+    """
+    cache_key = models.CharField(max_length=64, unique=True)
+    company_name = models.CharField(max_length=255)
+
+    payload = models.JSONField()
+
+    created_at = models.DateTimeField(db_index=True)    # When the pipeline produced this payload
+    last_accessed = models.DateTimeField(db_index=True)
+    hit_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.company_name
+
+
+class ResearchBatch(models.Model):
+    """
+    The 'Batch'.
+    A target list researched as one unit: one ResearchJob per company, run by the
+    research_worker pool. Paused batches keep their queued jobs out of the workers' reach.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('paused', 'Paused'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    name = models.CharField(max_length=255, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    total = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name or self.id} ({self.total} companies) [{self.status}]"
+
+
+class ResearchJob(models.Model):
+    """
+    The 'Job Queue'.
+    One research request run by a `research_worker` process instead of the HTTP response,
+    so a dropped connection doesn't lose the work. Progress lives in ResearchJobEvent.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    batch = models.ForeignKey(ResearchBatch, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+
+    # Request inputs
+    company_name = models.CharField(max_length=255)
+    requirements = models.TextField()
+    enable_comparison = models.BooleanField(default=False)
+    competitor_names = models.TextField(blank=True)
+    force_refresh = models.BooleanField(default=False)
+
+    # Execution record
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    worker = models.CharField(max_length=100, blank=True)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)  # The `complete` payload
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Lets a new worker requeue jobs of a dead one
+    duration_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.company_name} [{self.status}]"
+
+
+class ResearchJobEvent(models.Model):
+    """
+    Ordered SSE events of a ResearchJob. `seq` is the SSE event id used for Last-Event-ID resume.
+    """
+    job = models.ForeignKey(ResearchJob, on_delete=models.CASCADE, related_name='events')
+    seq = models.IntegerField()
+    event = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['job', 'seq'], name='uniq_job_event_seq')]
+        ordering = ['seq']
+
     def __str__(self):
-        return f"{self.company.name} - {self.source_domain}"
\ No newline at end of file
+        return f"{self.job_id} #{self.seq}"
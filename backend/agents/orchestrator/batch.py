@@ -0,0 +1,169 @@
+import io
+import os
+import csv
+import json
+import time
+from django.db.models import Count
+from ..models import ResearchBatch, ResearchJob
+from .job_queue import TERMINAL_STATUSES, JOB_POLL_INTERVAL
+
+# ==============================================================================
+# 📋 BATCHES: a target list as queued jobs, results streamed back as NDJSON
+# ==============================================================================
+# However many research_worker processes run a batch, searches, page fetches and LLM calls
+# in flight are capped for the whole host by agents/host_limits (HOST_SEARCH_LIMIT,
+# HOST_FETCH_LIMIT, HOST_LLM_LIMIT), and Azure tokens by the shared bucket in llm_limits.
+MAX_BATCH_SIZE = int(os.getenv("RESEARCH_BATCH_MAX_SIZE", "5000"))
+NDJSON_KEEPALIVE = 15  # Seconds between progress lines while nothing finishes
+
+COMPANY_COLUMNS = ("company_name", "company", "name")
+
+
+class BatchInputError(ValueError):
+    pass
+
+
+def _truthy(value):
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def rows_from_csv(text):
+    """CSV with a header row: company_name (or company/name), optional requirements and competitor_names."""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    fields = {(f or "").strip().lower(): f for f in reader.fieldnames or []}
+    company_col = next((fields[c] for c in COMPANY_COLUMNS if c in fields), None)
+    if not company_col:
+        raise BatchInputError("CSV needs a 'company_name' column.")
+
+    rows = []
+    for record in reader:
+        row = {"company_name": record.get(company_col)}
+        for key in ("requirements", "competitor_names", "enable_comparison"):
+            if key in fields and record.get(fields[key]) not in (None, ""):
+                row[key] = record[fields[key]]
+        rows.append(row)
+    return rows
+
+
+def normalize_rows(rows, defaults):
+    """
+    Rows (strings or dicts) -> job kwargs, with batch-level `defaults` filling the gaps.
+    Rows without a company or requirements are rejected up front, so the batch never half-starts.
+    """
+    jobs, errors = [], []
+    for line, row in enumerate(rows, start=1):
+        if isinstance(row, str):
+            row = {"company_name": row}
+        if not isinstance(row, dict):
+            errors.append(f"Row {line}: expected an object or a company name.")
+            continue
+
+        company_name = str(row.get("company_name") or "").strip()
+        requirements = str(row.get("requirements") or defaults.get("requirements") or "").strip()
+        if not company_name or not requirements:
+            errors.append(f"Row {line}: company_name and requirements are required.")
+            continue
+
+        enable_comparison = row.get("enable_comparison", defaults.get("enable_comparison", False))
+        jobs.append({
+            "company_name": company_name[:255],
+            "requirements": requirements,
+            "enable_comparison": _truthy(enable_comparison) if isinstance(enable_comparison, str) else bool(enable_comparison),
+            "competitor_names": str(row.get("competitor_names") or defaults.get("competitor_names") or ""),
+            "force_refresh": bool(defaults.get("force_refresh", False)),
+        })
+
+    if errors:
+        raise BatchInputError("; ".join(errors[:20]))
+    if not jobs:
+        raise BatchInputError("The batch is empty.")
+    if len(jobs) > MAX_BATCH_SIZE:
+        raise BatchInputError(f"A batch can hold at most {MAX_BATCH_SIZE} companies.")
+    return jobs
+
+
+def create_batch(owner, rows, defaults, name=""):
+    jobs = normalize_rows(rows, defaults)
+    owner = owner if owner is not None and owner.is_authenticated else None
+
+    batch = ResearchBatch.objects.create(owner=owner, name=name[:255], total=len(jobs))
+    ResearchJob.objects.bulk_create(
+        [ResearchJob(owner=owner, batch=batch, **job) for job in jobs], batch_size=500
+    )
+    return batch
+
+
+def set_paused(batch, paused):
+    """Pausing stops new jobs from being claimed; the ones already running finish."""
+    ResearchBatch.objects.filter(pk=batch.pk).update(status='paused' if paused else 'running')
+    batch.refresh_from_db()
+    return batch
+
+
+def batch_progress(batch):
+    counts = dict.fromkeys(('queued', 'running', 'succeeded', 'failed'), 0)
+    for row in batch.jobs.values('status').annotate(n=Count('id')):
+        counts[row['status']] = row['n']
+
+    finished = counts['succeeded'] + counts['failed']
+    if finished == batch.total:
+        state = 'completed'
+    else:
+        state = batch.status
+    return {
+        "batch_id": str(batch.pk),
+        "name": batch.name,
+        "status": state,
+        "total": batch.total,
+        "finished": finished,
+        "progress": round(finished / batch.total, 4) if batch.total else 1.0,
+        **counts,
+    }
+
+
+def _result_line(job):
+    return {
+        "type": "result",
+        "job_id": str(job.pk),
+        "company_name": job.company_name,
+        "status": job.status,
+        "error": job.error or None,
+        "attempts": job.attempts,
+        "duration_seconds": job.duration_seconds,
+        "result": job.result,
+    }
+
+
+def ndjson_results(batch_id, skip_job_ids=()):
+    """
+    NDJSON lines for a batch: one `result` line per company as it finishes (failures included),
+    `progress` lines as counts change, and a final `done` line once every job is finished.
+    Reconnecting clients can pass the job ids they already have in `skip_job_ids`.
+    """
+    sent = set(skip_job_ids)
+    last_progress, last_write = None, time.monotonic()
+    while True:
+        batch = ResearchBatch.objects.filter(pk=batch_id).first()
+        if batch is None:
+            return
+
+        # Progress first: a job counts as finished only once its result is written
+        progress = batch_progress(batch)
+        finished_ids = set(
+            ResearchJob.objects.filter(batch_id=batch_id, status__in=TERMINAL_STATUSES).values_list('pk', flat=True)
+        )
+        new_ids = list(finished_ids - sent)
+        for start in range(0, len(new_ids), 500):
+            for job in ResearchJob.objects.filter(pk__in=new_ids[start:start + 500]).order_by('finished_at'):
+                sent.add(job.pk)
+                yield json.dumps(_result_line(job), default=str) + "\n"
+                last_write = time.monotonic()
+
+        if progress != last_progress or time.monotonic() - last_write > NDJSON_KEEPALIVE:
+            yield json.dumps({"type": "progress", **progress}) + "\n"
+            last_progress, last_write = progress, time.monotonic()
+
+        if progress["status"] == 'completed':
+            yield json.dumps({"type": "done", **progress}) + "\n"
+            return
+        time.sleep(JOB_POLL_INTERVAL)
@@ -0,0 +1,548 @@
+import queue
+import asyncio
+import concurrent.futures  # 🟢 REQUIRED FOR FAST PARALLEL SEARCH
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from ..roc_tool import fetch_roc_data, afetch_roc_data                  # Agent 1 (The Collector)
+from ..agent_2_validator import validate_and_extract, avalidate_and_extract  # Agent 2 (The Analyst)
+from ..models import Company, CompanyRawData, EvidenceBlob
+from .. import logo_tool
+from .. import metrics
+from ..golden_record import save_golden_record
+from ..validation.deduplication import deduplicate_evidence
+from ..search.evidence_index import index_new_evidence
+
+CLEAN_COMP_QUERY = "official corporate profile facts strengths weaknesses market position"
+MAX_COMPETITOR_FETCHES = 5  # Competitor Agent 1 runs in parallel per request
+
+
+# ==============================================================================
+# 🧩 SHARED PHASE HELPERS (used by both the sync and the async pipeline)
+# ==============================================================================
+def store_evidence(company_name, requirements, entries):
+    # One transaction; each distinct text is stored once as a compressed blob,
+    # and unchanged pages hit the unique rule and are skipped
+    hashes = [CompanyRawData.hash_text(entry['raw_text']) for entry in entries]
+    texts = {h: entry['raw_text'] for h, entry in zip(hashes, entries)}
+    with transaction.atomic():
+        company_obj, _ = Company.objects.get_or_create(name=company_name)
+        blob_ids = EvidenceBlob.objects.ids_for(texts)
+        CompanyRawData.objects.bulk_create([
+            CompanyRawData(
+                company=company_obj,
+                user_prompt=requirements,
+                source_domain=entry['source_domain'],
+                source_url=entry['source_url'],
+                blob_id=blob_ids[content_hash],
+                content_hash=content_hash
+            )
+            for content_hash, entry in zip(hashes, entries)
+        ], ignore_conflicts=True)
+        index_new_evidence({blob_ids[h]: text for h, text in texts.items()})
+
+
+def dedupe_evidence(company_name, entries):
+    """deduplicate_evidence() that falls back to keeping everything if it fails."""
+    try:
+        return deduplicate_evidence(company_name, entries)
+    except Exception as e:
+        print(f"DEBUG: Evidence dedupe failed: {e}")
+        return entries, entries, None
+
+
+def dedupe_log(report):
+    if not report or not (report["duplicates"] or report["already_stored"]):
+        return []
+    return [{'type': 'log', 'message': (
+        f"Dedupe: {report['unique']}/{report['scraped']} sources are distinct "
+        f"({report['duplicate_rate']:.0%} near-duplicates, {report['already_stored']} already on file)."
+    )}]
+
+
+def resolve_competitors(enable_comparison, competitor_names_str, final_insight):
+    """Returns (competitors, auto_detected)."""
+    if not enable_comparison:
+        return [], False
+    if competitor_names_str:
+        return [c.strip() for c in competitor_names_str.split(',') if c.strip()], False
+    if final_insight and final_insight.get("extracted_data"):
+        auto_comps = final_insight["extracted_data"].get("Competitors")
+        if auto_comps and isinstance(auto_comps, list):
+            return auto_comps[:3], True
+    return [], False
+
+
+def competitor_text(agent_1_payload):
+    # Grab top 2 sources only to save time/tokens
+    if agent_1_payload.get("status") != "success":
+        return ""
+    return "\n".join(e['raw_text'] for e in agent_1_payload.get("data", [])[:2])
+
+
+def competitor_log(comp_name, event):
+    # Competitor logs share the stream with the primary company's, so say whose they are
+    return {**event, "message": f"[{comp_name}] {event['message']}", "company": comp_name}
+
+
+def _competitor_outcome(comp_name, data, exc=None):
+    if exc is not None:
+        return {'type': 'log', 'message': f'Error searching {comp_name}: {exc}'}
+    if data["data"]:
+        return {'type': 'log', 'message': f'✔ Data fetched for {comp_name}'}
+    return {'type': 'log', 'message': f'⚠ No data found for {comp_name}'}
+
+
+class CompetitorFetches:
+    """
+    Agent 1 for competitors, started as soon as their names are known (explicit names at
+    request start, auto-detected ones while Agent 2 is still streaming) and run on threads
+    next to the primary pipeline. Their labelled logs are drained into the main stream.
+    """
+
+    def __init__(self):
+        self._events = queue.Queue()
+        self._executor = None
+        self._futures = {}  # lowercased name -> (name, future)
+
+    def start(self, names):
+        for name in names:
+            key = name.strip().lower()
+            if not key or key in self._futures:
+                continue
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=MAX_COMPETITOR_FETCHES, thread_name_prefix="competitor"
+                )
+            self._futures[key] = (name, self._executor.submit(self._fetch, name))
+
+    def started(self, names):
+        return all(name.strip().lower() in self._futures for name in names)
+
+    def _fetch(self, comp_name):
+        full_text = ""
+        try:
+            for event in fetch_roc_data(comp_name, CLEAN_COMP_QUERY):
+                if event['type'] == 'log':
+                    self._events.put(competitor_log(comp_name, event))
+                elif event['type'] == 'result':
+                    full_text = competitor_text(event['payload'])
+        finally:
+            connection.close()
+        return {"name": comp_name, "data": full_text}
+
+    def drain(self):
+        while True:
+            try:
+                yield self._events.get_nowait()
+            except queue.Empty:
+                return
+
+    def collect(self, names):
+        """Yields progress until every competitor in `names` is fetched; returns their data list."""
+        self.start(names)
+        pending = {self._futures[n.strip().lower()][1]: n for n in names if n.strip().lower() in self._futures}
+        competitor_data_list = []
+        while pending:
+            done, _ = concurrent.futures.wait(pending, timeout=0.25, return_when=concurrent.futures.FIRST_COMPLETED)
+            yield from self.drain()
+            for future in done:
+                comp_name = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception as exc:
+                    yield _competitor_outcome(comp_name, None, exc)
+                    continue
+                if data["data"]:
+                    competitor_data_list.append(data)
+                yield _competitor_outcome(comp_name, data)
+        yield from self.drain()
+        return competitor_data_list
+
+    def close(self):
+        # Speculative fetches nobody needs any more are dropped if they haven't started
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ACompetitorFetches:
+    """CompetitorFetches for the ASGI pipeline: one task per competitor on the event loop."""
+
+    def __init__(self):
+        self._events = asyncio.Queue()
+        self._tasks = {}  # lowercased name -> (name, task)
+
+    def start(self, names):
+        for name in names:
+            key = name.strip().lower()
+            if not key or key in self._tasks:
+                continue
+            self._tasks[key] = (name, asyncio.ensure_future(self._fetch(name)))
+
+    def started(self, names):
+        return all(name.strip().lower() in self._tasks for name in names)
+
+    async def _fetch(self, comp_name):
+        metrics.detach()  # Its own Agent 1 spans, not the primary company's
+        full_text = ""
+        async for event in afetch_roc_data(comp_name, CLEAN_COMP_QUERY):
+            if event['type'] == 'log':
+                self._events.put_nowait(competitor_log(comp_name, event))
+            elif event['type'] == 'result':
+                full_text = competitor_text(event['payload'])
+        return {"name": comp_name, "data": full_text}
+
+    def drain(self):
+        events = []
+        while not self._events.empty():
+            events.append(self._events.get_nowait())
+        return events
+
+    async def collect(self, names, out):
+        """Yields progress until every competitor in `names` is fetched; appends their data to `out`."""
+        self.start(names)
+        pending = {self._tasks[n.strip().lower()][1]: n for n in names if n.strip().lower() in self._tasks}
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+            for event in self.drain():
+                yield event
+            for task in done:
+                comp_name = pending.pop(task)
+                try:
+                    data = task.result()
+                except Exception as exc:
+                    yield _competitor_outcome(comp_name, None, exc)
+                    continue
+                if data["data"]:
+                    out.append(data)
+                yield _competitor_outcome(comp_name, data)
+        for event in self.drain():
+            yield event
+
+    def close(self):
+        for _, task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+class LogoLookup:
+    """
+    Company logo for one research stream, off the critical path: a logo saved on the
+    Company record is sent straight away; otherwise the lookup starts on the logo pool as
+    soon as Agent 1 reports the official domain, and a `logo` event goes out when it lands.
+    """
+
+    def __init__(self, company_name):
+        self.company_name = company_name
+        self.logo = None
+        self._future = None
+        self._sent = False
+
+    def _event(self):
+        self._sent = True
+        return {'type': 'logo', 'company': self.company_name, 'logo': self.logo}
+
+    def known(self):
+        self.logo = logo_tool.stored_logo(self.company_name)
+        return [self._event()] if self.logo else []
+
+    def start(self, homepage_url):
+        if self.logo or self._future is not None:
+            return
+        self._future = logo_tool.logo_executor.submit(logo_tool.resolve_logo, self.company_name, homepage_url)
+
+    def drain(self):
+        if self._sent or self._future is None or not self._future.done():
+            return []
+        try:
+            self.logo = self._future.result()
+        except Exception as e:
+            print(f"DEBUG: Logo lookup failed: {e}")
+            self._sent = True
+            return []
+        return [self._event()] if self.logo else []
+
+
+class ALogoLookup(LogoLookup):
+    """LogoLookup for the ASGI pipeline (DB and HEAD probe on a worker thread, awaited as a task)."""
+
+    async def aknown(self):
+        self.logo = await sync_to_async(logo_tool.stored_logo, thread_sensitive=False)(self.company_name)
+        return [self._event()] if self.logo else []
+
+    def start(self, homepage_url):
+        if self.logo or self._future is not None:
+            return
+        self._future = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(
+            logo_tool.logo_executor, logo_tool.resolve_logo, self.company_name, homepage_url
+        ))
+
+
+def build_final_payload(company_name, agent_1_response, final_insight, comparison_result, logo=None, dedupe=None,
+                        timing=None):
+    sources_formatted = []
+    if agent_1_response and "data" in agent_1_response:
+        seen_urls = set()
+        for item in agent_1_response["data"]:
+            if item["source_url"] not in seen_urls:
+                sources_formatted.append({
+                    "title": item["source_domain"],
+                    "url": item["source_url"]
+                })
+                seen_urls.add(item["source_url"])
+
+    return {
+        "status": "success",
+        "company": company_name,
+        "scraped_sources": sources_formatted,
+        "total_sources": len(sources_formatted),
+        "final_answer": final_insight,
+        "comparison": comparison_result,
+        "logo": logo,  # Only if the lookup already finished; it is also sent as its own `logo` event
+        "evidence": dedupe,  # Near-duplicate report: scraped / unique / duplicate_rate
+        "timing": timing  # Per-phase spans of this run (metrics.RequestTimings.summary)
+    }
+
+
+# ==============================================================================
+# 🧭 RESEARCH PIPELINE: Agent 1 -> Evidence Locker -> Agent 2 -> Agent 3
+# ==============================================================================
+def run_research(company_name, requirements, enable_comparison=False, competitor_names_str=""):
+    """
+    The full research pipeline as a stream of event dicts
+    ({"type": "log" | "partial" | "logo" | "error" | "complete", ...}).
+    Transport-agnostic: the SSE view, the result cache and background refreshes all consume it.
+    Competitor research runs alongside phases 1-3 (see CompetitorFetches).
+    """
+    competitor_fetches = CompetitorFetches()
+    logo = LogoLookup(company_name)
+    timings = metrics.start_request()
+    try:
+        yield from logo.known()
+
+        # 🟢 Named competitors don't depend on the primary company: start them right away
+        if enable_comparison and competitor_names_str:
+            competitor_fetches.start(resolve_competitors(enable_comparison, competitor_names_str, None)[0])
+
+        # ====================================================
+        # PHASE 1: Agent 1 (Scrape Primary Company)
+        # ====================================================
+        agent_1_response = None
+        with metrics.span("agent_1"):
+            for event in fetch_roc_data(company_name, requirements):
+                if event['type'] == 'log':
+                     yield event
+                elif event['type'] == 'official_domain':
+                     logo.start(event['url'])
+                elif event['type'] == 'result':
+                     agent_1_response = event['payload']
+                     logo.start(agent_1_response.get('official_domain'))
+                yield from competitor_fetches.drain()
+                yield from logo.drain()
+
+        if not agent_1_response or agent_1_response.get("status") != "success":
+            error_msg = agent_1_response.get('message', 'Agent 1 failed.') if agent_1_response else 'Agent 1 failed.'
+            yield {'type': 'error', 'message': error_msg}
+            return
+
+        # ====================================================
+        # PHASE 2: Store Evidence (one representative per near-duplicate cluster)
+        # ====================================================
+        with metrics.span("dedupe"):
+            unique_entries, new_entries, dedupe = dedupe_evidence(company_name, agent_1_response.get("data", []))
+        yield from dedupe_log(dedupe)
+
+        yield {'type': 'log', 'message': 'Saving sources...'}
+        try:
+            with metrics.span("store_evidence"):
+                store_evidence(company_name, requirements, new_entries)
+        except Exception as e:
+             yield {'type': 'log', 'message': f'DB Error: {str(e)}'}
+
+        # ====================================================
+        # PHASE 3: Agent 2 (Validate Primary Company)
+        # ====================================================
+        final_insight = None
+        raw_texts = [e['raw_text'] for e in unique_entries]
+
+        with metrics.span("agent_2"):
+            for event in validate_and_extract(company_name, requirements, raw_texts):
+                if event['type'] in ('log', 'partial'):  # 'partial': streamed summary text
+                    yield event
+                elif event['type'] == 'competitors':
+                    # Auto-detection: start fetching while Agent 2 finishes its answer
+                    if enable_comparison and not competitor_names_str:
+                        speculative = event['names'][:3]
+                        yield {'type': 'log', 'message': f'Auto-detected competitors: {speculative}'}
+                        competitor_fetches.start(speculative)
+                elif event['type'] == 'result':
+                    final_insight = event['payload']
+                yield from competitor_fetches.drain()
+                yield from logo.drain()
+
+        # Golden record: the validated profile onto the Company row, for /api/companies/
+        with metrics.span("golden_record"):
+            golden_events = save_golden_record(company_name, final_insight, agent_1_response.get('official_domain'))
+        yield from golden_events
+
+        # ====================================================
+        # 🟢 PHASE 4: OPTIMIZED PARALLEL COMPARISON
+        # ====================================================
+        comparison_result = None
+        competitors, auto_detected = resolve_competitors(enable_comparison, competitor_names_str, final_insight)
+        if auto_detected and not competitor_fetches.started(competitors):
+            yield {'type': 'log', 'message': f'Auto-detected competitors: {competitors}'}
+
+        if competitors:
+            try:
+                from ..agent_3_comparison import compare_companies
+                yield {'type': 'log', 'message': f'Agent 3: Analyzing {len(competitors)} competitors simultaneously...'}
+
+                # Already running (or finished) for named and early-detected competitors
+                with metrics.span("competitor_wait"):
+                    competitor_data_list = yield from competitor_fetches.collect(competitors)
+
+                if competitor_data_list:
+                    with metrics.span("agent_3"):
+                        comparison_result = compare_companies(company_name, final_insight, competitor_data_list)
+            except Exception as e:
+                import traceback
+                print(f"Agent 3 Error: {traceback.format_exc()}")
+                yield {'type': 'log', 'message': f'Agent 3 Error: {str(e)}'}
+
+        # ====================================================
+        # PHASE 5: FINAL RESPONSE
+        # ====================================================
+        yield {'type': 'log', 'message': 'Finalizing...'}
+        yield from logo.drain()
+
+        final_payload = build_final_payload(
+            company_name, agent_1_response, final_insight, comparison_result, logo.logo, dedupe,
+            timings.summary()
+        )
+        yield {'type': 'complete', 'payload': final_payload}
+
+    except Exception as outer_e:
+        import traceback
+        print(f"CRITICAL STREAM ERROR: {traceback.format_exc()}")
+        yield {'type': 'error', 'message': f'Server Error: {str(outer_e)}'}
+    finally:
+        competitor_fetches.close()
+        metrics.end_request(timings)
+
+
+async def arun_research(company_name, requirements, enable_comparison=False, competitor_names_str=""):
+    """
+    run_research() for ASGI: same phases and events, but every wait (search, pages, Azure)
+    happens on the event loop, so one process can hold many open streams.
+    """
+    competitor_fetches = ACompetitorFetches()
+    logo = ALogoLookup(company_name)
+    timings = metrics.start_request()
+    try:
+        for event in await logo.aknown():
+            yield event
+
+        if enable_comparison and competitor_names_str:
+            competitor_fetches.start(resolve_competitors(enable_comparison, competitor_names_str, None)[0])
+
+        # PHASE 1: Agent 1
+        agent_1_response = None
+        with metrics.span("agent_1"):
+            async for event in afetch_roc_data(company_name, requirements):
+                if event['type'] == 'log':
+                    yield event
+                elif event['type'] == 'official_domain':
+                    logo.start(event['url'])
+                elif event['type'] == 'result':
+                    agent_1_response = event['payload']
+                    logo.start(agent_1_response.get('official_domain'))
+                for side_event in competitor_fetches.drain() + logo.drain():
+                    yield side_event
+
+        if not agent_1_response or agent_1_response.get("status") != "success":
+            error_msg = agent_1_response.get('message', 'Agent 1 failed.') if agent_1_response else 'Agent 1 failed.'
+            yield {'type': 'error', 'message': error_msg}
+            return
+
+        # PHASE 2: Store Evidence (one representative per near-duplicate cluster)
+        with metrics.span("dedupe"):
+            unique_entries, new_entries, dedupe = await sync_to_async(dedupe_evidence, thread_sensitive=False)(
+                company_name, agent_1_response.get("data", [])
+            )
+        for event in dedupe_log(dedupe):
+            yield event
+
+        yield {'type': 'log', 'message': 'Saving sources...'}
+        try:
+            with metrics.span("store_evidence"):
+                await sync_to_async(store_evidence)(company_name, requirements, new_entries)
+        except Exception as e:
+            yield {'type': 'log', 'message': f'DB Error: {str(e)}'}
+
+        # PHASE 3: Agent 2
+        final_insight = None
+        raw_texts = [e['raw_text'] for e in unique_entries]
+
+        with metrics.span("agent_2"):
+            async for event in avalidate_and_extract(company_name, requirements, raw_texts):
+                if event['type'] in ('log', 'partial'):
+                    yield event
+                elif event['type'] == 'competitors':
+                    if enable_comparison and not competitor_names_str:
+                        speculative = event['names'][:3]
+                        yield {'type': 'log', 'message': f'Auto-detected competitors: {speculative}'}
+                        competitor_fetches.start(speculative)
+                elif event['type'] == 'result':
+                    final_insight = event['payload']
+                for side_event in competitor_fetches.drain() + logo.drain():
+                    yield side_event
+
+        with metrics.span("golden_record"):
+            golden_events = await sync_to_async(save_golden_record)(
+                company_name, final_insight, agent_1_response.get('official_domain')
+            )
+        for event in golden_events:
+            yield event
+
+        # PHASE 4: Agent 3 (competitors already running on the loop)
+        comparison_result = None
+        competitors, auto_detected = resolve_competitors(enable_comparison, competitor_names_str, final_insight)
+        if auto_detected and not competitor_fetches.started(competitors):
+            yield {'type': 'log', 'message': f'Auto-detected competitors: {competitors}'}
+
+        if competitors:
+            try:
+                from ..agent_3_comparison import acompare_companies
+                yield {'type': 'log', 'message': f'Agent 3: Analyzing {len(competitors)} competitors simultaneously...'}
+
+                competitor_data_list = []
+                with metrics.span("competitor_wait"):
+                    async for event in competitor_fetches.collect(competitors, competitor_data_list):
+                        yield event
+
+                if competitor_data_list:
+                    with metrics.span("agent_3"):
+                        comparison_result = await acompare_companies(company_name, final_insight, competitor_data_list)
+            except Exception as e:
+                import traceback
+                print(f"Agent 3 Error: {traceback.format_exc()}")
+                yield {'type': 'log', 'message': f'Agent 3 Error: {str(e)}'}
+
+        # PHASE 5: FINAL RESPONSE
+        yield {'type': 'log', 'message': 'Finalizing...'}
+        for event in logo.drain():
+            yield event
+
+        final_payload = build_final_payload(
+            company_name, agent_1_response, final_insight, comparison_result, logo.logo, dedupe,
+            timings.summary()
+        )
+        yield {'type': 'complete', 'payload': final_payload}
+
+    except Exception as outer_e:
+        import traceback
+        print(f"CRITICAL STREAM ERROR: {traceback.format_exc()}")
+        yield {'type': 'error', 'message': f'Server Error: {str(outer_e)}'}
+    finally:
+        competitor_fetches.close()
+        metrics.end_request(timings)
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import socket
+import threading
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from ..models import ResearchJob, ResearchJobEvent
+
+# ==============================================================================
+# 📬 JOB QUEUE: research runs persisted in the DB, executed by `manage.py research_worker`
+# ==============================================================================
+JOB_POLL_INTERVAL = float(os.getenv("RESEARCH_JOB_POLL_INTERVAL", "1.0"))     # Idle worker / SSE poll period (s)
+JOB_STALE_AFTER = int(os.getenv("RESEARCH_JOB_STALE_AFTER", "300"))          # Running job with no heartbeat for this long is requeued
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("RESEARCH_JOB_HEARTBEAT_INTERVAL", "30"))  # Heartbeat period while a job runs (s)
+JOB_MAX_ATTEMPTS = int(os.getenv("RESEARCH_JOB_MAX_ATTEMPTS", "2"))
+SSE_KEEPALIVE = 15                                                           # Seconds between keepalive comments
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+
+def enqueue(owner, company_name, requirements, enable_comparison=False, competitor_names_str="", force_refresh=False):
+    return ResearchJob.objects.create(
+        owner=owner if owner is not None and owner.is_authenticated else None,
+        company_name=company_name,
+        requirements=requirements,
+        enable_comparison=bool(enable_comparison),
+        competitor_names=competitor_names_str or "",
+        force_refresh=bool(force_refresh),
+    )
+
+
+def claim_next(worker_name):
+    """
+    Atomically move the oldest queued job to 'running' and return it (or None).
+    The conditional UPDATE is the lock, so this works the same on SQLite and Postgres.
+    """
+    queued = ResearchJob.objects.filter(status='queued')
+    while True:
+        # Single requests first, so a long batch can't starve them; paused batches are skipped
+        candidates = (
+            list(queued.filter(batch__isnull=True).order_by('created_at').values_list('id', flat=True)[:5])
+            or list(queued.filter(batch__status='running').order_by('created_at').values_list('id', flat=True)[:5])
+        )
+        if not candidates:
+            return None
+        for job_id in candidates:
+            now = timezone.now()
+            claimed = ResearchJob.objects.filter(pk=job_id, status='queued').exclude(batch__status='paused').update(
+                status='running', worker=worker_name, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return ResearchJob.objects.get(pk=job_id)
+        # Other workers took every candidate: look again, more jobs may be queued behind them
+
+
+def requeue_stale():
+    """Put 'running' jobs whose worker stopped heartbeating back in the queue (or fail them)."""
+    cutoff = timezone.now() - timedelta(seconds=JOB_STALE_AFTER)
+    stale = ResearchJob.objects.filter(status='running').filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True))
+    failed = stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(
+        status='failed', error='Worker stopped responding.', finished_at=timezone.now()
+    )
+    requeued = stale.update(status='queued', worker='')
+    return requeued, failed
+
+
+class JobLost(Exception):
+    """The job was requeued (and maybe claimed by another worker) while this one was running it."""
+
+
+def _owned(job):
+    return ResearchJob.objects.filter(pk=job.pk, status='running', worker=job.worker)
+
+
+def _append_event(job, seq, event):
+    # The conditional UPDATE comes first: it locks the job row (the database, on SQLite), so
+    # a worker that lost the job can't interleave its events with the new owner's
+    with transaction.atomic():
+        if not _owned(job).update(heartbeat_at=timezone.now()):
+            raise JobLost(job.pk)
+        ResearchJobEvent.objects.create(job=job, seq=seq, event=event)
+
+
+class _Heartbeat:
+    """
+    Keeps heartbeat_at fresh every JOB_HEARTBEAT_INTERVAL while a job runs, whether or not
+    it emits events (an LLM quota wait alone can outlast JOB_STALE_AFTER).
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"job-heartbeat-{job.pk}")
+
+    def _run(self):
+        try:
+            while not self._stop.wait(JOB_HEARTBEAT_INTERVAL):
+                try:
+                    if not _owned(self.job).update(heartbeat_at=timezone.now()):
+                        self.lost = True
+                        return
+                except Exception as e:
+                    print(f"DEBUG: Heartbeat for job {self.job.pk} failed: {e}")
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(job):
+    """
+    Run one claimed job to completion, persisting every event as it happens.
+    Every write is conditional on this worker still owning the job; once it doesn't,
+    the run stops with JobLost and leaves the job to its new owner.
+    """
+    from ..research_cache import cached_research
+
+    with _Heartbeat(job):
+        # A retried job continues the event sequence so resumed streams stay ordered
+        last = job.events.order_by('-seq').values_list('seq', flat=True).first()
+        seq = last or 0
+        if seq:
+            seq += 1
+            _append_event(job, seq, {"type": "log", "message": "Restarting research after a worker interruption..."})
+
+        status, error, result = 'failed', 'Research ended without a result.', None
+        events = cached_research(
+            job.company_name, job.requirements, job.enable_comparison, job.competitor_names, job.force_refresh
+        )
+        try:
+            for event in events:
+                seq += 1
+                _append_event(job, seq, event)
+                if event["type"] == "complete":
+                    status, error, result = 'succeeded', '', event["payload"]
+                elif event["type"] == "error":
+                    status, error = 'failed', event.get("message", "")
+        except JobLost:
+            raise
+        except Exception as e:
+            seq += 1
+            error = f"Server Error: {e}"
+            _append_event(job, seq, {"type": "error", "message": error})
+        finally:
+            events.close()  # Stops the pipeline too when the job was lost mid-run
+
+        finished = timezone.now()
+        if not _owned(job).update(
+            status=status, error=error, result=result, finished_at=finished, heartbeat_at=finished,
+            duration_seconds=(finished - job.started_at).total_seconds(),
+        ):
+            raise JobLost(job.pk)
+
+
+def _fail(job, error):
+    try:
+        _owned(job).update(status='failed', error=error, finished_at=timezone.now())
+    except Exception as e:
+        print(f"DEBUG: Could not mark job {job.pk} failed: {e}")
+
+
+def worker_loop(stop_event, worker_name=None):
+    """Claim and run jobs until stop_event is set. One loop per worker thread."""
+    worker_name = worker_name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    try:
+        while not stop_event.is_set():
+            try:
+                job = claim_next(worker_name)
+            except Exception as e:
+                print(f"Worker {worker_name}: claiming a job failed: {e}")
+                connection.close()  # Next query reconnects
+                stop_event.wait(JOB_POLL_INTERVAL)
+                continue
+            if job is None:
+                stop_event.wait(JOB_POLL_INTERVAL)
+                continue
+            print(f"Worker {worker_name}: running job {job.pk} ({job.company_name})")
+            try:
+                run_job(job)
+            except JobLost:
+                print(f"Worker {worker_name}: job {job.pk} was requeued elsewhere; dropped it")
+            except Exception as e:
+                # Keep the thread alive for the next job; this one ends failed, not stuck 'running'
+                print(f"Worker {worker_name}: job {job.pk} crashed: {e}")
+                connection.close()
+                _fail(job, f"Server Error: {e}")
+    finally:
+        connection.close()
+
+
+def sse_job_events(job_id, last_event_id=0):
+    """
+    SSE lines for a job, starting after `last_event_id`, until the job is finished
+    and every event has been sent. Each event carries `id: <seq>` for Last-Event-ID resume.
+    """
+    sent = last_event_id
+    last_write = time.monotonic()
+    while True:
+        # Status first: a job is marked finished only after its last event is written
+        status = ResearchJob.objects.filter(pk=job_id).values_list('status', flat=True).first()
+        events = list(ResearchJobEvent.objects.filter(job_id=job_id, seq__gt=sent).order_by('seq'))
+        for ev in events:
+            sent = ev.seq
+            yield f"id: {ev.seq}\ndata: {json.dumps(ev.event)}\n\n"
+            last_write = time.monotonic()
+
+        if not events:
+            if status is None or status in TERMINAL_STATUSES:
+                return
+            if time.monotonic() - last_write > SSE_KEEPALIVE:
+                yield ": keepalive\n\n"
+                last_write = time.monotonic()
+            time.sleep(JOB_POLL_INTERVAL)
@@ -0,0 +1,146 @@
+import os
+import hashlib
+import threading
+from datetime import timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from django.db.models import F
+from django.utils import timezone
+from .models import PageCache
+
+# ==============================================================================
+# 📦 PAGE CACHE: extracted text per normalized URL (shared through the DB)
+# ==============================================================================
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", str(24 * 3600)))        # Seconds an entry is served without revalidation
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "5000")) # LRU rows beyond this are evicted
+EVICT_EVERY = 50                                                          # Check the size bound every N stores
+
+TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid", "ref", "ref_src"}  # plus any utm_*
+
+_stats = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "empty_skipped": 0, "evictions": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def cache_stats():
+    """Snapshot of this process's hit/miss counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def normalize_url(url):
+    """
+    Canonical form used as the cache key: lowercase scheme/host, no default port,
+    no fragment, no tracking parameters, sorted query, no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def _url_key(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def lookup(url):
+    """Return the cached row for `url` (fresh or stale), or None."""
+    try:
+        entry = PageCache.objects.filter(url_key=_url_key(url)).first()
+    except Exception as e:
+        print(f"DEBUG: Page cache lookup failed: {e}")
+        _count("errors")
+        return None
+
+    if entry is not None and not entry.extracted_text:
+        entry = None  # Stored before empty extractions were refused; refetch it in full
+    if entry is None:
+        _count("misses")
+    return entry
+
+
+def is_fresh(entry):
+    return timezone.now() - entry.fetched_at < timedelta(seconds=PAGE_CACHE_TTL)
+
+
+def conditional_headers(entry):
+    """Validators for a conditional GET against a stale entry."""
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def mark_hit(entry, revalidated=False):
+    """Record a fresh hit, or a 304 that makes the entry fresh again."""
+    _count("revalidated" if revalidated else "hits")
+    now = timezone.now()
+    fields = {"last_accessed": now, "hit_count": F("hit_count") + 1}
+    if revalidated:
+        fields["fetched_at"] = now
+    try:
+        PageCache.objects.filter(pk=entry.pk).update(**fields)
+    except Exception as e:
+        print(f"DEBUG: Page cache touch failed: {e}")
+        _count("errors")
+
+
+def store(url, extracted_text, etag=None, last_modified=None):
+    """
+    Insert or refresh the entry for `url` after a full 200 download. Empty text (a failed or
+    JS-only extraction) is not stored: it would be served as a fresh hit for PAGE_CACHE_TTL.
+    """
+    if not (extracted_text or "").strip():
+        _count("empty_skipped")
+        return
+    now = timezone.now()
+    try:
+        PageCache.objects.update_or_create(
+            url_key=_url_key(url),
+            defaults={
+                "url": url[:2000],
+                "extracted_text": extracted_text,
+                "etag": (etag or "")[:255],
+                "last_modified": (last_modified or "")[:64],
+                "fetched_at": now,
+                "last_accessed": now,
+            },
+        )
+    except Exception as e:
+        print(f"DEBUG: Page cache store failed: {e}")
+        _count("errors")
+        return
+
+    _count("stores")
+    if cache_stats()["stores"] % EVICT_EVERY == 0:
+        evict()
+
+
+def evict():
+    """Trim the table back to PAGE_CACHE_MAX_ENTRIES, least recently used first."""
+    try:
+        cutoff = list(
+            PageCache.objects.order_by("-last_accessed")
+            .values_list("last_accessed", flat=True)[PAGE_CACHE_MAX_ENTRIES:PAGE_CACHE_MAX_ENTRIES + 1]
+        )
+        if not cutoff:
+            return
+        deleted, _ = PageCache.objects.filter(last_accessed__lte=cutoff[0]).delete()
+        _count("evictions", deleted)
+    except Exception as e:
+        print(f"DEBUG: Page cache eviction failed: {e}")
+        _count("errors")
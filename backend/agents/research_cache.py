@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from .models import ResearchCache
+from .orchestrator.coordinator import run_research, arun_research
+
+# ==============================================================================
+# ⚡ RESULT CACHE: replay finished research runs, refresh stale ones in the background
+# ==============================================================================
+RESEARCH_CACHE_TTL = int(os.getenv("RESEARCH_CACHE_TTL", "3600"))                    # Served as-is while younger than this
+RESEARCH_CACHE_STALE_TTL = int(os.getenv("RESEARCH_CACHE_STALE_TTL", str(7 * 24 * 3600)))  # Max age still served under SWR
+RESEARCH_CACHE_SWR = os.getenv("RESEARCH_CACHE_SWR", "True") == "True"               # Stale-while-revalidate on/off
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "1000"))     # LRU rows beyond this are evicted
+EVICT_EVERY = 50                                                                     # Check the bounds every N stores
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "stores": 0, "refreshes": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def cache_stats():
+    """Snapshot of this process's result-cache counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+
+def make_key(company_name, requirements, enable_comparison=False, competitor_names_str=""):
+    topics = [_normalize(t) for t in re.split(r"[\n,]", requirements or "") if t.strip()]
+    competitors = sorted(_normalize(c) for c in (competitor_names_str or "").split(",") if c.strip())
+    raw = json.dumps({
+        "company": _normalize(company_name),
+        "requirements": topics,
+        "comparison": bool(enable_comparison),
+        "competitors": competitors if enable_comparison else [],
+    }, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _lookup(key):
+    try:
+        return ResearchCache.objects.filter(cache_key=key).first()
+    except Exception as e:
+        print(f"DEBUG: Research cache lookup failed: {e}")
+        return None
+
+
+def _store(key, company_name, payload):
+    # Don't pin failed Agent 2 answers; the next request should try again
+    final_answer = payload.get("final_answer") or {}
+    if payload.get("status") != "success" or final_answer.get("error"):
+        return
+    now = timezone.now()
+    try:
+        ResearchCache.objects.update_or_create(
+            cache_key=key,
+            defaults={"company_name": company_name[:255], "payload": payload, "created_at": now, "last_accessed": now},
+        )
+    except Exception as e:
+        print(f"DEBUG: Research cache store failed: {e}")
+        return
+
+    _count("stores")
+    if cache_stats()["stores"] % EVICT_EVERY == 0:
+        evict()
+
+
+def evict():
+    """
+    Drops entries too old to ever be replayed again (past RESEARCH_CACHE_STALE_TTL, or
+    RESEARCH_CACHE_TTL with SWR off), then trims the table back to RESEARCH_CACHE_MAX_ENTRIES,
+    least recently used first.
+    """
+    max_age = RESEARCH_CACHE_STALE_TTL if RESEARCH_CACHE_SWR else RESEARCH_CACHE_TTL
+    try:
+        expired, _ = ResearchCache.objects.filter(created_at__lte=timezone.now() - timedelta(seconds=max_age)).delete()
+        cutoff = list(
+            ResearchCache.objects.order_by("-last_accessed")
+            .values_list("last_accessed", flat=True)[RESEARCH_CACHE_MAX_ENTRIES:RESEARCH_CACHE_MAX_ENTRIES + 1]
+        )
+        trimmed = ResearchCache.objects.filter(last_accessed__lte=cutoff[0]).delete()[0] if cutoff else 0
+        _count("evictions", expired + trimmed)
+    except Exception as e:
+        print(f"DEBUG: Research cache eviction failed: {e}")
+
+
+def _run_and_store(key, company_name, requirements, enable_comparison, competitor_names_str):
+    for event in run_research(company_name, requirements, enable_comparison, competitor_names_str):
+        if event["type"] == "complete":
+            _store(key, company_name, event["payload"])
+        yield event
+
+
+def _refresh_in_background(key, *args):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return  # Another stream is already refreshing this entry
+        _refreshing.add(key)
+    _count("refreshes")
+
+    def worker():
+        try:
+            for _ in _run_and_store(key, *args):
+                pass
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+            connection.close()
+
+    threading.Thread(target=worker, daemon=True, name="research-refresh").start()
+
+
+def _replay(key, args):
+    """
+    Events to send for a usable cache entry (starting a background refresh if it is stale),
+    or None when the pipeline has to run.
+    """
+    entry = _lookup(key)
+    if not entry:
+        _count("misses")
+        return None
+
+    age = (timezone.now() - entry.created_at).total_seconds()
+    stale = age >= RESEARCH_CACHE_TTL
+    if stale and not (RESEARCH_CACHE_SWR and age < RESEARCH_CACHE_STALE_TTL):
+        _count("misses")
+        return None
+    _count("stale_hits" if stale else "hits")
+
+    try:
+        ResearchCache.objects.filter(pk=entry.pk).update(
+            last_accessed=timezone.now(), hit_count=F("hit_count") + 1
+        )
+    except Exception as e:
+        print(f"DEBUG: Research cache touch failed: {e}")
+
+    if stale:
+        _refresh_in_background(key, *args)
+    return [
+        {"type": "log", "message": f"⚡ Serving saved research for {args[0]} ({int(age // 60)} min old)..."},
+        {"type": "complete", "payload": {
+            **entry.payload,
+            "cache": {"hit": True, "stale": stale, "age_seconds": int(age)}
+        }},
+    ]
+
+
+def cached_research(company_name, requirements, enable_comparison=False, competitor_names_str="", force_refresh=False):
+    """
+    run_research() behind the result cache.
+    Fresh hit -> replay the stored `complete` payload immediately.
+    Stale hit (SWR on) -> replay it and rerun the pipeline in the background.
+    Miss, expired or force_refresh -> run the pipeline and store its result.
+    """
+    args = (company_name, requirements, enable_comparison, competitor_names_str)
+    key = make_key(*args)
+
+    replay = None if force_refresh else _replay(key, args)
+    if replay:
+        yield from replay
+        return
+
+    yield from _run_and_store(key, *args)
+
+
+async def acached_research(company_name, requirements, enable_comparison=False, competitor_names_str="", force_refresh=False):
+    """cached_research() for the ASGI pipeline (background refreshes still run on a thread)."""
+    args = (company_name, requirements, enable_comparison, competitor_names_str)
+    key = make_key(*args)
+
+    replay = None if force_refresh else await sync_to_async(_replay, thread_sensitive=False)(key, args)
+    if replay:
+        for event in replay:
+            yield event
+        return
+
+    async for event in arun_research(*args):
+        if event["type"] == "complete":
+            await sync_to_async(_store, thread_sensitive=False)(key, company_name, event["payload"])
+        yield event
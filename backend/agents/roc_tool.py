@@ -1,210 +1,558 @@
-<<<<<<< HEAD
-import requests
+import os
 import re
-from bs4 import BeautifulSoup
+import time
+import asyncio
+import weakref
+import threading
+import functools
+import contextlib
+import concurrent.futures
 from urllib.parse import urlparse
-import trafilatura  # Ensure you have 'pip install trafilatura'
+from asgiref.sync import sync_to_async
+from ddgs import DDGS
+from django.db import connection
+from . import page_cache
+from . import metrics
+from . import extraction_pool
+from . import host_limits
+from .sources.roc import roc_scrapper
+from .search.search_cache import get_search_cache
 
-def fetch_roc_data(company_name, user_requirements):
+# ==============================================================================
+# ⚙️ FETCH LIMITS (shared by every research stream in this process; host-wide caps in host_limits)
+# ==============================================================================
+FETCH_MAX_WORKERS = int(os.getenv("ROC_FETCH_MAX_WORKERS", "8"))          # Process cap on pages in flight
+FETCH_PER_DOMAIN_LIMIT = int(os.getenv("ROC_FETCH_PER_DOMAIN_LIMIT", "2")) # Cap per host across all streams
+FETCH_TIMEOUT = float(os.getenv("ROC_FETCH_TIMEOUT", "10"))                # Seconds per page (download + extract)
+SEARCH_MAX_WORKERS = int(os.getenv("ROC_SEARCH_MAX_WORKERS", "4"))         # Process cap on DDGS queries in flight
+SEARCH_SLOT_WAIT = 30                                                      # Seconds a query waits for a host search slot
+PAGE_MAX_BYTES = int(os.getenv("ROC_PAGE_MAX_BYTES", str(2 * 1024 * 1024))) # Bigger pages are skipped (or cut, if unannounced)
+
+_fetch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="roc-fetch")
+_search_executor = concurrent.futures.ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="roc-search")
+_domain_slots = {}
+_domain_slots_lock = threading.Lock()
+_ddgs_client = None
+_ddgs_client_lock = threading.Lock()
+
+BLOCKED_DOMAINS = [
+    "facebook.com", "instagram.com", "twitter.com", "youtube.com", "tiktok.com",
+    "reddit.com", "quora.com", "glassdoor.com", "medium.com"
+]
+
+
+# ------------------------------------------------------------------------------
+# What a page is worth downloading: decided from the headers, then from the first chunk
+# ------------------------------------------------------------------------------
+HTML_TYPES = {"text/html", "application/xhtml+xml", ""}  # "" = no Content-Type; trafilatura sniffs it
+
+LOGIN_WALL_MARKERS = (
+    "please login", "please log in", "log in to continue", "sign in to continue", "login required",
+)
+LOGIN_TITLE_RE = re.compile(r"<title[^>]*>[^<]*\b(log ?in|sign ?in)\b", re.IGNORECASE)
+PASSWORD_INPUT_RE = re.compile(r"<input[^>]+type=[\"']?password", re.IGNORECASE)
+
+
+def _content_type(headers):
+    return headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+
+def _plain_text(content, headers):
+    charset = re.search(r"charset=([\w-]+)", headers.get("Content-Type", ""))
+    try:
+        return content.decode(charset.group(1) if charset else "utf-8", errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+
+# Non-HTML types Agent 1 can read, and how (content, headers) -> text; anything else is never downloaded
+# (PDFs are the exception: see roc_scrapper, which streams them to disk rather than memory)
+CONTENT_HANDLERS = {
+    "text/plain": _plain_text,
+}
+
+
+def _accept_page(status_code, headers):
+    """Headers-only check (http_client `accept`): None to download the body, else why not."""
+    if status_code != 200:
+        return f"HTTP {status_code}"
+    content_type = _content_type(headers)
+    if content_type not in HTML_TYPES and content_type not in CONTENT_HANDLERS:
+        return content_type
+    length = headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > PAGE_MAX_BYTES:
+        return f"{int(length) // 1024} KB"
+    return None
+
+
+def _sniff_page(head):
+    """First-chunk check (http_client `sniff`): login walls are dropped before the rest downloads."""
+    text = head.decode("latin-1").lower()
+    if any(marker in text for marker in LOGIN_WALL_MARKERS):
+        return "login wall"
+    if PASSWORD_INPUT_RE.search(text) and LOGIN_TITLE_RE.search(text):
+        return "login wall"
+    return None
+
+
+def _skipped(job, response):
+    if response.skipped and response.status_code == 200:
+        job["skipped"] = response.skipped
+        metrics.inc("pages_skipped_total")
+    return None, "web"
+
+
+def _pooled(fn):
+    """
+    `fn` for a pool thread: the thread's DB connection (page and search cache) is closed after
+    each call. Django only does that for request threads; pool threads would hold theirs for good.
+    """
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            connection.close()
+    return run
+
+
+def _cache_call(fn):
+    """page_cache function for the async path: runs on a worker thread, connection closed after."""
+    return sync_to_async(_pooled(fn), thread_sensitive=False)
+
+
+def _domain_slot(domain):
+    with _domain_slots_lock:
+        if domain not in _domain_slots:
+            _domain_slots[domain] = threading.BoundedSemaphore(FETCH_PER_DOMAIN_LIMIT)
+        return _domain_slots[domain]
+
+
+def _search_client():
+    """One DDGS client for the whole process, so its HTTP session is reused across queries."""
+    global _ddgs_client
+    with _ddgs_client_lock:
+        if _ddgs_client is None:
+            _ddgs_client = DDGS()
+        return _ddgs_client
+
+
+def _run_search(query, max_results=4, region="wt-wt"):
+    with metrics.span("agent_1.search") as counts:
+        cache = get_search_cache()
+        results = cache.get(query, region, max_results)
+        if results is not None:
+            counts["cached"] = 1
+            return results
+
+        with host_limits.searches.slot(timeout=SEARCH_SLOT_WAIT):  # Shared with every process on the host
+            results = list(_search_client().text(query, region=region, max_results=max_results))
+        if results:  # Empty lists are often rate limiting, so don't pin them
+            cache.set(query, region, max_results, results)
+        return results
+
+
+def _fetch_page(job):
     """
-    Agent 1 (Deep Scraper - Scalable Version): 
-    1. Searches for links.
-    2. VISITS up to 10 top links.
-    3. Returns data + list of sources.
+    Runs on the shared fetch pool: download + extract a single page.
+    Returns (extracted_text, origin) where origin is "cache", "revalidated" or "web".
     """
-    print(f"🔎 Agent 1: Deep searching for {company_name} | Need: {user_requirements}...")
-    
-    # 1. Construct Query
-    search_query = f"{company_name} {user_requirements} list text"
-    
-    url = "https://html.duckduckgo.com/html/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    data = {'q': search_query}
-    
-    collected_data = []
-    visited_sources_list = [] # <--- NEW: Track domains for UI
+    # 1. Fresh cache entry -> no network at all
+    cached = page_cache.lookup(job["url"])
+    if cached and page_cache.is_fresh(cached):
+        page_cache.mark_hit(cached)
+        return cached.extracted_text, "cache"
 
+    slot = _domain_slot(job["domain"])
+    if not slot.acquire(timeout=FETCH_TIMEOUT):
+        return None, "web"
+    host_slot = host_limits.fetches.acquire(timeout=FETCH_TIMEOUT)  # Shared with every process on the host
+    if host_slot is None:
+        slot.release()
+        return None, "web"
+    job["started"] = time.monotonic()
     try:
-        # --- PHASE 1: SEARCH ---
-        response = requests.post(url, data=data, headers=headers)
-        if response.status_code != 200:
-            return {"status": "error", "message": "Search blocked"}
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        results = soup.find_all('div', class_='result')
-        
-        # --- PHASE 2: VISIT & SCRAPE (Limit increased to 10) ---
-        target_count = 10 
-        success_count = 0
-        
-        for res in results: 
-            if success_count >= target_count: break 
-
-            link_tag = res.find('a', class_='result__a')
-            if not link_tag: continue
-            
-            target_url = link_tag.get('href')
-            domain = urlparse(target_url).netloc
-            
-            # Skip noise
-            if "facebook.com" in domain or "instagram.com" in domain:
-                continue
-
-            print(f"   👉 Visiting: {domain}...")
-            
-            try:
-                # 1. Download the Full Page
-                downloaded = trafilatura.fetch_url(target_url)
-                
-                # 2. Extract the Main Text
-                if downloaded:
-                    full_text = trafilatura.extract(downloaded)
-                else:
-                    full_text = None
-
-                if full_text and len(full_text) > 100:
-                    collected_data.append({
-                        "source_domain": domain,
-                        "source_url": target_url,
-                        "raw_text": full_text
-                    })
-                    visited_sources_list.append(domain) # Add to clean list
-                    success_count += 1
-                else:
-                    print(f"      ⚠️ Skipped {domain} (No readable text)")
-
-            except Exception as e:
-                print(f"      ❌ Error visiting {domain}")
-                continue
-
-        return {
-            "status": "success",
-            "company_name": company_name,
-            "data": collected_data,
-            "source_list": visited_sources_list # <--- Returns list for UI
+        # 2. Stale entry -> conditional GET with the stored validators (pooled, keep-alive client)
+        headers = page_cache.conditional_headers(cached)
+        with metrics.span("agent_1.page_fetch"):
+            # A PDF (ROC filing, annual report) is streamed to disk for the ROC parser instead
+            response, filing = roc_scrapper.get_page(
+                job["url"], _accept_page, headers=headers, timeout=FETCH_TIMEOUT,
+                max_bytes=PAGE_MAX_BYTES, sniff=_sniff_page,
+            )
+    finally:
+        host_limits.fetches.release(host_slot)
+        slot.release()
+
+    # 3. 304 -> reuse the stored text, skip download + extraction
+    if response.status_code == 304 and cached:
+        page_cache.mark_hit(cached, revalidated=True)
+        return cached.extracted_text, "revalidated"
+
+    if response.status_code != 200 or not (response.content or filing and filing.path):
+        return _skipped(job, response)
+
+    remaining = max(FETCH_TIMEOUT - (time.monotonic() - job["started"]), 1)
+    with metrics.span("agent_1.extract"):
+        handler = CONTENT_HANDLERS.get(_content_type(response.headers))
+        if filing:
+            full_text = roc_scrapper.read_filing(filing, timeout=remaining)
+        elif handler:
+            full_text = handler(response.content, response.headers)
+        else:
+            # ExtractionError (CPU/time budget) propagates: the page counts as failed and isn't cached
+            full_text = extraction_pool.extract(response.content, timeout=remaining)
+    page_cache.store(job["url"], full_text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return full_text, "web"
+
+
+# ------------------------------------------------------------------------------
+# Async fetch (ASGI pipeline): semaphores per event loop, pages via roc_scrapper.aget_page
+# ------------------------------------------------------------------------------
+_async_state = weakref.WeakKeyDictionary()
+
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_state:
+        _async_state[loop] = {
+            "global": asyncio.Semaphore(FETCH_MAX_WORKERS),
+            "domains": {},
         }
+    return _async_state[loop]
+
+
+@contextlib.asynccontextmanager
+async def _async_fetch_slot(domain):
+    state = _loop_state()
+    domain_slot = state["domains"].setdefault(domain, asyncio.Semaphore(FETCH_PER_DOMAIN_LIMIT))
+    async with state["global"], domain_slot, host_limits.fetches.aslot():
+        yield
+
+
+async def _afetch_page(job):
+    """
+    Async twin of _fetch_page: same cache rules, but the download waits on the event loop
+    instead of holding a pool thread. Extraction goes to the extraction process pool.
+    """
+    cached = await _cache_call(page_cache.lookup)(job["url"])
+    if cached and page_cache.is_fresh(cached):
+        await _cache_call(page_cache.mark_hit)(cached)
+        return cached.extracted_text, "cache"
+
+    # One deadline over the slot wait and the whole download: http_client's timeout is per
+    # read, so a server trickling bytes would otherwise hold the slot indefinitely
+    try:
+        async with asyncio.timeout(FETCH_TIMEOUT):
+            async with _async_fetch_slot(job["domain"]):
+                job["started"] = time.monotonic()
+                headers = page_cache.conditional_headers(cached)
+                with metrics.span("agent_1.page_fetch"):
+                    response, filing = await roc_scrapper.aget_page(
+                        job["url"], _accept_page, headers=headers, timeout=FETCH_TIMEOUT,
+                        max_bytes=PAGE_MAX_BYTES, sniff=_sniff_page,
+                    )
+    except TimeoutError:
+        job["timed_out"] = True  # Reported like poll()'s abandoned pages
+        return None, "web"
+
+    if response.status_code == 304 and cached:
+        await _cache_call(page_cache.mark_hit)(cached, revalidated=True)
+        return cached.extracted_text, "revalidated"
+
+    if response.status_code != 200 or not (response.content or filing and filing.path):
+        return _skipped(job, response)
+
+    remaining = max(FETCH_TIMEOUT - (time.monotonic() - job["started"]), 1)
+    with metrics.span("agent_1.extract"):
+        handler = CONTENT_HANDLERS.get(_content_type(response.headers))
+        if filing:
+            full_text = await roc_scrapper.aread_filing(filing, timeout=remaining)
+        elif handler:
+            full_text = await asyncio.wait_for(asyncio.to_thread(handler, response.content, response.headers), remaining)
+        else:
+            full_text = await extraction_pool.aextract(response.content, timeout=remaining)
+    await _cache_call(page_cache.store)(
+        job["url"], full_text, response.headers.get("ETag"), response.headers.get("Last-Modified")
+    )
+    return full_text, "web"
+
+
+class _PageFetchStage:
+    """
+    Bounded-concurrency page fetching for one research request.
+    Keeps at most `per_query_cap` pages in flight/accepted per query and
+    falls back to the next search hit when a page fails or times out.
+    `submit(job)` starts one fetch and returns a concurrent or asyncio future;
+    poll() drives the former, apoll() the latter.
+    """
+
+    def __init__(self, num_queries, submit, per_query_cap=3):
+        self.submit = submit
+        self.per_query_cap = per_query_cap
+        self.pending = {}          # future -> job
+        self.queries = [{"candidates": [], "in_flight": 0, "success": 0} for _ in range(num_queries)]
+        self.visited_domains = set()
+        self.accepted = []         # (query_idx, rank, entry)
+        self.official_candidates = []
+
+    def add_query_results(self, query_idx, results):
+        """Register one query's search hits (in any arrival order) and start fetching the first ones."""
+        candidates = []
+        for rank, res in enumerate(results):
+            target_url = res.get('href')
+            if not target_url: continue
+            candidates.append((rank, target_url))
+
+        self.queries[query_idx]["candidates"] = candidates
+        yield from self._schedule(query_idx)
+
+    def _schedule(self, query_idx):
+        state = self.queries[query_idx]
+        while state["candidates"] and state["in_flight"] + state["success"] < self.per_query_cap:
+            rank, target_url = state["candidates"].pop(0)
+            domain = urlparse(target_url).netloc.lower()
+
+            # Global Deduplication (domains in flight count as visited)
+            if domain in self.visited_domains or any(x in domain for x in BLOCKED_DOMAINS): continue
+
+            # 🟢 IDENTIFY OFFICIAL DOMAIN (For Logo Tool)
+            # If we see a result that isn't Wikipedia/LinkedIn, it's likely the company site
+            if not any(x in domain for x in ["wikipedia", "linkedin", "bloomberg", "reuters"]):
+                self.official_candidates.append((query_idx, rank, target_url))
+
+            yield {"type": "log", "message": f"Visiting: {domain}..."}
+
+            job = {"query_idx": query_idx, "rank": rank, "url": target_url, "domain": domain, "started": None}
+            self.visited_domains.add(domain)
+            self.pending[self.submit(job)] = job
+            state["in_flight"] += 1
+
+    def poll(self, block):
+        """
+        Yield log events for pages that have finished.
+        With block=True, keeps going until nothing is left in flight.
+        """
+        while self.pending:
+            done, _ = concurrent.futures.wait(
+                self.pending, timeout=0.25 if block else 0, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+            # Abandon pages that blew their time budget; the socket timeout will reap the thread
+            now = time.monotonic()
+            for future, job in list(self.pending.items()):
+                if future not in done and job["started"] and now - job["started"] > FETCH_TIMEOUT:
+                    del self.pending[future]
+                    job["timed_out"] = True
+                    yield from self._finish(job, None)
+
+            for future in done:
+                yield from self._complete(future)
+
+            if not block: return
+
+    async def apoll(self, block):
+        """
+        poll() for asyncio tasks. Nothing to abandon here: _afetch_page holds each page to
+        FETCH_TIMEOUT (slot wait + download) itself, then the remaining budget for extraction.
+        """
+        while self.pending:
+            done, _ = await asyncio.wait(
+                self.pending, timeout=0.25 if block else 0, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                for event in self._complete(task):
+                    yield event
+
+            if not block: return
+
+    def _complete(self, future):
+        job = self.pending.pop(future)
+        try:
+            full_text, origin = future.result()
+        except Exception:
+            full_text, origin = None, "web"
+        job["origin"] = origin
+        yield from self._finish(job, full_text)
+
+    def _finish(self, job, full_text):
+        state = self.queries[job["query_idx"]]
+        state["in_flight"] -= 1
+
+        ok = (
+            full_text and len(full_text) > 300
+            and "please login" not in full_text.lower()
+            and state["success"] < self.per_query_cap
+        )
+        if ok:
+            self.accepted.append((job["query_idx"], job["rank"], {
+                "source_domain": job["domain"],
+                "source_url": job["url"],
+                "raw_text": full_text[:15000]
+            }))
+            state["success"] += 1
+            suffix = {"cache": " (cached)", "revalidated": " (unchanged, cached)"}.get(job.get("origin"), "")
+            yield {"type": "log", "message": f"Read: {job['domain']}{suffix}"}
+        else:
+            if job.get("timed_out"):
+                yield {"type": "log", "message": f"Timed out: {job['domain']}"}
+            elif job.get("skipped"):
+                yield {"type": "log", "message": f"Skipped: {job['domain']} ({job['skipped']})"}
+            # Free the domain so another query can still try it, then top up this query
+            self.visited_domains.discard(job["domain"])
+            yield from self._schedule(job["query_idx"])
+
+    def collected(self):
+        # Stable order (query order, then search rank) regardless of which page finished first
+        return [entry for _, _, entry in sorted(self.accepted, key=lambda a: (a[0], a[1]))]
+
+    @property
+    def official_domain(self):
+        # Earliest non-directory hit in query order, independent of which search answered first
+        return min(self.official_candidates)[2] if self.official_candidates else None
 
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-=======
-import re
-from urllib.parse import urlparse
-from ddgs import DDGS
-import trafilatura
-# 🟢 Import your new specific tool
-from .logo_tool import get_company_logo 
 
 # ==============================================================================
-# 🕵️‍♂️ AGENT 1: MULTI-QUERY SEARCHER + EXTERNAL LOGO TOOL
+# 🕵️‍♂️ AGENT 1: MULTI-QUERY SEARCHER
 # ==============================================================================
-def fetch_roc_data(company_name, user_requirements):
-    yield {"type": "log", "message": f"Agent 1: Analyzing requirements for {company_name}..."}
-    
+def build_search_queries(company_name, user_requirements):
     # 🟢 STEP 1: GENERATE SMART QUERIES
     # Split user input by newlines or commas to separate distinct topics
     raw_topics = [t.strip() for t in re.split(r'[\n,]', user_requirements) if t.strip()]
-    
+
     # Always start with a Broad Official Search
     search_queries = [f'"{company_name}" official corporate profile overview facts']
-    
+
     # Add specific queries for each user requirement (Limit to top 3 to keep speed high)
     for topic in raw_topics[:3]:
         # Clean up the topic to make it a better keyword (remove "how many", "what is")
         clean_topic = re.sub(r'\b(what is|how many|give me|tell me about)\b', '', topic, flags=re.IGNORECASE).strip()
         if len(clean_topic) > 2:
             search_queries.append(f'"{company_name}" {clean_topic}')
-            
-    # Deduplicate queries
-    search_queries = list(set(search_queries))
-    
-    collected_data = []
-    visited_sources_list = []
-    visited_domains = set()
-    official_domain = None
-    
-    BLOCKED_DOMAINS = [
-        "facebook.com", "instagram.com", "twitter.com", "youtube.com", "tiktok.com",
-        "reddit.com", "quora.com", "glassdoor.com", "medium.com"
-    ]
+
+    # Deduplicate queries (order-preserving, so results merge the same way every run)
+    return list(dict.fromkeys(search_queries))
+
+
+def _final_result(company_name, fetch_stage):
+    collected_data = fetch_stage.collected()
+
+    if not collected_data:
+        return {"type": "result", "payload": {"status": "error", "message": "No valid data found after multiple searches."}}
+
+    return {"type": "result", "payload": {
+        "status": "success",
+        "company_name": company_name,
+        "data": collected_data,
+        "source_list": [entry["source_domain"] for entry in collected_data],
+        "official_domain": fetch_stage.official_domain
+    }}
+
+
+def _official_domain_event(fetch_stage, query_idx, search_futures):
+    """
+    The homepage guess is settled once the broad official query (query 0) has answered,
+    or once every search has. Reported right away so the logo lookup can start while pages load.
+    """
+    if (query_idx == 0 or not search_futures) and fetch_stage.official_domain:
+        return [{"type": "official_domain", "url": fetch_stage.official_domain}]
+    return []
+
+
+def fetch_roc_data(company_name, user_requirements):
+    yield {"type": "log", "message": f"Agent 1: Analyzing requirements for {company_name}..."}
+
+    search_queries = build_search_queries(company_name, user_requirements)
+    fetch_stage = _PageFetchStage(
+        len(search_queries), submit=lambda job: _fetch_executor.submit(metrics.in_context(_pooled(_fetch_page)), job), per_query_cap=3
+    )
 
     try:
-        # 🟢 STEP 2: RUN MULTIPLE SEARCHES
-        for query in search_queries:
+        # 🟢 STEP 2: RUN ALL SEARCHES AT ONCE
+        # Use fewer results per query (e.g. 4) since we run multiple queries
+        search_futures = {}
+        for query_idx, query in enumerate(search_queries):
             print(f"DEBUG: DDGS Search for: {query}")
             yield {"type": "log", "message": f"Searching: {query}..."}
-            
-            # Use fewer results per query (e.g. 4) since we run multiple queries
-            results = list(DDGS().text(query, region="wt-wt", max_results=4))
-            
-            if not results: continue
-
-            # --- PROCESS RESULTS ---
-            target_count_per_query = 3
-            success_count = 0
-            
-            for res in results: 
-                if success_count >= target_count_per_query: break 
-                
-                target_url = res.get('href')
-                if not target_url: continue
-                
-                domain = urlparse(target_url).netloc.lower()
-                
-                # Global Deduplication
-                if domain in visited_domains or any(x in domain for x in BLOCKED_DOMAINS): continue
-                
-                # 🟢 IDENTIFY OFFICIAL DOMAIN (For Logo Tool)
-                # If we see a result that isn't Wikipedia/LinkedIn, it's likely the company site
-                if not official_domain and not any(x in domain for x in ["wikipedia", "linkedin", "bloomberg", "reuters"]):
-                    official_domain = target_url
-
-                yield {"type": "log", "message": f"Visiting: {domain}..."}
-                
+            search_futures[_search_executor.submit(metrics.in_context(_pooled(_run_search)), query, 4)] = query_idx
+
+        # Start visiting pages as soon as any search answers, while the others are still in flight
+        official_sent = False
+        while search_futures:
+            done, _ = concurrent.futures.wait(search_futures, timeout=0.25, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                query_idx = search_futures.pop(future)
                 try:
-                    downloaded = trafilatura.fetch_url(target_url)
-                    
-                    if downloaded:
-                        # 2. Extract Text
-                        full_text = trafilatura.extract(downloaded)
-
-                        if full_text and len(full_text) > 300:
-                            if "please login" in full_text.lower(): continue
-                                
-                            collected_data.append({
-                                "source_domain": domain,
-                                "source_url": target_url,
-                                "raw_text": full_text[:15000]
-                            })
-                            visited_sources_list.append(domain)
-                            visited_domains.add(domain)
-                            success_count += 1
-                    
-                except Exception: continue
-
-        # 🟢 FINAL STEP: Use the dedicated Logo Tool
-        # We pass the 'official_domain' we found (e.g., version1.com) to get the best logo
-        final_logo = get_company_logo(company_name, official_domain)
-        
-        if final_logo:
-            print(f"DEBUG: Logo found via API: {final_logo}")
-        else:
-            print("DEBUG: No logo found.")
+                    results = future.result()
+                except Exception as e:
+                    yield {"type": "log", "message": f"Search failed: {search_queries[query_idx]} ({e})"}
+                    continue
+                if results:
+                    yield from fetch_stage.add_query_results(query_idx, results)
+                if not official_sent:
+                    official_events = _official_domain_event(fetch_stage, query_idx, search_futures)
+                    official_sent = bool(official_events)
+                    yield from official_events
+            yield from fetch_stage.poll(block=False)
+
+        # 🟢 STEP 3: WAIT FOR THE REMAINING PAGES
+        yield from fetch_stage.poll(block=True)
+
+        # 🟢 FINAL STEP: the logo is resolved by the caller from the official_domain event,
+        # so it never holds up this result
+        yield _final_result(company_name, fetch_stage)
+
+    except Exception as e:
+        print(f"CRITICAL AGENT 1 ERROR: {e}")
+        yield {"type": "result", "payload": {"status": "error", "message": str(e)}}
+
+
+async def afetch_roc_data(company_name, user_requirements):
+    """
+    Agent 1 for the ASGI pipeline: same events and payload as fetch_roc_data.
+    DDGS has no async API, so searches still run on the shared search pool; pages are fetched with httpx.
+    """
+    yield {"type": "log", "message": f"Agent 1: Analyzing requirements for {company_name}..."}
+
+    search_queries = build_search_queries(company_name, user_requirements)
+    fetch_stage = _PageFetchStage(
+        len(search_queries), submit=lambda job: asyncio.ensure_future(_afetch_page(job)), per_query_cap=3
+    )
+
+    try:
+        loop = asyncio.get_running_loop()
+        search_futures = {}
+        for query_idx, query in enumerate(search_queries):
+            print(f"DEBUG: DDGS Search for: {query}")
+            yield {"type": "log", "message": f"Searching: {query}..."}
+            search_futures[loop.run_in_executor(_search_executor, metrics.in_context(_pooled(_run_search)), query, 4)] = query_idx
+
+        official_sent = False
+        while search_futures:
+            done, _ = await asyncio.wait(search_futures, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                query_idx = search_futures.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    yield {"type": "log", "message": f"Search failed: {search_queries[query_idx]} ({e})"}
+                    continue
+                if results:
+                    for event in fetch_stage.add_query_results(query_idx, results):
+                        yield event
+                if not official_sent:
+                    official_events = _official_domain_event(fetch_stage, query_idx, search_futures)
+                    official_sent = bool(official_events)
+                    for event in official_events:
+                        yield event
+            async for event in fetch_stage.apoll(block=False):
+                yield event
 
-        if not collected_data:
-             yield {"type": "result", "payload": {"status": "error", "message": "No valid data found after multiple searches."}}
-             return
+        async for event in fetch_stage.apoll(block=True):
+            yield event
 
-        yield {"type": "result", "payload": {
-            "status": "success",
-            "company_name": company_name,
-            "data": collected_data,
-            "source_list": visited_sources_list,
-            "logo": final_logo 
-        }}
+        yield _final_result(company_name, fetch_stage)
 
     except Exception as e:
         print(f"CRITICAL AGENT 1 ERROR: {e}")
         yield {"type": "result", "payload": {"status": "error", "message": str(e)}}
->>>>>>> final_version
@@ -0,0 +1,282 @@
+import re
+import time
+from django.conf import settings
+from django.db import connection
+from ..models import CompanyRawData, EvidenceBlob
+
+# ==============================================================================
+# 🔎 EVIDENCE SEARCH: full-text queries over CompanyRawData (raw_text, source_domain, user_prompt)
+# ==============================================================================
+# The text is stored compressed (EvidenceBlob), so the database can't index it by itself.
+# Migration 0012 sets the index up:
+#   fts5     -> agents_evidence_fts, external-content FTS5 over the agents_evidence_text view (which
+#               decompresses via the evidence_text() SQL function, for snippet() and 'rebuild');
+#               rows are added by index_new_evidence() and taken out by unindex_evidence(), with
+#               text decompressed in Python, so writes don't need the function (0017 dropped the triggers)
+#   tsvector -> search_vector column + GIN index, filled from Python by index_new_evidence()
+#   basic    -> no index; rows are decompressed and matched in Python (other databases, or SQLite without FTS5)
+# Snippets are built in a second query over the page's rows only, so only those are decompressed.
+MAX_PAGE_SIZE = 100
+SNIPPET_WORDS = 24
+FTS_TABLE = "agents_evidence_fts"
+FTS_DOCSIZE = f"{FTS_TABLE}_docsize"  # FTS5 shadow table: one row per indexed rowid
+
+# Also run by migration 0013, for the rows stored before the blob store
+PG_INDEX_SQL = """
+    UPDATE agents_companyrawdata r SET search_vector =
+        setweight(to_tsvector('english'::regconfig, coalesce(r.source_domain, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(r.user_prompt, '')), 'C') ||
+        to_tsvector('english'::regconfig, v.raw_text)
+    FROM unnest(%s::bigint[], %s::text[]) AS v(blob_id, raw_text)
+    WHERE r.blob_id = v.blob_id AND r.search_vector IS NULL
+"""
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+_fts_ready = None
+
+
+def _backend():
+    """EVIDENCE_SEARCH_BACKEND, downgraded to 'basic' if the FTS5 table was never created."""
+    global _fts_ready
+    backend = settings.EVIDENCE_SEARCH_BACKEND
+    if backend == 'fts5':
+        if _fts_ready is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                _fts_ready = cursor.fetchone() is not None
+        return backend if _fts_ready else 'basic'
+    return backend
+
+
+def _fts_write(cursor, rows, delete=False):
+    """(id, raw_text, source_domain, user_prompt) rows into the FTS5 index, or out of it with `delete`."""
+    if delete:
+        # External content: FTS5 takes the old values back to find the tokens to remove
+        sql = f"""INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, raw_text, source_domain, user_prompt)
+                  VALUES ('delete', %s, %s, %s, %s)"""
+    else:
+        sql = f"INSERT INTO {FTS_TABLE}(rowid, raw_text, source_domain, user_prompt) VALUES (%s, %s, %s, %s)"
+    cursor.executemany(sql, rows)
+
+
+def _fts_rows(cursor, column, values, indexed):
+    """(id, blob_id, source_domain, user_prompt) of the rows whose `column` is in `values`, in or out of the index."""
+    cursor.execute(f"""
+        SELECT r.id, r.blob_id, r.source_domain, r.user_prompt FROM agents_companyrawdata r
+        WHERE r.{column} IN ({", ".join(["%s"] * len(values))})
+          AND r.id {"IN" if indexed else "NOT IN"} (SELECT id FROM {FTS_DOCSIZE})
+    """, list(values))
+    return cursor.fetchall()
+
+
+def index_new_evidence(texts):
+    """
+    {blob id: text} just stored -> index the rows that point at them and aren't indexed yet.
+    Call inside the storing transaction.
+    """
+    if not texts:
+        return
+    backend = _backend()
+    if backend == 'tsvector':
+        with connection.cursor() as cursor:
+            cursor.execute(PG_INDEX_SQL, [list(texts), list(texts.values())])
+    elif backend == 'fts5':
+        with connection.cursor() as cursor:
+            rows = _fts_rows(cursor, "blob_id", texts, indexed=False)
+            _fts_write(cursor, [(id_, texts[blob_id], domain, prompt) for id_, blob_id, domain, prompt in rows])
+
+
+def unindex_evidence(ids):
+    """
+    Takes CompanyRawData `ids` out of the FTS5 index; call before deleting them, while their
+    blobs still exist, in the same transaction. Postgres drops search_vector with the row.
+    """
+    if not ids or _backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        rows = _fts_rows(cursor, "id", ids, indexed=True)
+        if not rows:
+            return
+        texts = dict(EvidenceBlob.objects.filter(id__in={row[1] for row in rows}).values_list('id', 'text'))
+        _fts_write(cursor, [(id_, texts[blob_id], domain, prompt) for id_, blob_id, domain, prompt in rows],
+                   delete=True)
+
+
+def repair_fts_index():
+    """
+    Rebuilds the FTS5 index if it still holds rows deleted without unindex_evidence() (the
+    admin, a cascade from Company, a raw sqlite3 session). Returns True if it had to.
+    """
+    if _backend() != 'fts5':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT 1 FROM {FTS_DOCSIZE} d
+            WHERE NOT EXISTS (SELECT 1 FROM agents_companyrawdata r WHERE r.id = d.id) LIMIT 1
+        """)
+        if not cursor.fetchone():
+            return False
+        # 'rebuild' re-reads everything through the view, so this needs evidence_text() registered
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def _fts5_query(query):
+    # Quote every term so user input can't inject FTS5 syntax (NEAR, column filters, stray quotes)
+    terms = TERM_RE.findall(query)
+    return " ".join(f'"{t}"' for t in terms)
+
+
+def _filters(company, domain):
+    sql, params = [], []
+    if company:
+        sql.append("c.name = %s")
+        params.append(company)
+    if domain:
+        sql.append("r.source_domain = %s")
+        params.append(domain)
+    return "".join(f" AND {clause}" for clause in sql), params
+
+
+def _rows(cursor):
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _search_fts5(query, company, domain, limit, offset):
+    match = _fts5_query(query)
+    if not match:
+        return 0, []
+    where, params = _filters(company, domain)
+    base = f"""
+        FROM {FTS_TABLE} f
+        JOIN agents_companyrawdata r ON r.id = f.rowid
+        JOIN agents_company c ON c.id = r.company_id
+        WHERE {FTS_TABLE} MATCH %s{where}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) {base}", [match, *params])
+        total = cursor.fetchone()[0]
+        # bm25() is lower-is-better; domain hits weigh more than the prompt that collected the page
+        cursor.execute(f"""
+            SELECT r.id, c.name AS company, r.source_domain, r.source_url, r.user_prompt, r.timestamp,
+                   bm25({FTS_TABLE}, 1.0, 2.0, 0.5) AS rank
+            {base}
+            ORDER BY rank LIMIT %s OFFSET %s
+        """, [match, *params, limit, offset])
+        rows = _rows(cursor)
+        # snippet() reads the text back through the view, so only ask for it on this page's rows
+        snippets = {}
+        if rows:
+            ids = [row["id"] for row in rows]
+            cursor.execute(f"""
+                SELECT rowid, snippet({FTS_TABLE}, 0, '[', ']', '…', {SNIPPET_WORDS})
+                FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s AND rowid IN ({", ".join(["%s"] * len(ids))})
+            """, [match, *ids])
+            snippets = dict(cursor.fetchall())
+    for row in rows:
+        score = -row.pop("rank")
+        row["snippet"] = snippets.get(row["id"], "")
+        row["score"] = round(score, 6)
+    return total, rows
+
+
+def _search_tsvector(query, company, domain, limit, offset):
+    where, params = _filters(company, domain)
+    base = f"""
+        FROM agents_companyrawdata r
+        JOIN agents_company c ON c.id = r.company_id,
+             websearch_to_tsquery('english'::regconfig, %s) q
+        WHERE r.search_vector @@ q{where}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) {base}", [query, *params])
+        total = cursor.fetchone()[0]
+        cursor.execute(f"""
+            SELECT r.id, c.name AS company, r.source_domain, r.source_url, r.user_prompt, r.timestamp,
+                   ts_rank_cd(r.search_vector, q) AS score
+            {base}
+            ORDER BY score DESC LIMIT %s OFFSET %s
+        """, [query, *params, limit, offset])
+        rows = _rows(cursor)
+        # ts_headline re-parses the document, so it only runs on the page, over text decompressed here
+        snippets = {}
+        if rows:
+            texts = dict(CompanyRawData.objects.filter(id__in=[row["id"] for row in rows]).values_list('id', 'blob__text'))
+            cursor.execute(f"""
+                SELECT v.id, ts_headline('english'::regconfig, v.raw_text, websearch_to_tsquery('english'::regconfig, %s),
+                                         'StartSel=[, StopSel=], MaxWords={SNIPPET_WORDS}, MinWords=8, MaxFragments=2')
+                FROM unnest(%s::bigint[], %s::text[]) AS v(id, raw_text)
+            """, [query, list(texts), [t or "" for t in texts.values()]])
+            snippets = dict(cursor.fetchall())
+    for row in rows:
+        row["snippet"] = snippets.get(row["id"], "")
+        row["score"] = round(float(row["score"]), 6)
+    return total, rows
+
+
+def _basic_snippet(text, terms):
+    lowered = text.lower()
+    hits = [lowered.find(t.lower()) for t in terms]
+    start = max(min((h for h in hits if h >= 0), default=0) - 80, 0)
+    words = text[start:].split()[:SNIPPET_WORDS]
+    return ("…" if start else "") + " ".join(words)
+
+
+def _search_basic(query, company, domain, limit, offset):
+    terms = [t.lower() for t in TERM_RE.findall(query)]
+    if not terms:
+        return 0, []
+    qs = CompanyRawData.objects.with_text().select_related('company').filter(blob__isnull=False)
+    if company:
+        qs = qs.filter(company__name=company)
+    if domain:
+        qs = qs.filter(source_domain=domain)
+
+    # No index and no SQL over compressed text: a full scan, decompressing in Python
+    total, rows = 0, []
+    for r in qs.order_by('-timestamp').iterator(chunk_size=200):
+        haystack = f"{r.raw_text}\n{r.source_domain}\n{r.user_prompt}".lower()
+        if not all(t in haystack for t in terms):
+            continue
+        total += 1
+        if offset < total <= offset + limit:
+            rows.append({
+                "id": r.pk,
+                "company": r.company.name,
+                "source_domain": r.source_domain,
+                "source_url": r.source_url,
+                "user_prompt": r.user_prompt,
+                "timestamp": r.timestamp,
+                "snippet": _basic_snippet(r.raw_text, terms),
+                "score": None,
+            })
+    return total, rows
+
+
+SEARCHERS = {'fts5': _search_fts5, 'tsvector': _search_tsvector, 'basic': _search_basic}
+
+
+def search_evidence(query, company=None, domain=None, page=1, page_size=20):
+    """
+    Ranked matches for `query` across every stored page, optionally limited to one
+    company (exact name) or source domain. Pages are 1-based.
+    """
+    page = max(int(page), 1)
+    page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+    backend = _backend()
+
+    started = time.perf_counter()
+    total, rows = SEARCHERS[backend](query.strip(), company, domain, page_size, (page - 1) * page_size)
+    return {
+        "query": query,
+        "backend": backend,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "pages": (total + page_size - 1) // page_size,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": rows,
+    }
@@ -0,0 +1,174 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from ..models import SearchCache
+
+# ==============================================================================
+# 🔁 SEARCH CACHE: DDGS hits per (normalized query, region, max_results)
+# ==============================================================================
+# SEARCH_CACHE_BACKEND: "memory" (per-process, dev) or "db" (shared across gunicorn workers)
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory" if settings.DEBUG else "db")
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))          # Seconds a result list is reused
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))  # LRU entries beyond this are evicted
+EVICT_EVERY = 50                                                               # DB backend: check the bound every N stores
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def make_key(query, region, max_results):
+    raw = f"{normalize_query(query)}|{region.lower()}|{int(max_results)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class BaseSearchCache:
+    """
+    Backend interface. get() returns the cached list of DDGS hits or None;
+    set() stores one. Both must never raise into the search path.
+    """
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def stats(self):
+        with self._stats_lock:
+            return {"backend": self.name, **self._stats}
+
+    def get(self, query, region, max_results):
+        raise NotImplementedError
+
+    def set(self, query, region, max_results, results):
+        raise NotImplementedError
+
+
+class InProcessSearchCache(BaseSearchCache):
+    """OrderedDict LRU with TTL. Each gunicorn worker gets its own copy."""
+    name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._entries = OrderedDict()  # key -> (stored_at, results)
+        self._lock = threading.Lock()
+
+    def get(self, query, region, max_results):
+        key = make_key(query, region, max_results)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self._count("hits")
+                return list(entry[1])
+            if entry:
+                del self._entries[key]
+                self._count("expired")
+        self._count("misses")
+        return None
+
+    def set(self, query, region, max_results, results):
+        key = make_key(query, region, max_results)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), list(results))
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+
+
+class DatabaseSearchCache(BaseSearchCache):
+    """SearchCache table in the configured DATABASES, shared by every worker process."""
+    name = "db"
+
+    def get(self, query, region, max_results):
+        try:
+            entry = SearchCache.objects.filter(cache_key=make_key(query, region, max_results)).first()
+            if entry and timezone.now() - entry.created_at < timedelta(seconds=self.ttl):
+                SearchCache.objects.filter(pk=entry.pk).update(
+                    last_accessed=timezone.now(), hit_count=F("hit_count") + 1
+                )
+                self._count("hits")
+                return entry.results
+            if entry:
+                self._count("expired")
+        except Exception as e:
+            print(f"DEBUG: Search cache lookup failed: {e}")
+            self._count("errors")
+        self._count("misses")
+        return None
+
+    def set(self, query, region, max_results, results):
+        now = timezone.now()
+        try:
+            SearchCache.objects.update_or_create(
+                cache_key=make_key(query, region, max_results),
+                defaults={
+                    "query": normalize_query(query),
+                    "region": region,
+                    "max_results": max_results,
+                    "results": list(results),
+                    "created_at": now,
+                    "last_accessed": now,
+                },
+            )
+        except Exception as e:
+            print(f"DEBUG: Search cache store failed: {e}")
+            self._count("errors")
+            return
+
+        self._count("stores")
+        if self.stats()["stores"] % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        try:
+            cutoff = list(
+                SearchCache.objects.order_by("-last_accessed")
+                .values_list("last_accessed", flat=True)[self.max_entries:self.max_entries + 1]
+            )
+            if not cutoff:
+                return
+            deleted, _ = SearchCache.objects.filter(last_accessed__lte=cutoff[0]).delete()
+            self._count("evictions", deleted)
+        except Exception as e:
+            print(f"DEBUG: Search cache eviction failed: {e}")
+            self._count("errors")
+
+
+BACKENDS = {
+    "memory": InProcessSearchCache,
+    "db": DatabaseSearchCache,
+}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Process-wide cache instance for the configured SEARCH_CACHE_BACKEND."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BACKENDS.get(SEARCH_CACHE_BACKEND, InProcessSearchCache)()
+        return _cache
+
+
+def search_cache_stats():
+    return get_search_cache().stats()
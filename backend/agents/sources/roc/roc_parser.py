@@ -0,0 +1,225 @@
+import os
+import re
+import logging
+import pymupdf
+from .roc_schemas import CinRecord, DirectorRecord, AmountRecord, RocFiling
+
+# ==============================================================================
+# 🧾 ROC PARSER: filings read one page at a time, stopping once the target sections are in
+# ==============================================================================
+# MuPDF opens a file lazily (cross-reference table first, page objects on demand), so only the
+# pages visited are ever parsed. Pages the outline points at for a target section are visited
+# first; the rest follow in order until CIN, directors, paid-up capital and revenue are all found.
+# No Django imports here: this runs in the extraction pool processes.
+PDF_MAX_PAGES = int(os.getenv("ROC_PDF_MAX_PAGES", "400"))  # Never read more pages than this
+STORE_SHRINK_EVERY = 10   # Pages between emptying MuPDF's object store, so memory tracks a page, not the file
+NO_TEXT_LIMIT = 5         # This many empty pages first -> a scan without a text layer; give up
+
+CIN_SEARCH_RE = re.compile(r"\b[LU]\d{5}[A-Z]{2}\d{4}[A-Z]{3}\d{6}\b")
+DIN_RE = re.compile(r"\(?\s*\bDIN\s*(?:No\.?|Number)?\s*[:.\-]?\s*(\d{8})\b\s*\)?", re.IGNORECASE)
+DIN_ONLY_RE = re.compile(r"^\(?(\d{8})\)?$")
+NAME_RE = re.compile(r"^(?:(?:Mr|Mrs|Ms|Dr|Shri|Smt)\.?\s+)?[A-Z][A-Za-z.'\-]*(?:\s+[A-Z][A-Za-z.'\-]*){1,5}$")
+TRAILING_NAME_RE = re.compile(r"((?:(?:Mr|Mrs|Ms|Dr|Shri|Smt)\.?\s+)?[A-Z][A-Za-z.'\-]*(?:\s+[A-Z][A-Za-z.'\-]*){1,5})[\s,:\-–]*$")
+DESIGNATION_RE = re.compile(
+    r"\b(Managing Director(?: (?:&|and) (?:CEO|Chief Executive Officer))?|Whole[\s\-]?time Director|"
+    r"(?:Non[\s\-])?Executive Director|Independent Director|Nominee Director|Additional Director|"
+    r"Chair(?:man|person|woman)|Director|Chief Executive Officer|CEO|Chief Financial Officer|CFO|Company Secretary)\b",
+    re.IGNORECASE,
+)
+
+PAID_UP_RE = re.compile(r"paid[\s\-]*up\s+(?:equity\s+)?(?:share\s+)?capital", re.IGNORECASE)
+REVENUE_RE = re.compile(r"revenue\s+from\s+operations|total\s+revenue|\bturnover\b", re.IGNORECASE)
+AMOUNT_RE = re.compile(
+    r"(?P<currency>₹|`|Rs\.?|INR)?\s*(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+\.\d+|\d{4,})"
+    r"(?:\s*(?P<unit>crores?|cr\b\.?|lakhs?|lacs?|millions?|mn\b|billions?|bn\b))?",
+    re.IGNORECASE,
+)
+# "(₹ in crore)", "(in ₹ lakhs)", "Amounts in INR million"; the ₹ glyph often extracts as junk, so any short token
+PAGE_UNIT_RE = re.compile(
+    r"(?:\(\s*(?:\S{1,4}\s+)?|\bamounts?\s+(?:are\s+)?)in\s+(?:₹|`|Rs\.?|INR)?\s*(crores?|lakhs?|lacs|millions?|billions?)\b",
+    re.IGNORECASE,
+)
+PERIOD_RE = re.compile(
+    r"\b(?:year|period)\s+ended\s+(?:on\s+)?"
+    r"(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+,?\s+\d{4}|[A-Za-z]+\s+\d{1,2},?\s+\d{4}|\d{1,2}[./\-]\d{1,2}[./\-]\d{4})",
+    re.IGNORECASE,
+)
+UNITS = {"cr": 1e7, "crore": 1e7, "lakh": 1e5, "lac": 1e5, "mn": 1e6, "million": 1e6, "bn": 1e9, "billion": 1e9}
+
+# Outline titles that point at each section (the cover pages are always read first, for the CIN)
+SECTION_TITLES = {
+    "directors": re.compile(r"board of directors|corporate information|key managerial|directors", re.IGNORECASE),
+    "paid_up_capital": re.compile(r"share capital|capital structure", re.IGNORECASE),
+    "revenue": re.compile(r"profit and loss|financial (?:highlights|performance)|revenue from operations", re.IGNORECASE),
+}
+COVER_PAGES = 3
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------------------
+# Per-page extractors
+# ------------------------------------------------------------------------------
+def _clean_name(name):
+    return re.sub(r"\s+", " ", name).strip(" ,:-–")
+
+
+def _designation(text):
+    match = DESIGNATION_RE.search(text or "")
+    return match.group(1) if match else None
+
+
+def _directors(lines, page_no):
+    """`Name (DIN: 01234567), Designation` on one line, or Name / DIN / Designation as table cells."""
+    found = []
+    for i, line in enumerate(lines):
+        inline = DIN_RE.search(line)
+        if inline:
+            before = TRAILING_NAME_RE.search(line[:inline.start()])
+            name = before.group(1) if before else (lines[i - 1] if i and NAME_RE.match(lines[i - 1]) else None)
+            if name:
+                rest = line[inline.end():] or (lines[i + 1] if i + 1 < len(lines) else "")
+                found.append(DirectorRecord(
+                    page=page_no, snippet=line[:300], name=_clean_name(name), din=inline.group(1),
+                    designation=_designation(rest),
+                ))
+            continue
+
+        cell = DIN_ONLY_RE.match(line)
+        if cell and i and NAME_RE.match(lines[i - 1]):
+            following = lines[i + 1] if i + 1 < len(lines) else ""
+            found.append(DirectorRecord(
+                page=page_no, snippet=" | ".join(lines[i - 1:i + 2])[:300], name=_clean_name(lines[i - 1]),
+                din=cell.group(1), designation=_designation(following),
+            ))
+    return found
+
+
+def _is_year(match):
+    number = match.group("number")
+    return not (match.group("currency") or match.group("unit")) and len(number) == 4 and 1900 <= int(number) <= 2100
+
+
+def _amount(kind, label_re, lines, page_text, page_no):
+    """First figure on the label's line (or the two after it); note numbers (`23`) and bare years are skipped."""
+    for i, line in enumerate(lines):
+        label = label_re.search(line)
+        if not label:
+            continue
+        window = [line[label.end():], *lines[i + 1:i + 3]]
+        for match in (m for text in window for m in AMOUNT_RE.finditer(text)):
+            if _is_year(match):
+                continue
+            raw = match.group(0).strip().replace("`", "₹")
+            unit = match.group("unit") or ""
+            if not unit:
+                page_unit = PAGE_UNIT_RE.search(page_text)
+                unit = page_unit.group(1) if page_unit else ""
+                raw = f"{raw} {unit}".strip()
+            multiplier = next((v for k, v in UNITS.items() if unit.lower().startswith(k)), 1)
+            try:
+                amount = float(match.group("number").replace(",", "")) * multiplier
+            except ValueError:
+                amount = None
+            period = PERIOD_RE.search(page_text)
+            return AmountRecord(
+                kind=kind, page=page_no, snippet=" ".join(lines[i:i + 3])[:300],
+                raw=raw, amount_inr=amount,
+                period=f"year ended {period.group(1)}" if period else None,
+            )
+    return None
+
+
+# ------------------------------------------------------------------------------
+# Page order and the parse loop
+# ------------------------------------------------------------------------------
+def _page_order(doc, limit):
+    """Cover pages, then pages the outline names for a target section (and the two after), then the rest."""
+    first = list(range(min(COVER_PAGES, limit)))
+    targeted = []
+    try:
+        toc = doc.get_toc(simple=True)
+    except Exception:
+        toc = []
+    for _, title, page in toc:
+        if page >= 1 and any(r.search(title) for r in SECTION_TITLES.values()):
+            targeted.extend(range(page - 1, min(page + 2, limit)))
+    seen = set()
+    return [p for p in (*first, *targeted, *range(limit)) if not (p in seen or seen.add(p))]
+
+
+def _directors_done(director_pages, visited):
+    # The list ends on the first page after it that has none (boards rarely span more than a page or two)
+    return any(p + 1 in visited and p + 1 not in director_pages for p in director_pages)
+
+
+def iter_records(doc, filing, max_pages=PDF_MAX_PAGES):
+    """
+    Yields CinRecord / DirectorRecord / AmountRecord as they are found, filling in `filing`
+    (pages read, stopped early) as it goes. Stops once every target section is in.
+    """
+    limit = min(doc.page_count, max_pages)
+    visited, director_pages, directors_seen = set(), set(), set()
+    empty = 0
+
+    for page_no in _page_order(doc, limit):
+        page = doc.load_page(page_no)
+        text = page.get_text("text")
+        page = None  # Let MuPDF free the page before the next one is loaded
+        visited.add(page_no)
+        filing.pages_read += 1
+        if filing.pages_read % STORE_SHRINK_EVERY == 0:
+            pymupdf.TOOLS.store_shrink(100)
+
+        if not text.strip():
+            empty += 1
+            if empty >= NO_TEXT_LIMIT and empty == filing.pages_read:
+                logger.info("ROC parser: no text layer in the first %d pages, giving up", empty)
+                break
+            continue
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+
+        if filing.cin is None:
+            match = CIN_SEARCH_RE.search(text)
+            if match:
+                line = next((l for l in lines if match.group() in l), match.group())
+                filing.cin = CinRecord(page=page_no + 1, snippet=line[:300], cin=match.group())
+                yield filing.cin
+
+        if not _directors_done(director_pages, visited):
+            for director in _directors(lines, page_no + 1):
+                key = director.din or director.name.lower()
+                if key in directors_seen:
+                    continue
+                directors_seen.add(key)
+                director_pages.add(page_no)
+                filing.directors.append(director)
+                yield director
+
+        if filing.paid_up_capital is None:
+            filing.paid_up_capital = _amount("paid_up_capital", PAID_UP_RE, lines, text, page_no + 1)
+            if filing.paid_up_capital:
+                yield filing.paid_up_capital
+
+        if filing.revenue is None:
+            filing.revenue = _amount("revenue", REVENUE_RE, lines, text, page_no + 1)
+            if filing.revenue:
+                yield filing.revenue
+
+        if filing.cin and filing.paid_up_capital and filing.revenue and _directors_done(director_pages, visited):
+            filing.stopped_early = filing.pages_read < limit
+            break
+
+
+def parse_filing(path, source_url=None, max_pages=PDF_MAX_PAGES):
+    """Reads the PDF at `path` (opened lazily, never loaded whole) into a RocFiling."""
+    filing = RocFiling(source_url=source_url)
+    with pymupdf.open(path) as doc:
+        if doc.needs_pass or not doc.is_pdf:
+            return filing
+        filing.total_pages = doc.page_count
+        for _ in iter_records(doc, filing, max_pages):
+            pass
+    pymupdf.TOOLS.store_shrink(100)
+    logger.debug("ROC parser: %d/%d pages, found %s", filing.pages_read, filing.total_pages, filing.sections_found())
+    return filing
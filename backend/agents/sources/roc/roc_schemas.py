@@ -0,0 +1,74 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+# ==============================================================================
+# 📑 ROC SCHEMAS: typed records read from ROC / MCA filings (annual returns, financials)
+# ==============================================================================
+
+class RocRecord(BaseModel):
+    """One value found in a filing, with where it came from."""
+    page: int                          # 1-based page number in the PDF
+    snippet: str = ""                  # The line(s) it was read from
+
+
+class CinRecord(RocRecord):
+    kind: Literal["cin"] = "cin"
+    cin: str
+
+
+class DirectorRecord(RocRecord):
+    kind: Literal["director"] = "director"
+    name: str
+    din: Optional[str] = None          # Director Identification Number (8 digits)
+    designation: Optional[str] = None
+
+
+class AmountRecord(RocRecord):
+    kind: Literal["paid_up_capital", "revenue"]
+    raw: str                           # As printed, e.g. "₹ 766.02 crore"
+    amount_inr: Optional[float] = None # In rupees, when the unit could be worked out
+    period: Optional[str] = None       # e.g. "year ended 31 March 2024"
+
+
+class RocFiling(BaseModel):
+    """Everything read from one filing, plus how much of it had to be read."""
+    source_url: Optional[str] = None
+    total_pages: int = 0
+    pages_read: int = 0
+    stopped_early: bool = False        # All target sections found before the last page
+    cin: Optional[CinRecord] = None
+    directors: List[DirectorRecord] = Field(default_factory=list)
+    paid_up_capital: Optional[AmountRecord] = None
+    revenue: Optional[AmountRecord] = None
+
+    def sections_found(self):
+        return [
+            name for name, value in (
+                ("cin", self.cin), ("directors", self.directors),
+                ("paid_up_capital", self.paid_up_capital), ("revenue", self.revenue),
+            ) if value
+        ]
+
+    def to_evidence_text(self):
+        """Plain-text digest stored as the page's raw_text, so Agent 2 reads it like any other source."""
+        lines = [f"ROC filing (PDF, {self.total_pages} pages, {self.pages_read} read)"]
+        if self.cin:
+            lines.append(f"Corporate Identity Number (CIN): {self.cin.cin} (page {self.cin.page})")
+        if self.directors:
+            lines.append("Directors:")
+            for d in self.directors:
+                details = ", ".join(x for x in (f"DIN {d.din}" if d.din else None, d.designation) if x)
+                lines.append(f"- {d.name}" + (f" ({details})" if details else "") + f" (page {d.page})")
+        for label, record in (("Paid-up capital", self.paid_up_capital), ("Revenue", self.revenue)):
+            if record:
+                inr = f" = INR {record.amount_inr:,.0f}" if record.amount_inr is not None else ""
+                period = f", {record.period}" if record.period else ""
+                lines.append(f"{label}{period}: {record.raw}{inr} (page {record.page})")
+
+        # The source lines, for the validator to check the figures against
+        snippets = [r.snippet for r in (self.cin, self.paid_up_capital, self.revenue, *self.directors[:5]) if r and r.snippet]
+        if snippets:
+            lines.append("")
+            lines.append("Excerpts:")
+            lines.extend(f"> {s}" for s in dict.fromkeys(snippets))
+        return "\n".join(lines)
@@ -0,0 +1,140 @@
+import os
+import tempfile
+from urllib.parse import urlsplit
+from ... import http_client
+from ... import extraction_pool
+
+# ==============================================================================
+# 📥 ROC SCRAPER: filing PDFs streamed to a temp file on disk, then parsed page by page
+# ==============================================================================
+# Filings run to tens of MB, so they never go through the in-memory page path: the body is
+# written to disk as it arrives and roc_parser opens that file lazily (in the extraction pool).
+PDF_MAX_BYTES = int(os.getenv("ROC_PDF_MAX_BYTES", str(40 * 1024 * 1024)))  # Bigger filings are skipped
+PDF_SPOOL_DIR = os.getenv("ROC_PDF_SPOOL_DIR") or None                     # Default: the system temp dir
+PDF_TYPES = {"application/pdf", "application/x-pdf"}
+
+
+def is_filing(content_type, url):
+    """PDF by Content-Type, or a generic binary type on a .pdf URL (the magic bytes are checked on download)."""
+    if content_type in PDF_TYPES:
+        return True
+    return content_type in ("application/octet-stream", "binary/octet-stream") and urlsplit(url).path.lower().endswith(".pdf")
+
+
+def _accept_pdf(status_code, headers):
+    if status_code != 200:
+        return f"HTTP {status_code}"
+    length = headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > PDF_MAX_BYTES:
+        return f"{int(length) // (1024 * 1024)} MB"
+    return None
+
+
+def _sniff_pdf(head):
+    # Servers label PDFs loosely (octet-stream, or an HTML error page labelled as a PDF), so check the magic bytes
+    return None if b"%PDF-" in head[:1024] else "not a PDF"
+
+
+class FilingDownload:
+    """A filing on disk at `path` (None if it was skipped); close() deletes it."""
+
+    def __init__(self, response, path):
+        self.response = response
+        self.path = path
+
+    def close(self):
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _spool_file():
+    return tempfile.NamedTemporaryFile(prefix="roc-", suffix=".pdf", dir=PDF_SPOOL_DIR, delete=False)
+
+
+def _finish(spool, response):
+    spool.close()
+    download = FilingDownload(response, spool.name)
+    if response.skipped or response.truncated or response.status_code != 200:
+        # A cut-off PDF is missing its cross-reference table; not worth MuPDF's repair pass
+        if response.truncated:
+            response.skipped = f"over {PDF_MAX_BYTES // (1024 * 1024)} MB"
+        download.close()
+    return download
+
+
+class _FilingSpool:
+    """
+    `accept` check for the page path that also takes filings: a 200 that turns out to be a PDF is
+    diverted to a spool file (under the PDF limits) as it streams, instead of being requested again.
+    Anything else goes to the page check it wraps.
+    """
+
+    def __init__(self, url, accept):
+        self.url = url
+        self.accept = accept
+        self.file = None
+
+    def __call__(self, status_code, headers):
+        content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if status_code != 200 or not is_filing(content_type, self.url):
+            return self.accept(status_code, headers)
+        reason = _accept_pdf(status_code, headers)
+        if reason:
+            return reason
+        self.file = _spool_file()
+        return http_client.Divert(self.file, PDF_MAX_BYTES, _sniff_pdf)
+
+    def download(self, response):
+        return _finish(self.file, response) if self.file else None
+
+    def discard(self):
+        if self.file:
+            self.file.close()
+            os.unlink(self.file.name)
+
+
+def get_page(url, accept, **kwargs):
+    """
+    http_client.get() with `accept` for pages; a filing at `url` is streamed to disk from the same
+    response, up to ROC_PDF_MAX_BYTES. Returns (response, FilingDownload or None).
+    """
+    spool = _FilingSpool(url, accept)
+    try:
+        response = http_client.get(url, accept=spool, **kwargs)
+    except BaseException:
+        spool.discard()
+        raise
+    return response, spool.download(response)
+
+
+async def aget_page(url, accept, **kwargs):
+    spool = _FilingSpool(url, accept)
+    try:
+        response = await http_client.aget(url, accept=spool, **kwargs)
+    except BaseException:
+        spool.discard()
+        raise
+    return response, spool.download(response)
+
+
+def read_filing(download, timeout=None):
+    """Parses a downloaded filing on the extraction pool -> evidence text (None if nothing was found)."""
+    with download:
+        filing = extraction_pool.parse_pdf(download.path, download.response.url, timeout=timeout)
+    return filing.to_evidence_text() if filing.sections_found() else None
+
+
+async def aread_filing(download, timeout=None):
+    with download:
+        filing = await extraction_pool.aparse_pdf(download.path, download.response.url, timeout=timeout)
+    return filing.to_evidence_text() if filing.sections_found() else None
@@ -1,3 +1,1554 @@
-from django.test import TestCase
+import os
+import sys
+import json
+import asyncio
+import time
+import tempfile
+import threading
+import contextvars
+import socket
+import subprocess
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+import httpcore
+import httpx
+import openai
+import zstandard
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from . import context_packer, evidence_archive, golden_record, host_limits, http_client
+from . import llm_limits, metrics, research_cache, roc_tool
+from .fields import ZSTD_MAGIC, decompress_text, register_sqlite_functions
+from .models import Company, CompanyRawData, EvidenceBlob, PageCache, ResearchCache, ResearchJob
+from .agent_2_validator import _PartialJsonFields
+from .orchestrator import batch, job_queue
+from .orchestrator.coordinator import store_evidence
+from .search.evidence_index import repair_fts_index, search_evidence, unindex_evidence
+from .validation import deduplication
+from .sources.roc import roc_parser, roc_scrapper
+
+
+# ==============================================================================
+# 🧩 AGENT 2: text fields read out of a partial JSON answer
+# ==============================================================================
+def _feed_all(chunks):
+    parser, fields = _PartialJsonFields(), {}
+    for chunk in chunks:
+        for field, text in parser.feed(chunk).items():
+            fields[field] = fields.get(field, "") + text
+    return fields
+
+
+class PartialJsonFieldsTests(SimpleTestCase):
+    ANSWER = json.dumps({
+        "summary": "Café \"Bar\" \U0001F600\nline two",
+        "Key_Answer": "CEO: A. Kumar",
+        "Competitors": ["X", "Y"],
+        "Details": "back\\slash",
+    })
+
+    def test_whole_answer(self):
+        self.assertEqual(_feed_all([self.ANSWER]), {
+            "summary": "Café \"Bar\" \U0001F600\nline two",
+            "Key_Answer": "CEO: A. Kumar",
+            "Details": "back\\slash",
+        })
+
+    def test_any_chunking_decodes_the_same(self):
+        expected = _feed_all([self.ANSWER])
+        self.assertEqual(_feed_all(list(self.ANSWER)), expected)
+        for cut in range(1, len(self.ANSWER)):
+            self.assertEqual(_feed_all([self.ANSWER[:cut], self.ANSWER[cut:]]), expected, cut)
+
+    def test_split_escapes_are_held_back(self):
+        parser = _PartialJsonFields()
+        self.assertEqual(parser.feed('{"summary": "a\\u00'), {"summary": "a"})
+        self.assertEqual(parser.feed('e9 \\ud83d'), {"summary": "é "})
+        self.assertEqual(parser.feed('\\ude00"'), {"summary": "\U0001F600"})
+
+    def test_malformed_unicode_escape_is_literal_text(self):
+        answer = '{"summary": "a\\u00zzb", "Details": "cut \\u12", "Key_Answer": "ok"}'
+        expected = {"summary": "a\\u00zzb", "Details": "cut \\u12", "Key_Answer": "ok"}
+        self.assertEqual(_feed_all([answer]), expected)
+        self.assertEqual(_feed_all(list(answer)), expected)
+
+    def test_high_surrogate_without_low_half(self):
+        self.assertEqual(_feed_all(['{"summary": "x\\ud83dy"}']), {"summary": "x\ud83dy"})
+
+
+# ==============================================================================
+# 🎯 CONTEXT PACKING: passages, BM25 ranking, near-duplicates and the token budget
+# ==============================================================================
+def _sentence(n, words=10):
+    return " ".join(f"w{n}x{i}" for i in range(words - 1)) + "."
+
+
+class ContextPackerTests(SimpleTestCase):
+    FILLER = "The weather in the valley was mild and the river ran slowly past the old mill."
+    REVENUE = "Acme Steel reported revenue of 420 crore in FY24, up from 380 crore, with revenue growth led by exports."
+    DIRECTORS = "The board of directors of Acme Steel has five members, including two independent directors."
+
+    def setUp(self):
+        patcher = mock.patch.object(context_packer, "_get_encoder", return_value=None)  # len // 4, no tiktoken download
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_split_merges_short_paragraphs(self):
+        text = "One two three.\n\nFour five.\nSix seven eight."
+        self.assertEqual(context_packer.split_passages(text, chunk_words=20), ["One two three. Four five. Six seven eight."])
+        self.assertEqual(context_packer.split_passages(text, chunk_words=5), ["One two three. Four five.", "Six seven eight."])
+
+    def test_split_cuts_long_paragraphs_on_sentences(self):
+        para = " ".join(_sentence(n) for n in range(5))
+        passages = context_packer.split_passages(para, chunk_words=25)
+        self.assertEqual(passages, [f"{_sentence(0)} {_sentence(1)}", f"{_sentence(2)} {_sentence(3)}", _sentence(4)])
+        self.assertEqual(context_packer.split_passages("  \n\n \n"), [])
+
+    def test_bm25_ranks_by_matching_terms(self):
+        terms = context_packer._terms
+        passages = [terms(self.FILLER), terms(self.DIRECTORS), terms(self.REVENUE)]
+        scores = context_packer.bm25_scores(terms("What is the revenue of Acme Steel?"), passages)
+        self.assertEqual(list(scores.argsort()[::-1]), [2, 1, 0])
+        self.assertEqual(scores[0], 0)
+        self.assertEqual(list(context_packer.bm25_scores([], passages)), [0, 0, 0])
+
+    def test_bm25_idf_discounts_common_terms(self):
+        terms = context_packer._terms
+        passages = [terms("acme acme acme report"), terms("acme exports"), terms("acme board")]
+        scores = context_packer.bm25_scores(terms("acme exports"), passages)
+        self.assertGreater(scores[1], scores[0])  # One rare term outweighs a common term three times
+
+    def test_best_passages_first_then_source_order(self):
+        sources = [self.DIRECTORS, self.FILLER, self.REVENUE]
+        context, stats = context_packer.pack_context("Acme Steel", "revenue growth", sources, token_budget=60)
+        self.assertIn(self.REVENUE, context)
+        self.assertIn(self.DIRECTORS, context)
+        self.assertNotIn(self.FILLER, context)  # Lowest score, and no room left for it
+        self.assertNotIn("SOURCE 2", context)
+        self.assertLess(context.index("SOURCE 1"), context.index(self.DIRECTORS))
+        self.assertLess(context.index(self.DIRECTORS), context.index("SOURCE 3"))
+        self.assertEqual((stats["passages"], stats["kept"], stats["sources"]), (3, 2, 2))
+        self.assertEqual(stats["tokens"], context_packer.count_tokens(self.REVENUE) + context_packer.count_tokens(self.DIRECTORS))
+
+    def test_near_duplicates_are_dropped(self):
+        copy = self.REVENUE.replace("exports", "exports.")  # Same shingles once tokenised
+        _, stats = context_packer.pack_context("Acme Steel", "revenue", [self.REVENUE, copy, self.DIRECTORS])
+        self.assertEqual((stats["kept"], stats["duplicates"]), (2, 1))
+
+    def test_budget_is_never_exceeded(self):
+        sources = ["\n\n".join(f"Acme revenue note {n}. " + _sentence(n, 40) for n in range(30))]
+        for budget in (0, 50, 120, 400):
+            context, stats = context_packer.pack_context("Acme", "revenue", sources, token_budget=budget)
+            self.assertLessEqual(stats["tokens"], budget)
+            self.assertEqual(stats["tokens"], sum(
+                context_packer.count_tokens(p) for p in context.split("\n") if p and not p.startswith("--- SOURCE")
+            ))
+        self.assertEqual(context_packer.pack_context("Acme", "revenue", sources, token_budget=0)[0], "")
+
+    def test_smaller_passage_fills_remaining_budget(self):
+        long = "Acme revenue " + _sentence(1, 200)
+        short = "Acme board " + _sentence(2, 8)
+        _, stats = context_packer.pack_context("Acme", "revenue board", [long, short], token_budget=40)
+        self.assertEqual(stats["kept"], 1)  # The long top match does not fit; the short one still does
+
+
+class TokenizerRetryTests(SimpleTestCase):
+    def setUp(self):
+        for name, value in (("_encoder", None), ("_encoder_retry_at", 0.0), ("_encoder_backoff", 0.0)):
+            patcher = mock.patch.object(context_packer, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failed_load_is_retried_after_backoff(self):
+        encoder = SimpleNamespace(encode=lambda text, disallowed_special: text.split())
+        clock = [1000.0]
+        with mock.patch("tiktoken.get_encoding", side_effect=[OSError("offline"), encoder]) as get, \
+                mock.patch.object(context_packer.time, "monotonic", lambda: clock[0]):
+            self.assertEqual(context_packer.count_tokens("one two three four five six seven eight"), 9)
+            self.assertEqual(context_packer.count_tokens("one two"), 1)  # Still backing off: no second try
+            self.assertEqual(get.call_count, 1)
+            clock[0] += context_packer.TOKENIZER_RETRY_MIN
+            self.assertEqual(context_packer.count_tokens("one two"), 2)
+            self.assertEqual(get.call_count, 2)
+
+    def test_backoff_grows_and_is_capped(self):
+        clock = [0.0]
+        with mock.patch("tiktoken.get_encoding", side_effect=OSError("offline")), \
+                mock.patch.object(context_packer.time, "monotonic", lambda: clock[0]):
+            waits = []
+            for _ in range(10):
+                context_packer._get_encoder()
+                waits.append(context_packer._encoder_backoff)
+                clock[0] = context_packer._encoder_retry_at
+        self.assertEqual(waits[:3], [5, 10, 20])
+        self.assertEqual(waits[-1], context_packer.TOKENIZER_RETRY_MAX)
+
+
+# ==============================================================================
+# 🪣 LLM LIMITS: token bucket reservations and refunds
+# ==============================================================================
+class _FakeClient:
+    def __init__(self, create):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+def _chunk(text, usage=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=usage)
+
+
+class LlmLimitsTests(SimpleTestCase):
+    MESSAGES = [{"role": "user", "content": "Who is the CEO?"}]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for name, value in (
+            ("_bucket", llm_limits._SharedBucket(os.path.join(tmp.name, "bucket.json"))),
+            ("AZURE_TPM_LIMIT", 10000), ("AZURE_RPM_LIMIT", 60),
+            ("AZURE_EXPECTED_COMPLETION_TOKENS", 500), ("AZURE_MAX_RETRIES", 1), ("BACKOFF_BASE", 0.0),
+        ):
+            patcher = mock.patch.object(llm_limits, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(host_limits, "HOST_LIMITS_DIR", tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The bucket refills by time.time(): freeze it, or a slow run refunds into a partly refilled bucket
+        patcher = mock.patch.object(llm_limits.time, "time", return_value=time.time())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cost = llm_limits.estimate_tokens(self.MESSAGES)
+
+    def _state(self):
+        with llm_limits._bucket.state() as state:
+            llm_limits._refill(state, state["updated"])  # No refill: compare like with like
+            return dict(state)
+
+    def test_acquire_takes_cost_and_a_request(self):
+        self.assertEqual(llm_limits._try_acquire(self.cost), 0)
+        state = self._state()
+        self.assertAlmostEqual(state["tokens"], 10000 - self.cost, delta=1)
+        self.assertAlmostEqual(state["requests"], 59, delta=0.1)
+
+    def test_empty_bucket_returns_the_wait(self):
+        self.assertEqual(llm_limits._try_acquire(9000), 0)
+        wait = llm_limits._try_acquire(2000)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 60 * 1000 / 10000 + 0.1)  # ~1000 missing tokens at 10000/min
+
+    def test_refund_is_capped_at_the_limit(self):
+        llm_limits._try_acquire(self.cost)
+        llm_limits._refund(10 * self.cost)
+        self.assertEqual(self._state()["tokens"], 10000)
+
+    def test_completion_is_settled_against_usage(self):
+        def create(**kwargs):
+            return SimpleNamespace(usage=SimpleNamespace(total_tokens=42))
+        llm_limits.create_completion(_FakeClient(create), messages=self.MESSAGES)
+        self.assertAlmostEqual(self._state()["tokens"], 10000 - 42, delta=1)
+
+    def test_failed_attempts_are_refunded(self):
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://azure.invalid"))
+        with self.assertRaises(openai.APIConnectionError):
+            llm_limits.create_completion(_FakeClient(create), messages=self.MESSAGES)
+        self.assertEqual(len(calls), 2)  # One retry
+        self.assertAlmostEqual(self._state()["tokens"], 10000, delta=1)
+        self.assertEqual(llm_limits._slots._value, llm_limits.LLM_MAX_CONCURRENCY)
+
+    def test_stream_holds_the_slot_and_settles_on_the_text(self):
+        def create(**kwargs):
+            return iter([_chunk("CEO is "), _chunk("A. Kumar")])
+        stream = llm_limits.create_completion(_FakeClient(create), messages=self.MESSAGES, stream=True)
+        self.assertEqual(llm_limits._slots._value, llm_limits.LLM_MAX_CONCURRENCY - 1)
+        self.assertEqual("".join(c.choices[0].delta.content for c in stream), "CEO is A. Kumar")
+        self.assertEqual(llm_limits._slots._value, llm_limits.LLM_MAX_CONCURRENCY)
+        used = llm_limits._streamed_tokens(self.MESSAGES, ["CEO is A. Kumar"])
+        self.assertAlmostEqual(self._state()["tokens"], 10000 - used, delta=1)
+
+    def test_stream_usage_chunk_wins(self):
+        def create(**kwargs):
+            return iter([_chunk("CEO"), SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=77))])
+        list(llm_limits.create_completion(_FakeClient(create), messages=self.MESSAGES, stream=True))
+        self.assertAlmostEqual(self._state()["tokens"], 10000 - 77, delta=1)
+
+    def test_unread_stream_gives_the_slot_back(self):
+        stream = llm_limits.create_completion(_FakeClient(lambda **kwargs: iter([])), messages=self.MESSAGES, stream=True)
+        del stream
+        self.assertEqual(llm_limits._slots._value, llm_limits.LLM_MAX_CONCURRENCY)
+
+    def test_async_cancel_refunds(self):
+        async def create(**kwargs):
+            await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.create_task(llm_limits.acreate_completion(_FakeClient(create), messages=self.MESSAGES))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return llm_limits._async_slot()._value
+        self.assertEqual(asyncio.run(run()), llm_limits.LLM_MAX_CONCURRENCY)
+        self.assertAlmostEqual(self._state()["tokens"], 10000, delta=1)
+
+    def _astream(self, chunks, refund_threads=None):
+        """An async stream of `chunks`; records the threads refunds ran on, when given a list."""
+        async def stream():
+            for chunk in chunks:
+                await asyncio.sleep(0)
+                yield chunk
+
+        class Stream:
+            closed = False
+
+            def __aiter__(self):
+                return stream()
+
+            async def close(self):
+                Stream.closed = True
+
+        async def create(**kwargs):
+            return Stream()
+        if refund_threads is not None:
+            real_refund = llm_limits._refund
+
+            def refund(tokens):
+                refund_threads.append(threading.current_thread())
+                real_refund(tokens)
+            patcher = mock.patch.object(llm_limits, "_refund", refund)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return _FakeClient(create), Stream
+
+    def test_async_stream_settles_off_the_loop(self):
+        threads = []
+        client, stream_cls = self._astream([_chunk("CEO is "), _chunk("A. Kumar")], threads)
+
+        async def run():
+            text = []
+            async with await llm_limits.acreate_completion(client, messages=self.MESSAGES, stream=True) as stream:
+                self.assertEqual(llm_limits._async_slot()._value, llm_limits.LLM_MAX_CONCURRENCY - 1)
+                async for chunk in stream:
+                    text.append(chunk.choices[0].delta.content)
+            return "".join(text), llm_limits._async_slot()._value
+        self.assertEqual(asyncio.run(run()), ("CEO is A. Kumar", llm_limits.LLM_MAX_CONCURRENCY))
+        used = llm_limits._streamed_tokens(self.MESSAGES, ["CEO is A. Kumar"])
+        self.assertAlmostEqual(self._state()["tokens"], 10000 - used, delta=1)
+        self.assertTrue(stream_cls.closed)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_async_stream_left_early_is_settled_on_exit(self):
+        client, stream_cls = self._astream([_chunk("CEO"), _chunk(" is"), _chunk(" A. Kumar")])
+
+        async def run():
+            async with await llm_limits.acreate_completion(client, messages=self.MESSAGES, stream=True) as stream:
+                async for _ in stream:
+                    break
+            return llm_limits._async_slot()._value
+        self.assertEqual(asyncio.run(run()), llm_limits.LLM_MAX_CONCURRENCY)
+        self.assertTrue(stream_cls.closed)
+        used = llm_limits._streamed_tokens(self.MESSAGES, ["CEO"])
+        self.assertAlmostEqual(self._state()["tokens"], 10000 - used, delta=1)
+
+    def test_async_stream_cancelled_mid_read_is_settled(self):
+        client, _ = self._astream([_chunk("CEO")] * 1000)
+
+        async def run():
+            async def read():
+                async with await llm_limits.acreate_completion(client, messages=self.MESSAGES, stream=True) as stream:
+                    async for _ in stream:
+                        await asyncio.sleep(0.01)
+            task = asyncio.create_task(read())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return llm_limits._async_slot()._value
+        self.assertEqual(asyncio.run(run()), llm_limits.LLM_MAX_CONCURRENCY)
+        self.assertLess(self._state()["tokens"], 10000)  # Settled on the text received so far
+        self.assertGreater(self._state()["tokens"], 10000 - self.cost)
+
+    def test_async_failed_attempts_are_refunded_off_the_loop(self):
+        threads = []
+        self._astream([], threads)
+
+        async def create(**kwargs):
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://azure.invalid"))
+
+        async def run():
+            with self.assertRaises(openai.APIConnectionError):
+                await llm_limits.acreate_completion(_FakeClient(create), messages=self.MESSAGES)
+            return llm_limits._async_slot()._value
+        self.assertEqual(asyncio.run(run()), llm_limits.LLM_MAX_CONCURRENCY)
+        self.assertAlmostEqual(self._state()["tokens"], 10000, delta=1)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+# ==============================================================================
+# ⏱️ METRICS: the per-request span target
+# ==============================================================================
+def _traced_request(spans):
+    """A research-style generator: its spans go to its own RequestTimings."""
+    timings = metrics.start_request()
+    try:
+        for name in spans:
+            with metrics.span(name):
+                pass
+            yield timings
+    finally:
+        metrics.end_request(timings)
+
+
+class RequestTimingsTests(SimpleTestCase):
+    def test_thread_context_is_clean_after_each_request(self):
+        seen = []
+
+        def wsgi_thread():  # One thread, two requests in a row, one of them dropped early
+            for spans, read in ((["a", "b"], 2), (["c", "d"], 1)):
+                stream = _traced_request(spans)
+                timings = [next(stream) for _ in range(read)][-1]
+                stream.close()
+                with metrics.span("between_requests"):
+                    pass
+                seen.append((sorted(timings.summary()["spans"]), metrics._current.get()))
+        thread = threading.Thread(target=wsgi_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [(["a", "b"], None), (["c"], None)])
+
+    def test_outer_request_is_restored(self):
+        outer = metrics.start_request()
+        try:
+            inner = list(_traced_request(["inner"]))[-1]
+            with metrics.span("outer"):
+                pass
+        finally:
+            metrics.end_request(outer)
+        self.assertEqual(list(outer.summary()["spans"]), ["outer"])
+        self.assertEqual(list(inner.summary()["spans"]), ["inner"])
+        self.assertIsNone(metrics._current.get())
+
+    def test_closed_from_another_context(self):
+        stream = _traced_request(["a"])
+        next(stream)
+        contextvars.copy_context().run(stream.close)  # reset() refuses the token there; end_request() lets it be
+        self.assertIsNotNone(metrics._current.get())  # Still set here: this context never reached the finally
+        metrics._current.set(None)
+
+    def test_async_request_task_context(self):
+        async def request():
+            timings = metrics.start_request()
+            try:
+                with metrics.span("a"):
+                    await asyncio.sleep(0)
+            finally:
+                metrics.end_request(timings)
+            return metrics._current.get(), list(timings.summary()["spans"])
+        self.assertEqual(asyncio.run(request()), (None, ["a"]))
+
+
+# ==============================================================================
+# 🧬 DEDUPE: near-duplicates against stored evidence
+# ==============================================================================
+PAGE = " ".join(f"word{i}" for i in range(300))
+
+
+def _entry(url, text):
+    return {"source_url": url, "source_domain": url.split("/")[2], "raw_text": text}
+
+
+class DeduplicationTests(TestCase):
+    def setUp(self):
+        store_evidence("Acme", "CEO", [_entry("https://zaubacorp.com/acme", PAGE)])
+
+    def test_blob_carries_its_signature(self):
+        blob = EvidenceBlob.objects.get()
+        self.assertEqual(bytes(blob.minhash), deduplication.signature_bytes(PAGE))
+
+    def test_near_duplicate_from_another_page_is_not_stored(self):
+        unique, to_store, report = deduplication.deduplicate_evidence(
+            "Acme", [_entry("https://mirror.example/acme", PAGE + " updated")]
+        )
+        self.assertEqual((len(unique), len(to_store), report["already_stored"]), (1, 0, 1))
+
+    def test_changed_version_of_the_same_page_is_stored(self):
+        _, to_store, _ = deduplication.deduplicate_evidence(
+            "Acme", [_entry("https://zaubacorp.com/acme", PAGE + " updated")]
+        )
+        self.assertEqual(len(to_store), 1)
+
+    def test_near_duplicates_within_a_request_cluster(self):
+        unique, _, report = deduplication.deduplicate_evidence("Other", [
+            _entry("https://a.example/1", PAGE), _entry("https://b.example/1", PAGE + " syndicated"),
+        ])
+        self.assertEqual([e["source_url"] for e in unique], ["https://a.example/1"])
+        self.assertEqual(report["clusters"], [{"representative": "https://a.example/1", "duplicates": ["https://b.example/1"]}])
+
+
+# ==============================================================================
+# 🗜️ BLOB STORE: evidence text stored once, compressed
+# ==============================================================================
+class EvidenceBlobTests(TestCase):
+    def test_same_text_is_one_blob(self):
+        store_evidence("Acme", "CEO", [_entry("https://a.example/1", PAGE), _entry("https://b.example/1", PAGE)])
+        store_evidence("Beta", "CEO", [_entry("https://a.example/1", PAGE)])
+        self.assertEqual(CompanyRawData.objects.count(), 3)
+        blob = EvidenceBlob.objects.get()
+        self.assertEqual((blob.content_hash, blob.size), (CompanyRawData.hash_text(PAGE), len(PAGE)))
+        self.assertEqual({row.raw_text for row in CompanyRawData.objects.with_text()}, {PAGE})
+
+    def test_unchanged_page_is_not_stored_twice(self):
+        store_evidence("Acme", "CEO", [_entry("https://a.example/1", PAGE)])
+        store_evidence("Acme", "Directors", [_entry("https://a.example/1", PAGE)])
+        self.assertEqual(CompanyRawData.objects.count(), 1)
+
+    def test_text_is_compressed_at_rest(self):
+        store_evidence("Acme", "CEO", [_entry("https://a.example/1", PAGE)])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT text FROM agents_evidenceblob")
+            stored = bytes(cursor.fetchone()[0])
+        self.assertEqual(stored[:4], ZSTD_MAGIC)
+        self.assertLess(len(stored), len(PAGE) // 2)
+        self.assertEqual(decompress_text(stored), PAGE)
+
+
+# ==============================================================================
+# 🔎 EVIDENCE SEARCH: FTS5 on SQLite, and the scanning fallback
+# ==============================================================================
+class EvidenceSearchTests(TestCase):
+    def setUp(self):
+        store_evidence("Acme", "Who are the directors", [
+            _entry("https://zaubacorp.com/acme", "Acme Private Limited. Directors: Asha Rao, Vikram Shah."),
+            _entry("https://tofler.in/acme", "Acme revenue grew to 40 crore; director Asha Rao resigned."),
+        ])
+        store_evidence("Beta", "CEO", [_entry("https://zaubacorp.com/beta", "Beta Labs, managing director Asha Menon.")])
+
+    def _urls(self, result):
+        return sorted(r["source_url"] for r in result["results"])
+
+    def test_fts5_ranks_and_filters(self):
+        result = search_evidence("asha rao")
+        self.assertEqual(result["backend"], "fts5")
+        self.assertEqual(self._urls(result), ["https://tofler.in/acme", "https://zaubacorp.com/acme"])
+        self.assertIn("[Asha]", result["results"][0]["snippet"])
+        self.assertEqual(self._urls(search_evidence("asha", company="Beta")), ["https://zaubacorp.com/beta"])
+        self.assertEqual(search_evidence("asha", domain="tofler.in")["total"], 1)
+
+    def test_fts5_stems_and_pages(self):
+        result = search_evidence("director", page=2, page_size=2)
+        self.assertEqual((result["total"], result["pages"], len(result["results"])), (3, 2, 1))
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(search_evidence('asha" OR raw_text:* NEAR(')["total"], 0)
+        self.assertEqual(search_evidence("  ")["total"], 0)
+
+    def _indexed(self, term):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM agents_evidence_fts WHERE agents_evidence_fts MATCH %s", [term])
+            return cursor.fetchone()[0]
+
+    def test_deleted_rows_leave_the_index(self):
+        ids = list(CompanyRawData.objects.filter(source_domain="tofler.in").values_list("id", flat=True))
+        unindex_evidence(ids)
+        CompanyRawData.objects.filter(id__in=ids).delete()
+        self.assertEqual(self._urls(search_evidence("rao")), ["https://zaubacorp.com/acme"])
+        self.assertEqual(self._indexed("rao"), 1)
+        self.assertFalse(repair_fts_index())
+
+    def test_rows_sharing_a_blob_are_each_indexed_once(self):
+        text = "Acme Private Limited. Directors: Asha Rao, Vikram Shah."
+        store_evidence("Gamma", "CEO", [_entry("https://zaubacorp.com/gamma", text)])
+        store_evidence("Gamma", "CEO", [_entry("https://zaubacorp.com/gamma", text)])
+        self.assertEqual(self._indexed("vikram"), 2)
+        self.assertEqual(search_evidence("vikram", company="Gamma")["total"], 1)
+
+    def test_writes_do_not_need_the_sql_function(self):
+        def missing(data):
+            raise RuntimeError("no evidence_text() on this connection")
+
+        raw = connection.connection
+        raw.create_function("evidence_text", 1, missing)
+        self.addCleanup(register_sqlite_functions, None, connection)
+        beta = CompanyRawData.objects.get(company__name="Beta")
+        cursor = raw.cursor()
+        cursor.execute(
+            "INSERT INTO agents_companyrawdata (company_id, user_prompt, source_domain, source_url, content_hash, blob_id, timestamp)"
+            " SELECT company_id, 'Board', 'copy.example', 'https://copy.example/beta', content_hash, blob_id, timestamp"
+            " FROM agents_companyrawdata WHERE id = ?", [beta.pk])
+        cursor.execute("DELETE FROM agents_companyrawdata WHERE source_domain = 'tofler.in'")
+        self.assertEqual(CompanyRawData.objects.count(), 3)
+
+    def test_repair_drops_rows_deleted_around_the_index(self):
+        CompanyRawData.objects.filter(source_domain="tofler.in").delete()
+        self.assertEqual(self._indexed("rao"), 2)
+        self.assertTrue(repair_fts_index())
+        self.assertEqual(self._indexed("rao"), 1)
+        self.assertEqual(self._urls(search_evidence("rao")), ["https://zaubacorp.com/acme"])
+
+    @override_settings(EVIDENCE_SEARCH_BACKEND="basic")
+    def test_basic_fallback_matches_all_terms(self):
+        result = search_evidence("asha rao")
+        self.assertEqual(result["backend"], "basic")
+        self.assertEqual(self._urls(result), ["https://tofler.in/acme", "https://zaubacorp.com/acme"])
+        self.assertEqual(search_evidence("crore", company="Beta")["total"], 0)
+
+
+# ==============================================================================
+# 🗄️ EVIDENCE ARCHIVE: old rows out to zstd JSONL and back
+# ==============================================================================
+class EvidenceArchiveTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        store_evidence("Acme", "CEO", [
+            _entry("https://zaubacorp.com/acme", "Acme Private Limited, director Asha Rao"),
+            _entry("https://tofler.in/acme", "Shared press release text"),
+        ])
+        store_evidence("Beta", "CEO", [_entry("https://news.example/beta", "Shared press release text")])
+        CompanyRawData.objects.filter(company__name="Acme").update(timestamp=timezone.now() - timedelta(days=400))
+
+    def test_round_trip(self):
+        progress = []
+        result = evidence_archive.archive_evidence(directory=self.dir, batch_size=1, progress=progress.append)
+
+        self.assertEqual(result["rows"], 2)
+        self.assertEqual(len(progress), 2)
+        self.assertEqual(list(CompanyRawData.objects.values_list("company__name", flat=True)), ["Beta"])
+        # The shared text is still Beta's; only Acme's own blob goes
+        self.assertEqual((result["blobs_before"], result["blobs_after"]), (2, 1))
+
+        records = list(evidence_archive.iter_archive(directory=self.dir))
+        self.assertEqual(
+            sorted((r["company"], r["source_url"], r["raw_text"]) for r in records),
+            [("Acme", "https://tofler.in/acme", "Shared press release text"),
+             ("Acme", "https://zaubacorp.com/acme", "Acme Private Limited, director Asha Rao")],
+        )
+        self.assertEqual(
+            [r["source_domain"] for r in evidence_archive.iter_archive(contains="asha", directory=self.dir)],
+            ["zaubacorp.com"],
+        )
+        self.assertEqual(list(evidence_archive.iter_archive(since=timezone.now(), directory=self.dir)), [])
+
+    def test_dry_run_changes_nothing(self):
+        result = evidence_archive.archive_evidence(directory=self.dir, dry_run=True)
+        self.assertEqual((result["rows"], result["files"]), (2, []))
+        self.assertEqual(CompanyRawData.objects.count(), 3)
+
+    def test_torn_final_frame_is_skipped_with_a_warning(self):
+        path, = evidence_archive.archive_evidence(directory=self.dir)["files"]
+        with open(path, "ab") as fh:
+            fh.write(zstandard.ZstdCompressor().compress(b'{"id": 99, "torn": tr')[:-3])
+
+        with self.assertLogs("agents.evidence_archive", "WARNING") as logs:
+            records = list(evidence_archive.iter_archive(directory=self.dir))
+        self.assertEqual(len(records), 2)
+        self.assertIn("torn final batch skipped", logs.output[0])
+
+
+# ==============================================================================
+# ⚡ RESULT CACHE: bounded by age and size
+# ==============================================================================
+class ResearchCacheEvictionTests(TestCase):
+    def _entry(self, key, created_ago, accessed_ago):
+        now = timezone.now()
+        ResearchCache.objects.create(
+            cache_key=key, company_name=key, payload={"status": "success"},
+            created_at=now - timedelta(seconds=created_ago), last_accessed=now - timedelta(seconds=accessed_ago),
+        )
+
+    def test_expired_then_least_recently_used_go(self):
+        self._entry("expired", research_cache.RESEARCH_CACHE_STALE_TTL + 60, 0)
+        for i in range(4):
+            self._entry(f"e{i}", 60, 60 * (i + 1))  # e0 is the most recently used
+        with mock.patch.object(research_cache, "RESEARCH_CACHE_MAX_ENTRIES", 2):
+            research_cache.evict()
+        self.assertEqual(sorted(ResearchCache.objects.values_list("cache_key", flat=True)), ["e0", "e1"])
+
+    def test_store_evicts_every_n_stores(self):
+        with mock.patch.object(research_cache, "RESEARCH_CACHE_MAX_ENTRIES", 3), \
+                mock.patch.object(research_cache, "EVICT_EVERY", 1):
+            for i in range(5):
+                research_cache._store(f"k{i}", "Acme", {"status": "success", "final_answer": {}})
+        self.assertEqual(ResearchCache.objects.count(), 3)
+
+
+# ==============================================================================
+# 📬 JOB QUEUE: ownership, heartbeats and crash handling
+# ==============================================================================
+def _research_events(*events):
+    def cached_research(*args):
+        yield from events
+    return cached_research
+
+
+class JobQueueTests(TestCase):
+    COMPLETE = {"type": "complete", "payload": {"status": "success"}}
+
+    def setUp(self):
+        self.job = job_queue.enqueue(None, "Acme", "CEO")
+        self.job = job_queue.claim_next("w1")
+
+    def test_run_job_persists_events_and_result(self):
+        log = {"type": "log", "message": "Searching"}
+        with mock.patch("agents.research_cache.cached_research", _research_events(log, self.COMPLETE)):
+            job_queue.run_job(self.job)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.result), ("succeeded", {"status": "success"}))
+        self.assertEqual([e.event for e in self.job.events.all()], [log, self.COMPLETE])
+
+    def test_requeued_job_is_left_to_its_new_owner(self):
+        def cached_research(*args):
+            yield {"type": "log", "message": "one"}
+            ResearchJob.objects.filter(pk=self.job.pk).update(status="queued", worker="")
+            job_queue.claim_next("w2")
+            yield self.COMPLETE
+
+        with mock.patch("agents.research_cache.cached_research", cached_research):
+            with self.assertRaises(job_queue.JobLost):
+                job_queue.run_job(self.job)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.worker), ("running", "w2"))
+        self.assertEqual(self.job.events.count(), 1)
+
+    def test_worker_survives_a_crashing_job(self):
+        stop = threading.Event()
+        runs = []
+
+        def run_job(job):
+            runs.append(job.pk)
+            if len(runs) == 2:
+                stop.set()
+            raise RuntimeError("database is locked")
+
+        job_queue.enqueue(None, "Beta", "CEO")
+        ResearchJob.objects.filter(pk=self.job.pk).update(status="queued", worker="")
+        with mock.patch.object(job_queue, "run_job", run_job), mock.patch.object(job_queue, "JOB_POLL_INTERVAL", 0):
+            job_queue.worker_loop(stop, "w1")
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(
+            list(ResearchJob.objects.values_list("status", "error").distinct()),
+            [("failed", "Server Error: database is locked")],
+        )
+
+
+class JobHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_runs_without_events(self):
+        job_queue.enqueue(None, "Acme", "CEO")
+        job = job_queue.claim_next("w1")
+        ResearchJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        def quiet_research(*args):
+            time.sleep(0.3)  # e.g. waiting for LLM quota
+            yield {"type": "complete", "payload": {}}
+
+        with mock.patch.object(job_queue, "JOB_HEARTBEAT_INTERVAL", 0.05), \
+                mock.patch("agents.research_cache.cached_research", quiet_research), \
+                mock.patch.object(job_queue, "JOB_STALE_AFTER", 60):
+            heartbeats = []
+            original = job_queue._append_event
+
+            def append_event(job, seq, event):
+                heartbeats.append(ResearchJob.objects.get(pk=job.pk).heartbeat_at)
+                original(job, seq, event)
+            with mock.patch.object(job_queue, "_append_event", append_event):
+                job_queue.run_job(job)
+            self.assertGreater(heartbeats[0], timezone.now() - timedelta(seconds=5))
+            self.assertEqual(job_queue.requeue_stale(), (0, 0))
+
+
+# ==============================================================================
+# 🚧 HOST LIMITS: slots shared by every process on the host
+# ==============================================================================
+HOLD_SLOT = """
+import sys, time
+sys.path.insert(0, {backend!r})
+from agents import host_limits
+host_limits.HOST_LIMITS_DIR = {directory!r}
+token = host_limits.HostSemaphore("fetch", 1).acquire(timeout=5)
+print("held" if token is not None else "busy", flush=True)
+time.sleep(60)
+"""
+
+
+class HostLimitsTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(host_limits, "HOST_LIMITS_DIR", tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dir = tmp.name
+
+    def test_slots_are_counted_across_threads(self):
+        limit = host_limits.HostSemaphore("fetch", 2)
+        first, second = limit.acquire(timeout=0), limit.acquire(timeout=0)
+        self.assertIsNotNone(second)
+        self.assertIsNone(limit.acquire(timeout=0.05))
+        limit.release(first)
+        third = limit.acquire(timeout=0)
+        self.assertIsNotNone(third)
+        limit.release(second)
+        limit.release(third)
+        self.assertEqual(limit.stats()["in_use"], 0)
+
+    def test_another_process_holds_the_slot_until_it_dies(self):
+        script = HOLD_SLOT.format(backend=os.path.dirname(os.path.dirname(__file__)), directory=self.dir)
+        holder = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True)
+        self.addCleanup(holder.kill)
+        self.assertEqual(holder.stdout.readline().strip(), "held")
+
+        limit = host_limits.HostSemaphore("fetch", 1)
+        self.assertIsNone(limit.acquire(timeout=0.1))
+        with self.assertRaises(TimeoutError):
+            asyncio.run(limit.aslot(timeout=0.1).__aenter__())
+
+        holder.kill()
+        holder.wait()
+        token = limit.acquire(timeout=2)
+        self.assertIsNotNone(token)
+        limit.release(token)
+
+    def test_zero_means_no_limit(self):
+        limit = host_limits.HostSemaphore("search", 0)
+        tokens = [limit.acquire(timeout=0) for _ in range(50)]
+        self.assertTrue(all(t is not None for t in tokens))
+
+
+# ==============================================================================
+# 📋 BATCHES: input validation, pausing and the NDJSON results stream
+# ==============================================================================
+class BatchInputTests(SimpleTestCase):
+    def test_csv_columns(self):
+        rows = batch.rows_from_csv(
+            "\ufeffCompany,Requirements,enable_comparison\nAcme,CEO,yes\nBeta,,\n"
+        )
+        self.assertEqual(rows, [
+            {"company_name": "Acme", "requirements": "CEO", "enable_comparison": "yes"},
+            {"company_name": "Beta"},
+        ])
+
+    def test_csv_without_a_company_column(self):
+        with self.assertRaisesMessage(batch.BatchInputError, "company_name"):
+            batch.rows_from_csv("firm,requirements\nAcme,CEO\n")
+
+    def test_defaults_fill_the_gaps(self):
+        jobs = batch.normalize_rows(
+            ["Acme", {"company_name": " Beta ", "requirements": "Revenue", "enable_comparison": "no"}],
+            {"requirements": "CEO", "enable_comparison": True, "force_refresh": True},
+        )
+        self.assertEqual([(j["company_name"], j["requirements"], j["enable_comparison"]) for j in jobs],
+                         [("Acme", "CEO", True), ("Beta", "Revenue", False)])
+        self.assertTrue(all(j["force_refresh"] for j in jobs))
+
+    def test_bad_rows_reject_the_whole_batch(self):
+        with self.assertRaisesMessage(batch.BatchInputError, "Row 2: company_name and requirements are required.; Row 3"):
+            batch.normalize_rows(["Acme", {"company_name": ""}, 42], {"requirements": "CEO"})
+        with self.assertRaisesMessage(batch.BatchInputError, "empty"):
+            batch.normalize_rows([], {})
+        with mock.patch.object(batch, "MAX_BATCH_SIZE", 2), self.assertRaisesMessage(batch.BatchInputError, "at most 2"):
+            batch.normalize_rows(["A", "B", "C"], {"requirements": "CEO"})
+
+
+class BatchRunTests(TestCase):
+    def setUp(self):
+        self.batch = batch.create_batch(None, ["Acme", "Beta", "Gamma"], {"requirements": "CEO"})
+
+    def test_paused_batch_is_not_claimed(self):
+        batch.set_paused(self.batch, True)
+        self.assertIsNone(job_queue.claim_next("w1"))
+        batch.set_paused(self.batch, False)
+        self.assertEqual(job_queue.claim_next("w1").batch_id, self.batch.pk)
+
+    def test_single_requests_go_first(self):
+        single = job_queue.enqueue(None, "Solo", "CEO")
+        self.assertEqual(job_queue.claim_next("w1").pk, single.pk)
+
+    def test_claim_looks_again_when_every_candidate_is_taken(self):
+        for i in range(6):
+            job_queue.enqueue(None, f"Single {i}", "CEO")
+        first_five = list(
+            ResearchJob.objects.filter(batch__isnull=True).order_by("created_at").values_list("pk", flat=True)[:5]
+        )
+        real_now, raced = timezone.now, []
+
+        def now():
+            if not raced:  # Another worker claims all five between our SELECT and UPDATE
+                raced.append(ResearchJob.objects.filter(pk__in=first_five).update(status="running", worker="w2"))
+            return real_now()
+        with mock.patch.object(job_queue.timezone, "now", now):
+            job = job_queue.claim_next("w1")
+        self.assertEqual(raced, [5])
+        self.assertEqual((job.company_name, job.worker), ("Single 5", "w1"))
+
+    def test_ndjson_results(self):
+        jobs = list(self.batch.jobs.order_by("company_name"))
+        ResearchJob.objects.filter(pk=jobs[0].pk).update(
+            status="succeeded", result={"ok": 1}, finished_at=timezone.now(), duration_seconds=1.5
+        )
+        ResearchJob.objects.filter(pk__in=[jobs[1].pk, jobs[2].pk]).update(
+            status="failed", error="Blocked", finished_at=timezone.now()
+        )
+        lines = [json.loads(line) for line in batch.ndjson_results(self.batch.pk, skip_job_ids=[jobs[2].pk])]
+
+        self.assertEqual([line["type"] for line in lines], ["result", "result", "progress", "done"])
+        results = {line["company_name"]: line for line in lines[:2]}
+        self.assertEqual(results["Acme"]["result"], {"ok": 1})
+        self.assertEqual((results["Beta"]["status"], results["Beta"]["error"]), ("failed", "Blocked"))
+        self.assertEqual(
+            {k: lines[-1][k] for k in ("status", "finished", "succeeded", "failed", "progress")},
+            {"status": "completed", "finished": 3, "succeeded": 1, "failed": 2, "progress": 1.0},
+        )
+
+
+# ==============================================================================
+# 🏅 GOLDEN RECORD: Agent 2's profile parsed onto the Company row, and the ETag read path
+# ==============================================================================
+def _insight(**profile):
+    return {"answer_found": True, "summary": "Steel maker.", "company_profile": profile}
+
+
+class GoldenRecordParsingTests(SimpleTestCase):
+    def test_nothing_from_a_failed_answer(self):
+        self.assertEqual(golden_record.profile_updates(None), {})
+        self.assertEqual(golden_record.profile_updates({"error": "x", "answer_found": True}), {})
+        self.assertEqual(golden_record.profile_updates({"answer_found": False, "summary": "x"}), {})
+        self.assertEqual(golden_record.profile_updates({"answer_found": True, "company_profile": "junk"}), {})
+
+    def test_cin(self):
+        cin = lambda value: golden_record.profile_updates(_insight(cin=value)).get("cin")
+        self.assertEqual(cin("l27100mh1907plc000260"), "L27100MH1907PLC000260")
+        self.assertEqual(cin("U 72200 KA 2010 PTC 052866"), "U72200KA2010PTC052866")
+        for bad in ("X27100MH1907PLC000260", "L27100MH1907PLC00026", "N/A", None, 12345):
+            self.assertIsNone(cin(bad), bad)
+
+    def test_incorporation_date(self):
+        when = lambda value: golden_record.profile_updates(_insight(incorporation_date=value)).get("incorporation_date")
+        self.assertEqual(when("1907-08-26"), golden_record.date(1907, 8, 26))
+        self.assertEqual(when("1907-08-26T00:00:00Z"), golden_record.date(1907, 8, 26))
+        for bad in ("26/08/1907", "2999-01-01", "unknown", "", True):
+            self.assertIsNone(when(bad), bad)
+
+    def test_employee_count(self):
+        count = lambda value: golden_record.profile_updates(_insight(employee_count=value)).get("employee_count")
+        self.assertEqual(count(1200), 1200)
+        self.assertEqual(count("about 35,000 employees"), 35000)
+        for bad in (0, -5, "0", "many", True, None):
+            self.assertIsNone(count(bad), bad)
+
+    def test_website_is_stored_as_origin(self):
+        site = lambda value, found=None: golden_record.profile_updates(_insight(official_website=value), found).get("domain")
+        self.assertEqual(site("https://WWW.Acme.com/about/team?x=1"), "https://www.acme.com/")
+        self.assertEqual(site("https://model-guess.com", "http://acme.co.in/investors"), "http://acme.co.in/")
+        self.assertEqual(site("https://acme.com", "not a url"), "https://acme.com/")
+        for bad in ("acme.com", "ftp://acme.com", "mailto:x@acme.com"):
+            self.assertIsNone(site(bad), bad)
+
+    def test_empty_values_are_left_out(self):
+        updates = golden_record.profile_updates(_insight(
+            legal_status="  ", estimated_revenue="Not Found", tech_stack=["", None, "SAP"], employee_count=None,
+        ))
+        self.assertEqual(updates, {"tech_stack": ["SAP"], "description": "Steel maker."})
+
+
+class GoldenRecordUpdateTests(TestCase):
+    CIN = "L27100MH1907PLC000260"
+
+    def test_creates_then_reports_only_changed_fields(self):
+        insight = _insight(cin=self.CIN, employee_count="1,200", legal_status="Active")
+        self.assertEqual(
+            sorted(golden_record.update_golden_record("Acme", insight)),
+            ["cin", "description", "employee_count", "legal_status"],
+        )
+        company = Company.objects.get(name="Acme")
+        self.assertEqual((company.cin, company.employee_count, company.legal_status), (self.CIN, 1200, "Active"))
+
+        insight["company_profile"]["employee_count"] = 1300
+        self.assertEqual(golden_record.update_golden_record("Acme", insight), ["employee_count"])
+
+    def test_empty_answer_keeps_stored_values(self):
+        golden_record.update_golden_record("Acme", _insight(legal_status="Active", employee_count=50))
+        self.assertEqual(golden_record.update_golden_record("Acme", _insight(legal_status="", employee_count="?")), [])
+        company = Company.objects.get(name="Acme")
+        self.assertEqual((company.legal_status, company.employee_count), ("Active", 50))
+
+    def test_cin_held_by_another_company_is_not_moved(self):
+        Company.objects.create(name="Acme", cin=self.CIN)
+        changed = golden_record.update_golden_record("Acme Clone", _insight(cin=self.CIN, legal_status="Active"))
+        self.assertEqual(sorted(changed), ["description", "legal_status"])
+        self.assertIsNone(Company.objects.get(name="Acme Clone").cin)
+        self.assertEqual(Company.objects.get(cin=self.CIN).name, "Acme")
+        # Re-confirming its own CIN is fine
+        self.assertEqual(golden_record.update_golden_record("Acme", _insight(cin=self.CIN)), ["description"])
+
+    def test_field_updated_at_tracks_each_confirmation(self):
+        first = timezone.now() - timedelta(days=3)
+        with mock.patch.object(golden_record.timezone, "now", return_value=first):
+            golden_record.update_golden_record("Acme", _insight(legal_status="Active", employee_count=50))
+        golden_record.update_golden_record("Acme", _insight(employee_count=50))  # Confirmed, unchanged
+
+        stamps = Company.objects.get(name="Acme").field_updated_at
+        self.assertEqual(stamps["legal_status"], first.isoformat())
+        self.assertGreater(stamps["employee_count"], first.isoformat())
+        self.assertEqual(set(stamps), {"legal_status", "employee_count", "description"})
+
+    def test_save_golden_record_never_raises(self):
+        with mock.patch.object(golden_record, "update_golden_record", side_effect=RuntimeError("db down")):
+            self.assertEqual(golden_record.save_golden_record("Acme", _insight(legal_status="Active")), [])
+        events = golden_record.save_golden_record("Acme", _insight(legal_status="Active"))
+        self.assertEqual(events, [{"type": "log", "message": "Company record updated: legal_status, description."}])
+
+
+class CompanyEtagTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("analyst"))
+        golden_record.update_golden_record("Acme", _insight(legal_status="Active"))
+        self.company = Company.objects.get(name="Acme")
+
+    def _get(self, url, etag=None):
+        return self.client.get(url, **({"HTTP_IF_NONE_MATCH": etag} if etag else {}))
+
+    def test_detail_revalidates_with_304(self):
+        url = f"/api/companies/{self.company.pk}/"
+        first = self._get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["legal_status"], "Active")
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+
+        again = self._get(url, first["ETag"])
+        self.assertEqual((again.status_code, again["ETag"]), (304, first["ETag"]))
+        self.assertEqual(again.content, b"")
+        self.assertEqual(self._get(url, f'"stale", {first["ETag"]}').status_code, 304)
+        self.assertEqual(self._get(url, "*").status_code, 304)
+        self.assertEqual(self._get(url, '"stale"').status_code, 200)
+
+    def test_detail_etag_changes_after_an_update(self):
+        url = f"/api/companies/{self.company.pk}/"
+        etag = self._get(url)["ETag"]
+        golden_record.update_golden_record("Acme", _insight(legal_status="Strike Off"))
+
+        fresh = self._get(url, etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh["ETag"], etag)
+        self.assertEqual(fresh.json()["legal_status"], "Strike Off")
+        self.assertEqual(self._get(url, fresh["ETag"]).status_code, 304)
+
+    def test_list_etag_follows_rows_and_query(self):
+        etag = self._get("/api/companies/")["ETag"]
+        self.assertEqual(self._get("/api/companies/", etag).status_code, 304)
+        self.assertNotEqual(self._get("/api/companies/?search=ac")["ETag"], etag)  # Part of the validator
+
+        golden_record.update_golden_record("Acme", _insight(employee_count=75))
+        changed = self._get("/api/companies/", etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["results"][0]["employee_count"], 75)
+
+        golden_record.update_golden_record("Beta", _insight(legal_status="Active"))
+        added = self._get("/api/companies/", changed["ETag"])
+        self.assertEqual((added.status_code, added.json()["total"]), (200, 2))
+
+
+# ==============================================================================
+# 🌐 PAGE FETCH: header checks, the first-chunk sniff and the bounded body reader
+# ==============================================================================
+LOGIN_PAGE = b"<html><head><title>Sign in | Portal</title></head><body><form><input type='password'></form>"
+
+
+class _Body:
+    """Response body served in chunks, remembering how many were read."""
+
+    def __init__(self, data, chunk_size=4096):
+        self.chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        self.read = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+class BodyReaderTests(SimpleTestCase):
+    def test_body_is_cut_at_max_bytes(self):
+        reader = http_client._BodyReader(10, None)
+        self.assertTrue(reader.feed(b"123456"))
+        self.assertFalse(reader.feed(b"7890abcd"))
+        self.assertEqual((reader.finish(), reader.truncated, reader.received), (b"1234567890", True, 14))
+
+    def test_body_under_max_bytes_is_whole(self):
+        reader = http_client._BodyReader(100, None)
+        self.assertTrue(reader.feed(b"abc"))
+        self.assertEqual((reader.finish(), reader.truncated), (b"abc", False))
+
+    def test_sniff_sees_the_first_window_once(self):
+        seen = []
+        sniff = lambda head: seen.append(head)
+        reader = http_client._BodyReader(10**6, sniff)
+        for _ in range(5):
+            self.assertTrue(reader.feed(b"x" * 6000))
+        self.assertEqual([len(head) for head in seen], [http_client.HTTP_SNIFF_BYTES])
+        self.assertEqual(len(reader.finish()), 30000)
+
+    def test_sniff_abort_stops_reading_and_drops_the_body(self):
+        reader = http_client._BodyReader(10**6, lambda head: "nope")
+        self.assertFalse(reader.feed(b"x" * http_client.HTTP_SNIFF_BYTES))
+        self.assertEqual((reader.finish(), reader.skipped, reader.truncated), (b"", "nope", False))
+
+    def test_short_body_is_sniffed_on_finish(self):
+        reader = http_client._BodyReader(10**6, lambda head: "tiny" if head == b"ok" else None)
+        self.assertTrue(reader.feed(b"ok"))
+        self.assertEqual((reader.finish(), reader.skipped), (b"", "tiny"))
+
+    def test_sink_keeps_only_the_sniff_window_in_memory(self):
+        with tempfile.TemporaryFile() as sink:
+            reader = http_client._BodyReader(50000, lambda head: None, sink=sink)
+            for _ in range(10):
+                if not reader.feed(b"y" * 6000):
+                    break
+            self.assertEqual(reader.finish(), b"")
+            self.assertEqual((sink.tell(), reader.truncated, len(reader.buffer)), (50000, True, http_client.HTTP_SNIFF_BYTES))
+
+
+class _Backend:
+    """Network backend stand-in: records where connect_tcp() was asked to go."""
+
+    def __init__(self):
+        self.calls = []
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.calls.append((host, port, timeout))
+        return "stream"
+
+
+class HttpClientDnsTests(SimpleTestCase):
+    INFOS = [(2, 1, 6, "", ("203.0.113.7", 443))]
+
+    def setUp(self):
+        patcher = mock.patch.dict(http_client._dns_cache, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_transports_still_take_the_caching_backend(self):
+        # httpx has no public hook for this; if an upgrade moves the attribute, this is what breaks
+        transport = http_client._install_dns_cache(httpx.HTTPTransport(), http_client._DnsCachingBackend)
+        self.assertIsInstance(transport._pool._network_backend, http_client._DnsCachingBackend)
+        transport = http_client._install_dns_cache(httpx.AsyncHTTPTransport(), http_client._AsyncDnsCachingBackend)
+        self.assertIsInstance(transport._pool._network_backend, http_client._AsyncDnsCachingBackend)
+
+    def test_lookups_are_cached(self):
+        inner = _Backend()
+        backend = http_client._DnsCachingBackend(inner)
+        with mock.patch.object(http_client.socket, "getaddrinfo", return_value=self.INFOS) as lookup:
+            backend.connect_tcp("acme.example", 443, timeout=5)
+            backend.connect_tcp("acme.example", 443, timeout=5)
+            backend.connect_tcp("198.51.100.1", 443, timeout=5)
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual([call[0] for call in inner.calls], ["203.0.113.7", "203.0.113.7", "198.51.100.1"])
+        self.assertTrue(all(0 < call[2] <= 5 for call in inner.calls))
+
+    def test_slow_lookup_is_bounded_by_the_connect_timeout(self):
+        def slow(*args, **kwargs):
+            time.sleep(0.5)
+            return self.INFOS
+        backend = http_client._DnsCachingBackend(_Backend())
+        started = time.monotonic()
+        with mock.patch.object(http_client.socket, "getaddrinfo", slow):
+            with self.assertRaises(httpcore.ConnectTimeout):
+                backend.connect_tcp("slow.example", 443, timeout=0.05)
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_slow_lookup_surfaces_as_httpx_connect_timeout(self):
+        def slow(*args, **kwargs):
+            time.sleep(0.5)
+            return self.INFOS
+        transport = http_client._install_dns_cache(httpx.HTTPTransport(), http_client._DnsCachingBackend)
+        with httpx.Client(transport=transport, timeout=httpx.Timeout(1, connect=0.05)) as client, \
+                mock.patch.object(http_client.socket, "getaddrinfo", slow):
+            with self.assertRaises(httpx.ConnectTimeout):
+                client.get("http://slow.example/")
+
+    def test_failed_lookup_is_a_connect_error(self):
+        backend = http_client._DnsCachingBackend(_Backend())
+        with mock.patch.object(http_client.socket, "getaddrinfo", side_effect=socket.gaierror(-2, "Name or service not known")):
+            with self.assertRaises(httpcore.ConnectError):
+                backend.connect_tcp("nowhere.example", 443, timeout=1)
+
+    def test_async_slow_lookup_is_bounded(self):
+        class AsyncBackend(_Backend):
+            async def connect_tcp(self, *args, **kwargs):
+                return super().connect_tcp(*args, **kwargs)
+
+        async def run():
+            async def slow(*args, **kwargs):
+                await asyncio.sleep(0.5)
+                return self.INFOS
+            backend = http_client._AsyncDnsCachingBackend(AsyncBackend())
+            with mock.patch.object(asyncio.get_running_loop(), "getaddrinfo", slow):
+                with self.assertRaises(httpcore.ConnectTimeout):
+                    await backend.connect_tcp("slow.example", 443, timeout=0.05)
+
+            async def fast(*args, **kwargs):
+                return self.INFOS
+            with mock.patch.object(asyncio.get_running_loop(), "getaddrinfo", fast):
+                await backend.connect_tcp("fast.example", 443, timeout=1)
+            return backend._inner.calls
+        calls = asyncio.run(run())
+        self.assertEqual([call[:2] for call in calls], [("203.0.113.7", 443)])
+
+
+class PageChecksTests(SimpleTestCase):
+    def test_accept_page(self):
+        accept = roc_tool._accept_page
+        self.assertIsNone(accept(200, {"Content-Type": "text/html; charset=utf-8"}))
+        self.assertIsNone(accept(200, {}))
+        self.assertIsNone(accept(200, {"Content-Type": "text/plain", "Content-Length": "100"}))
+        self.assertEqual(accept(404, {"Content-Type": "text/html"}), "HTTP 404")
+        self.assertEqual(accept(304, {}), "HTTP 304")
+        self.assertEqual(accept(200, {"Content-Type": "image/png"}), "image/png")
+        self.assertEqual(accept(200, {"Content-Type": "application/pdf"}), "application/pdf")
+        too_big = str(roc_tool.PAGE_MAX_BYTES + 1)
+        self.assertEqual(accept(200, {"Content-Type": "text/html", "Content-Length": too_big}), f"{int(too_big) // 1024} KB")
+        self.assertIsNone(accept(200, {"Content-Type": "text/html", "Content-Length": "lots"}))
+
+    def test_sniff_page(self):
+        sniff = roc_tool._sniff_page
+        self.assertEqual(sniff(b"<html><body>Please LOG IN to continue reading</body>"), "login wall")
+        self.assertEqual(sniff(LOGIN_PAGE), "login wall")
+        # A password box on an ordinary page (say, a newsletter form) is not enough on its own
+        self.assertIsNone(sniff(b"<title>Acme Steel results</title><input type=password>"))
+        self.assertIsNone(sniff("<title>Acme Stahl – Über uns</title>".encode()))
+
+
+class PageFetchTests(TestCase):
+    URL = "https://acme.example/about"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(host_limits, "HOST_LIMITS_DIR", tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.requests = []
+
+    def _serve(self, status, headers=None, body=b""):
+        """Routes http_client's shared client to a local handler; returns the body to check what was read."""
+        body = _Body(body)
+
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(status, headers=headers or {}, content=iter(body))
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        self.addCleanup(client.close)
+        patcher = mock.patch.object(http_client, "get_client", return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return body
+
+    def _get(self, **kwargs):
+        return http_client.get(self.URL, accept=roc_tool._accept_page, sniff=roc_tool._sniff_page, **kwargs)
+
+    def test_non_200_body_is_never_read(self):
+        body = self._serve(503, {"Content-Type": "text/html"}, b"<html>busy</html>" * 100)
+        response = self._get()
+        self.assertEqual((response.status_code, response.skipped, response.content, body.read), (503, "HTTP 503", b"", 0))
+
+    def test_oversize_content_length_is_never_read(self):
+        size = roc_tool.PAGE_MAX_BYTES + 4096
+        body = self._serve(200, {"Content-Type": "text/html", "Content-Length": str(size)}, b"x" * size)
+        response = self._get(max_bytes=roc_tool.PAGE_MAX_BYTES)
+        self.assertEqual((response.skipped, response.content, body.read), (f"{size // 1024} KB", b"", 0))
+
+    def test_login_wall_stops_after_the_first_window(self):
+        page = LOGIN_PAGE + b"<p>" + b"z" * 200000 + b"</p>"
+        body = self._serve(200, {"Content-Type": "text/html"}, page)
+        response = self._get()
+        self.assertEqual((response.skipped, response.content), ("login wall", b""))
+        self.assertLess(body.read, len(body.chunks))
+        self.assertLessEqual(body.read * 4096, http_client.HTTP_SNIFF_BYTES + 4096)
+
+    def test_unannounced_big_body_is_truncated(self):
+        body = self._serve(200, {"Content-Type": "text/plain"}, b"a" * 100000)
+        response = self._get(max_bytes=10000)
+        self.assertEqual((len(response.content), response.truncated, response.skipped), (10000, True, None))
+        self.assertLess(body.read, len(body.chunks))
+
+    def test_fetch_page_revalidates_stale_entry_with_304(self):
+        stale = timezone.now() - timedelta(seconds=roc_tool.page_cache.PAGE_CACHE_TTL + 60)
+        PageCache.objects.create(
+            url_key=roc_tool.page_cache._url_key(self.URL), url=self.URL, extracted_text="Stored text",
+            etag='"v1"', fetched_at=stale, last_accessed=stale,
+        )
+        self._serve(304, {"ETag": '"v1"'})
+        job = {"url": self.URL, "domain": "acme.example"}
+        self.assertEqual(roc_tool._fetch_page(job), ("Stored text", "revalidated"))
+        self.assertEqual(self.requests[0].headers["If-None-Match"], '"v1"')
+        self.assertNotIn("skipped", job)
+        self.assertGreater(PageCache.objects.get().fetched_at, stale)
+
+    def test_fetch_page_error_status_is_not_cached(self):
+        self._serve(404, {"Content-Type": "text/html"}, b"<html>gone</html>")
+        job = {"url": self.URL, "domain": "acme.example"}
+        self.assertEqual(roc_tool._fetch_page(job), (None, "web"))
+        self.assertNotIn("skipped", job)  # Only 200s that were turned away are reported as skipped
+        self.assertFalse(PageCache.objects.exists())
+
+    def test_empty_extraction_is_not_cached(self):
+        self._serve(200, {"Content-Type": "text/plain", "ETag": '"e1"'}, b"  \n\n ")
+        job = {"url": self.URL, "domain": "acme.example"}
+        roc_tool._fetch_page(job)
+        roc_tool._fetch_page(job)
+        self.assertEqual(len(self.requests), 2)  # Fetched again rather than served "" from the cache
+        self.assertNotIn("If-None-Match", self.requests[1].headers)
+        self.assertFalse(PageCache.objects.exists())
+
+    def test_empty_rows_from_before_are_misses(self):
+        now = timezone.now()
+        PageCache.objects.create(
+            url_key=roc_tool.page_cache._url_key(self.URL), url=self.URL, extracted_text="",
+            fetched_at=now, last_accessed=now,
+        )
+        self.assertIsNone(roc_tool.page_cache.lookup(self.URL))
+        self._serve(200, {"Content-Type": "text/plain"}, b"Acme Steel makes steel.")
+        self.assertEqual(roc_tool._fetch_page({"url": self.URL, "domain": "acme.example"}), ("Acme Steel makes steel.", "web"))
+        self.assertEqual(PageCache.objects.get().extracted_text, "Acme Steel makes steel.")
+
+    def test_pool_calls_close_their_db_connection(self):
+        with mock.patch.object(roc_tool.connection, "close") as close:
+            self.assertEqual(roc_tool._pooled(lambda x: x + 1)(1), 2)
+            with self.assertRaises(ValueError):
+                roc_tool._pooled(int)("not a number")
+        self.assertEqual(close.call_count, 2)
+
+    def test_fetch_page_reports_a_login_wall(self):
+        self._serve(200, {"Content-Type": "text/html"}, LOGIN_PAGE)
+        job = {"url": self.URL, "domain": "acme.example"}
+        self.assertEqual(roc_tool._fetch_page(job), (None, "web"))
+        self.assertEqual(job["skipped"], "login wall")
+        self.assertFalse(PageCache.objects.exists())
+
+
+# ==============================================================================
+# 🧾 ROC FILINGS: parser extractors, page order, the early stop and the single download
+# ==============================================================================
+CIN = "L27100MH1907PLC000260"
+
+
+def _filing_pdf(pages, toc=None):
+    """PDF bytes with one text page per entry of `pages` (and an outline, if given)."""
+    import pymupdf
+    doc = pymupdf.open()
+    for text in pages:
+        doc.new_page().insert_text((50, 60), text, fontsize=9)
+    if toc:
+        doc.set_toc(toc)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class RocParserTests(SimpleTestCase):
+    def test_directors_inline(self):
+        lines = [
+            "Board of Directors",
+            "Mr. Natarajan Chandrasekaran (DIN: 00121863), Chairman",
+            "Ms. Bharti Gupta Ramola DIN 00356188 Independent Director",
+        ]
+        found = roc_parser._directors(lines, 4)
+        self.assertEqual(
+            [(d.name, d.din, d.designation, d.page) for d in found],
+            [("Mr. Natarajan Chandrasekaran", "00121863", "Chairman", 4),
+             ("Ms. Bharti Gupta Ramola", "00356188", "Independent Director", 4)],
+        )
+
+    def test_directors_as_table_cells(self):
+        lines = ["Name", "DIN", "Designation", "T V Narendran", "03083605", "Chief Executive Officer & Managing Director",
+                 "Koushik Chatterjee", "(00004989)", "Whole-time Director"]
+        found = roc_parser._directors(lines, 2)
+        self.assertEqual(
+            [(d.name, d.din, d.designation) for d in found],
+            [("T V Narendran", "03083605", "Chief Executive Officer"), ("Koushik Chatterjee", "00004989", "Whole-time Director")],
+        )
+        self.assertEqual(found[0].snippet, "T V Narendran | 03083605 | Chief Executive Officer & Managing Director")
+
+    def test_directors_name_on_the_line_before(self):
+        found = roc_parser._directors(["Saurabh Agrawal", "DIN: 02144558", "Director"], 1)
+        self.assertEqual([(d.name, d.din, d.designation) for d in found], [("Saurabh Agrawal", "02144558", "Director")])
+        self.assertEqual(roc_parser._directors(["see note 12", "DIN: 02144558"], 1), [])
+
+    def _amount(self, lines, page_text=None):
+        return roc_parser._amount("revenue", roc_parser.REVENUE_RE, lines, page_text or "\n".join(lines), 7)
+
+    def test_amount_inline_units(self):
+        for line, raw, inr in (
+            ("Revenue from operations ₹ 2,29,171 crore", "₹ 2,29,171 crore", 2.29171e12),
+            ("Total revenue Rs. 512.5 lakhs", "Rs. 512.5 lakhs", 5.125e7),
+            ("Turnover INR 1,200.4 mn", "INR 1,200.4 mn", 1.2004e9),
+            ("Turnover 3.2 bn", "3.2 bn", 3.2e9),
+        ):
+            record = self._amount([line])
+            self.assertEqual((record.raw, record.page), (raw, 7), line)
+            self.assertAlmostEqual(record.amount_inr, inr, delta=1, msg=line)
+
+    def test_amount_page_unit_note_numbers_and_years(self):
+        lines = ["(₹ in crore)", "Particulars Note 2024 2023", "Revenue from operations 23",
+                 "1,40,987.43 1,29,006.62", "for the year ended 31st March, 2024"]
+        record = self._amount(lines)
+        self.assertEqual(record.raw, "1,40,987.43 crore")
+        self.assertAlmostEqual(record.amount_inr, 1.4098743e12, delta=1)
+        self.assertEqual(record.period, "year ended 31st March, 2024")
+
+    def test_amount_without_unit_and_backtick_rupee(self):
+        record = self._amount(["Revenue from operations ` 45,000"])
+        self.assertEqual((record.raw, record.amount_inr, record.period), ("₹ 45,000", 45000.0, None))
+        self.assertIsNone(self._amount(["Revenue from operations grew strongly in 2024"]))
+        self.assertIsNone(self._amount(["Directors' report", "45,000"]))
+
+    def test_page_order(self):
+        doc = SimpleNamespace(get_toc=lambda simple: [
+            [1, "Notice", 5], [1, "Board of Directors", 12], [1, "Statement of Profit and Loss", 40], [2, "Share Capital", 0],
+        ])
+        order = roc_parser._page_order(doc, 60)
+        self.assertEqual(order[:9], [0, 1, 2, 11, 12, 13, 39, 40, 41])
+        self.assertEqual(sorted(order), list(range(60)))
+        self.assertEqual(roc_parser._page_order(doc, 12), [0, 1, 2, 11, *range(3, 11)])
+
+        def broken(simple):
+            raise RuntimeError("bad outline")
+        self.assertEqual(roc_parser._page_order(SimpleNamespace(get_toc=broken), 5), [0, 1, 2, 3, 4])
+
+
+class RocFilingTests(SimpleTestCase):
+    PAGES = [
+        f"Acme Steel Limited\nAnnual Report 2023-24\nCIN: {CIN}",
+        "Financial Statements follow",
+        "Notice of AGM",
+        *[f"Operations review, part {n}" for n in range(3, 30)],
+        "Board of Directors\nMr. Natarajan Chandrasekaran (DIN: 00121863), Chairman\nT V Narendran (DIN: 03083605), Managing Director",
+        "Corporate governance report",
+        "(Rs. in crore)\nPaid-up equity share capital 1,247.44\nRevenue from operations 2,29,171.13\nfor the year ended 31 March 2024",
+        *[f"Notes to accounts, part {n}" for n in range(33, 60)],
+    ]
+    TOC = [[1, "Corporate Information", 31], [1, "Statement of Profit and Loss", 33]]
+
+    def _parse(self, pdf, **kwargs):
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+            f.write(pdf)
+            f.flush()
+            return roc_parser.parse_filing(f.name, "https://acme.example/ar.pdf", **kwargs)
+
+    def test_outline_pages_first_then_early_stop(self):
+        filing = self._parse(_filing_pdf(self.PAGES, self.TOC))
+        self.assertEqual(filing.sections_found(), ["cin", "directors", "paid_up_capital", "revenue"])
+        self.assertEqual((filing.cin.cin, filing.cin.page), (CIN, 1))
+        self.assertEqual([d.din for d in filing.directors], ["00121863", "03083605"])
+        self.assertAlmostEqual(filing.paid_up_capital.amount_inr, 1.24744e10, delta=1)
+        self.assertEqual((filing.revenue.page, filing.revenue.period), (33, "year ended 31 March 2024"))
+        # Cover (3) + pages 31-33 from the outline; the directors list is closed once page 32 shows none
+        self.assertEqual((filing.total_pages, filing.pages_read, filing.stopped_early), (60, 6, True))
+        self.assertIn("Revenue, year ended 31 March 2024: 2,29,171.13 crore = INR 2,291,711,300,000", filing.to_evidence_text())
+
+    def test_without_outline_reads_in_order_until_done(self):
+        filing = self._parse(_filing_pdf(self.PAGES))
+        self.assertEqual((filing.pages_read, filing.stopped_early), (33, True))
+        self.assertEqual(len(filing.sections_found()), 4)
+
+    def test_max_pages_and_missing_sections(self):
+        filing = self._parse(_filing_pdf(self.PAGES), max_pages=10)
+        self.assertEqual((filing.pages_read, filing.stopped_early, filing.sections_found()), (10, False, ["cin"]))
+
+    def test_no_text_layer_gives_up(self):
+        filing = self._parse(_filing_pdf([""] * 20))
+        self.assertEqual((filing.pages_read, filing.sections_found()), (roc_parser.NO_TEXT_LIMIT, []))
+
+
+class FilingDownloadTests(SimpleTestCase):
+    URL = "https://acme.example/files/annual-report.pdf"
+
+    def setUp(self):
+        self.requests = []
+
+    def _serve(self, status, headers, body):
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(status, headers=headers, content=iter(_Body(body)))
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        self.addCleanup(client.close)
+        patcher = mock.patch.object(http_client, "get_client", return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_page(self):
+        return roc_scrapper.get_page(
+            self.URL, roc_tool._accept_page, max_bytes=roc_tool.PAGE_MAX_BYTES, sniff=roc_tool._sniff_page,
+        )
+
+    def test_filing_is_spooled_from_the_first_response(self):
+        pdf = _filing_pdf([f"CIN {CIN}"]) + b"%" + b"0" * (roc_tool.PAGE_MAX_BYTES + 10)  # Bigger than any page
+        self._serve(200, {"Content-Type": "application/pdf"}, pdf)
+        response, filing = self._get_page()
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual((response.skipped, response.content, response.truncated), (None, b"", False))
+        with filing:
+            with open(filing.path, "rb") as f:
+                self.assertEqual(f.read(), pdf)
+            path = filing.path
+        self.assertFalse(os.path.exists(path))
+
+    def test_async_filing_is_spooled_from_the_first_response(self):
+        pdf = _filing_pdf([f"CIN {CIN}"])
+
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(200, headers={"Content-Type": "application/pdf"}, content=pdf)
+
+        async def fetch():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                with mock.patch.object(http_client, "get_async_client", return_value=client):
+                    return await roc_scrapper.aget_page(
+                        self.URL, roc_tool._accept_page, max_bytes=roc_tool.PAGE_MAX_BYTES, sniff=roc_tool._sniff_page,
+                    )
+        response, filing = asyncio.run(fetch())
+        with filing:
+            self.assertEqual((len(self.requests), response.skipped, os.path.getsize(filing.path)), (1, None, len(pdf)))
+
+    def test_octet_stream_that_is_not_a_pdf(self):
+        self._serve(200, {"Content-Type": "application/octet-stream"}, b"<html>Error</html>")
+        response, filing = self._get_page()
+        self.assertEqual((len(self.requests), response.skipped, filing.path), (1, "not a PDF", None))
+
+    def test_oversize_filing_is_not_downloaded(self):
+        size = roc_scrapper.PDF_MAX_BYTES + 1
+        self._serve(200, {"Content-Type": "application/pdf", "Content-Length": str(size)}, b"%PDF-")
+        response, filing = self._get_page()
+        self.assertEqual((response.skipped, filing), (f"{size // (1024 * 1024)} MB", None))
+
+    def test_pages_still_go_through_the_page_checks(self):
+        self._serve(404, {"Content-Type": "application/pdf"}, b"%PDF-")
+        self.assertEqual(self._get_page()[0].skipped, "HTTP 404")
+        self._serve(200, {"Content-Type": "text/html"}, b"<html>Annual report</html>")
+        response, filing = self._get_page()
+        self.assertEqual((response.content, filing), (b"<html>Annual report</html>", None))
+
+    def test_spool_is_removed_when_the_download_fails(self):
+        self._serve(200, {"Content-Type": "application/pdf"}, b"%PDF-1.7")
+        spooled = []
+        real_spool = roc_scrapper._spool_file
+
+        def spool_file():
+            spooled.append(real_spool())
+            return spooled[-1]
+        with mock.patch.object(roc_scrapper, "_spool_file", spool_file), \
+                mock.patch.object(http_client._BodyReader, "feed", side_effect=httpx.ReadError("reset")):
+            with self.assertRaises(httpx.ReadError):
+                self._get_page()
+        self.assertFalse(os.path.exists(spooled[0].name))
@@ -1,6 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from .views import CompanyResearchView
+from .views import (
+    CompanyResearchView, AsyncCompanyResearchView, ResearchJobDetailView, ResearchJobEventsView,
+    ResearchBatchView, ResearchBatchDetailView, ResearchBatchControlView, ResearchBatchResultsView,
+    EvidenceSearchView, CompanyListView, CompanyDetailView,
+)
+
+# Under ASGI (uvicorn core.asgi:application) set RESEARCH_ASYNC=True to serve the async pipeline
+ResearchView = AsyncCompanyResearchView if settings.RESEARCH_ASYNC else CompanyResearchView
 
 urlpatterns = [
-    path('research/', CompanyResearchView.as_view(), name='company-research'),
-]
\ No newline at end of file
+    path('research/', ResearchView.as_view(), name='company-research'),
+    path('research/jobs/<uuid:job_id>/', ResearchJobDetailView.as_view(), name='research-job'),
+    path('research/jobs/<uuid:job_id>/events/', ResearchJobEventsView.as_view(), name='research-job-events'),
+    path('research/batch/', ResearchBatchView.as_view(), name='research-batch'),
+    path('research/batch/<uuid:batch_id>/', ResearchBatchDetailView.as_view(), name='research-batch-detail'),
+    path('research/batch/<uuid:batch_id>/results/', ResearchBatchResultsView.as_view(), name='research-batch-results'),
+    path('research/batch/<uuid:batch_id>/pause/', ResearchBatchControlView.as_view(action='pause'), name='research-batch-pause'),
+    path('research/batch/<uuid:batch_id>/resume/', ResearchBatchControlView.as_view(action='resume'), name='research-batch-resume'),
+    path('evidence/search/', EvidenceSearchView.as_view(), name='evidence-search'),
+    path('companies/', CompanyListView.as_view(), name='company-list'),
+    path('companies/<int:company_id>/', CompanyDetailView.as_view(), name='company-detail'),
+]
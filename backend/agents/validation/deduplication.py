@@ -0,0 +1,143 @@
+import os
+import re
+import zlib
+import threading
+import numpy as np
+from ..models import CompanyRawData, EvidenceBlob
+
+# ==============================================================================
+# 🧬 NEAR-DUPLICATE EVIDENCE: MinHash over word shingles, compared as numpy matrices
+# ==============================================================================
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))       # Estimated Jaccard at which two texts are "the same"
+DEDUP_STORED_LIMIT = int(os.getenv("DEDUP_STORED_LIMIT", "200"))   # Most recent stored rows compared per company
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240601)  # Fixed seed: signatures must be comparable across processes
+_A = _rng.integers(1, (1 << 31) - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 31) - 1, size=NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint64)  # Above every hash, and still fits the stored uint32
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_stats = {"requests": 0, "entries": 0, "duplicates": 0, "already_stored": 0}
+_stats_lock = threading.Lock()
+
+
+def dedup_stats():
+    """Process-wide counters, plus the overall duplicate rate."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["duplicate_rate"] = stats["duplicates"] / stats["entries"] if stats["entries"] else 0.0
+    return stats
+
+
+def _shingle_hashes(text):
+    words = WORD_RE.findall((text or "").lower())
+    if len(words) < SHINGLE_WORDS:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    # crc32 is stable across processes (unlike hash()) and fits the 31-bit permutation space
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) & 0x7FFFFFFF for g in set(grams)), dtype=np.uint64)
+
+
+def minhash(text):
+    """NUM_PERM-long MinHash signature of the text's word shingles."""
+    hashes = _shingle_hashes(text)
+    if not hashes.size:
+        return _EMPTY.copy()
+    # (permutations x shingles) in one shot; a, h < 2^31 so a*h + b can't overflow uint64
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def signature_bytes(text):
+    """minhash() as stored in EvidenceBlob.minhash: NUM_PERM little-endian uint32 (every value is < 2^32)."""
+    return minhash(text).astype("<u4").tobytes()
+
+
+def _from_bytes(data):
+    return np.frombuffer(bytes(data), dtype="<u4").astype(np.uint64)  # Postgres hands back a memoryview
+
+
+def signatures(texts):
+    if not texts:
+        return np.empty((0, NUM_PERM), dtype=np.uint64)
+    return np.vstack([minhash(t) for t in texts])
+
+
+def similarity(left, right):
+    """Estimated Jaccard between every row of `left` and every row of `right`."""
+    if not len(left) or not len(right):
+        return np.zeros((len(left), len(right)))
+    return (left[:, None, :] == right[None, :, :]).mean(axis=2)
+
+
+def _stored_signatures(company_name):
+    """(source urls, signatures) of the company's most recent stored evidence, read off the blobs."""
+    try:
+        rows = list(
+            CompanyRawData.objects.filter(company__name=company_name, blob__isnull=False)
+            .order_by('-timestamp').values_list('source_url', 'blob_id', 'blob__minhash')[:DEDUP_STORED_LIMIT]
+        )
+        # Blobs written before 0015 backfilled them: hash the text once here
+        missing = {blob_id for _, blob_id, sig in rows if sig is None}
+        computed = {
+            blob.id: minhash(blob.text) for blob in EvidenceBlob.objects.filter(id__in=missing).only('id', 'text')
+        } if missing else {}
+    except Exception as e:
+        print(f"DEBUG: Stored evidence lookup failed: {e}")
+        return np.array([], dtype=object), signatures([])
+
+    urls = np.array([url for url, _, _ in rows], dtype=object)
+    if not rows:
+        return urls, signatures([])
+    return urls, np.vstack([computed[blob_id] if sig is None else _from_bytes(sig) for _, blob_id, sig in rows])
+
+
+def deduplicate_evidence(company_name, entries, threshold=DEDUP_THRESHOLD):
+    """
+    Clusters near-identical Agent 1 entries (syndicated articles, mirror sites).
+    `entries` are in rank order, so the first of each cluster is its representative.
+
+    Returns (unique, to_store, report):
+      unique   -> one entry per cluster, for Agent 2
+      to_store -> `unique` minus entries that match evidence already stored for the company
+                  from another source_url (a page whose own text changed a little is stored again)
+      report   -> counts and the duplicate rate of this request
+    """
+    sigs = signatures([e['raw_text'] for e in entries])
+    within = similarity(sigs, sigs)
+    stored_urls, stored_sigs = _stored_signatures(company_name) if entries else (np.array([], dtype=object), sigs)
+    stored = similarity(sigs, stored_sigs)
+
+    unique_idx, to_store, clusters = [], [], {}
+    for i in range(len(entries)):
+        match = next((j for j in unique_idx if within[i, j] >= threshold), None)
+        if match is not None:
+            clusters.setdefault(match, []).append(entries[i]['source_url'])
+            continue
+        unique_idx.append(i)
+        if not ((stored[i] >= threshold) & (stored_urls != entries[i]['source_url'])).any():
+            to_store.append(entries[i])
+
+    unique = [entries[i] for i in unique_idx]
+    duplicates = len(entries) - len(unique)
+    report = {
+        "scraped": len(entries),
+        "unique": len(unique),
+        "duplicates": duplicates,
+        "already_stored": len(unique) - len(to_store),
+        "duplicate_rate": round(duplicates / len(entries), 3) if entries else 0.0,
+        "clusters": [
+            {"representative": entries[i]['source_url'], "duplicates": urls} for i, urls in clusters.items()
+        ],
+    }
+
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["entries"] += len(entries)
+        _stats["duplicates"] += duplicates
+        _stats["already_stored"] += report["already_stored"]
+    return unique, to_store, report
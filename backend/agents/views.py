@@ -1,20 +1,63 @@
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
-from mozilla_django_oidc.contrib.drf import OIDCAuthentication
-<<<<<<< HEAD
+from rest_framework.request import Request
+from rest_framework.parsers import JSONParser, FormParser
 from rest_framework.response import Response
-from .roc_tool import fetch_roc_data           # Agent 1 (The Collector)
-from .agent_2_validator import validate_and_extract  # Agent 2 (The Analyst)
-from .models import Company, CompanyRawData
-=======
-from django.http import StreamingHttpResponse
-from .roc_tool import fetch_roc_data           # Agent 1 (The Collector)
-from .agent_2_validator import validate_and_extract    # Agent 2 (The Analyst)
-from .models import Company, CompanyRawData
+from rest_framework import exceptions
+from mozilla_django_oidc.contrib.drf import OIDCAuthentication
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse, JsonResponse, Http404
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from .research_cache import cached_research, acached_research  # Agents 1 -> 2 -> 3, behind the result cache
+from .orchestrator import job_queue, batch as batches
+from .search.evidence_index import search_evidence
+from . import golden_record, metrics
+from .models import Company, ResearchJob, ResearchBatch
 import json
-import concurrent.futures  # 🟢 REQUIRED FOR FAST PARALLEL SEARCH
->>>>>>> final_version
+import uuid
+
+
+def _parse_research_input(data, request):
+    """
+    Returns (params, background): `params` are the cached_research() keyword arguments,
+    `background` asks for a queued job instead of an inline stream.
+    """
+    try:
+        # Fallback for manual JSON body parsing if DRF didn't parse it
+        if not data and request.body:
+             data = json.loads(request.body)
+
+        params = {
+            "company_name": data.get('company_name'),
+            "requirements": data.get('requirements'),
+            "enable_comparison": data.get('enable_comparison', False),
+            "competitor_names_str": data.get('competitor_names', ""),
+            "force_refresh": data.get('force_refresh', False),  # Skip the result cache and rerun everything
+        }
+        return params, bool(data.get('background', False))
+    except Exception as e:
+         print(f"Request Parsing Error: {e}")
+         return {"company_name": None, "requirements": None}, False
+
+
+def _job_accepted_payload(job):
+    return {
+        "job_id": str(job.pk),
+        "status": job.status,
+        "status_url": f"/api/research/jobs/{job.pk}/",
+        "events_url": f"/api/research/jobs/{job.pk}/events/",
+    }
+
+
+def _missing_inputs_response():
+    return StreamingHttpResponse(
+        iter([f"data: {json.dumps({'type': 'error', 'message': 'Missing dictionary inputs'})}\n\n"]),
+        content_type='text/event-stream'
+    )
+
 
 class CompanyResearchView(APIView):
     # Require a valid OIDC-issued session for every request.
@@ -24,225 +67,311 @@ class CompanyResearchView(APIView):
 
     def post(self, request):
         # 1. Get User Inputs
-<<<<<<< HEAD
-        company_name = request.data.get('company_name')
-        requirements = request.data.get('requirements')
-        
-        if not company_name or not requirements:
-            return Response({"error": "Missing company_name or requirements"}, status=400)
-
-        # ====================================================
-        # PHASE 1: Agent 1 (Scrape the Web - Upgraded)
-        # ====================================================
-        print(f"🔎 Agent 1: Searching for '{company_name}'...")
-        agent_1_response = fetch_roc_data(company_name, requirements)
-        
-        # If Agent 1 failed or found nothing, stop here
-        if agent_1_response.get("status") != "success":
-            return Response({
-                "status": "error", 
-                "message": "Agent 1 failed to find data.", 
-                "details": agent_1_response
-            })
-
-        # ====================================================
-        # PHASE 2: Store Evidence (The Audit Trail)
-        # ====================================================
-        # Ensure the Parent Company exists in DB
-        company_obj, _ = Company.objects.get_or_create(name=company_name)
-        
-        raw_texts_for_ai = [] # This list will be sent to Agent 2
-        
-        # Capture the list of websites for the UI (New Feature)
-        scraped_sites_list = agent_1_response.get("source_list", [])
-        raw_entries = agent_1_response.get("data", [])
-        
-        print(f"💾 Saving {len(raw_entries)} raw sources to Database...")
-        
-        for entry in raw_entries:
-            # A. Collect text for Agent 2 to read immediately
-            raw_texts_for_ai.append(entry['raw_text'])
-            
-            # B. Save to Database (Evidence Locker)
-            CompanyRawData.objects.create(
-                company=company_obj,
-                user_prompt=requirements,
-                source_domain=entry['source_domain'],
-                source_url=entry['source_url'],
-                raw_text=entry['raw_text'] # We save the full messy text
-            )
-
-        # ====================================================
-        # PHASE 3: Agent 2 (Validate & Extract)
-        # ====================================================
-        print(f"🤖 Agent 2: Analyzing text to answer '{requirements}'...")
-        
-        # Pass the list of text strings to the AI
-        final_insight = validate_and_extract(requirements, raw_texts_for_ai)
-        
+        params, background = _parse_research_input(request.data, request)
+
+        if not params["company_name"] or not params["requirements"]:
+            return _missing_inputs_response()
+
+        # 2. Background mode: hand the run to a research_worker and return the job id
+        if background:
+            job = job_queue.enqueue(request.user, **params)
+            return Response(_job_accepted_payload(job), status=202)
+
+        def event_stream():
+            with metrics.span("request"):
+                for event in cached_research(**params):
+                    yield f"data: {json.dumps(event)}\n\n"
+
+        return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+
+
+@method_decorator(csrf_exempt, name='dispatch')  # CSRF is enforced by SessionAuthentication, as in APIView
+class AsyncCompanyResearchView(View):
+    """
+    ASGI-native twin of CompanyResearchView (enabled with RESEARCH_ASYNC=True).
+    Same OIDC/session authentication and SSE event format, but the stream is an
+    async generator, so an open research stream no longer pins a worker thread.
+    """
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+
+    def _authenticate(self, request):
+        # Reuse DRF's authenticators so both views accept exactly the same credentials
+        drf_request = Request(
+            request,
+            parsers=[JSONParser(), FormParser()],
+            authenticators=[auth() for auth in self.authentication_classes],
+        )
+        try:
+            user = drf_request.user
+        except exceptions.APIException as e:
+            return None, e
+        if not (user and user.is_authenticated):
+            return None, exceptions.NotAuthenticated()
+        try:
+            data = drf_request.data
+        except exceptions.APIException:
+            data = {}
+        return data, None
+
+    async def post(self, request):
+        data, auth_error = await sync_to_async(self._authenticate)(request)
+        if auth_error is not None:
+            status = 403 if isinstance(auth_error, exceptions.PermissionDenied) else 401
+            return JsonResponse({"detail": str(auth_error.detail)}, status=status)
+
+        params, background = _parse_research_input(data, request)
+
+        if not params["company_name"] or not params["requirements"]:
+            return _missing_inputs_response()
+
+        if background:
+            job = await sync_to_async(job_queue.enqueue)(request.user, **params)
+            return JsonResponse(_job_accepted_payload(job), status=202)
+
+        async def event_stream():
+            with metrics.span("request"):
+                async for event in acached_research(**params):
+                    yield f"data: {json.dumps(event)}\n\n"
+
+        return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+
+
+def _get_own_job(request, job_id):
+    job = ResearchJob.objects.filter(pk=job_id).first()
+    if job is None or (job.owner_id is not None and job.owner_id != request.user.id):
+        raise Http404("Job not found")
+    return job
+
+
+class ResearchJobDetailView(APIView):
+    """GET /api/research/jobs/<id>/ -> status and timing of a queued research job."""
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = _get_own_job(request, job_id)
         return Response({
-            "status": "success",
-            "company": company_name,
-            "scraped_sources": scraped_sites_list, # <--- NEW: List of websites for UI
-            "total_sources": len(scraped_sites_list),
-            "final_answer": final_insight  # <--- Clean, validated JSON
+            "job_id": str(job.pk),
+            "company_name": job.company_name,
+            "status": job.status,
+            "attempts": job.attempts,
+            "error": job.error or None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "queue_seconds": (job.started_at - job.created_at).total_seconds() if job.started_at else None,
+            "duration_seconds": job.duration_seconds,
+            "result": job.result,
         })
-=======
+
+
+class ResearchJobEventsView(APIView):
+    """
+    GET /api/research/jobs/<id>/events/ -> SSE progress of a queued job.
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) and only get what they missed.
+    """
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = _get_own_job(request, job_id)
+        last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('last_event_id') or 0
         try:
-            data = request.data
-            # Fallback for manual JSON body parsing if DRF didn't parse it
-            if not data and request.body:
-                 data = json.loads(request.body)
-            
-            company_name = data.get('company_name')
-            requirements = data.get('requirements')
-            enable_comparison = data.get('enable_comparison', False)
-            competitor_names_str = data.get('competitor_names', "")
-        except Exception as e:
-             print(f"Request Parsing Error: {e}")
-             company_name = None
-
-        if not company_name or not requirements:
-            return StreamingHttpResponse(
-                iter([f"data: {json.dumps({'type': 'error', 'message': 'Missing dictionary inputs'})}\n\n"]),
-                content_type='text/event-stream'
-            )
+            last_event_id = int(last_event_id)
+        except (TypeError, ValueError):
+            last_event_id = 0
 
-        def event_stream():
+        response = StreamingHttpResponse(
+            job_queue.sse_job_events(job.pk, last_event_id), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+def _get_own_batch(request, batch_id):
+    batch = ResearchBatch.objects.filter(pk=batch_id).first()
+    if batch is None or (batch.owner_id is not None and batch.owner_id != request.user.id):
+        raise Http404("Batch not found")
+    return batch
+
+
+def _batch_urls(batch):
+    return {
+        "progress_url": f"/api/research/batch/{batch.pk}/",
+        "results_url": f"/api/research/batch/{batch.pk}/results/",
+        "pause_url": f"/api/research/batch/{batch.pk}/pause/",
+        "resume_url": f"/api/research/batch/{batch.pk}/resume/",
+    }
+
+
+class ResearchBatchView(APIView):
+    """
+    POST /api/research/batch/ -> queue a whole target list (one job per company).
+    Body: JSON {"companies": [...], "requirements": "...", ...}, JSON {"csv": "..."},
+    a text/csv body, or a multipart upload in `file`. Batch-level fields are defaults for every row.
+    """
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            if request.content_type.startswith('text/csv'):
+                defaults = request.query_params
+                rows = batches.rows_from_csv(request.body.decode('utf-8'))
+            else:
+                defaults = request.data
+                upload = request.FILES.get('file')
+                if upload is not None:
+                    rows = batches.rows_from_csv(upload.read().decode('utf-8'))
+                elif defaults.get('csv'):
+                    rows = batches.rows_from_csv(defaults['csv'])
+                else:
+                    rows = defaults.get('companies') or []
+
+            batch = batches.create_batch(request.user, rows, {
+                "requirements": defaults.get('requirements'),
+                "enable_comparison": defaults.get('enable_comparison', False),
+                "competitor_names": defaults.get('competitor_names', ""),
+                "force_refresh": defaults.get('force_refresh', False),
+            }, name=defaults.get('name') or "")
+        except (batches.BatchInputError, UnicodeDecodeError) as e:
+            return Response({"detail": str(e)}, status=400)
+
+        return Response({**batches.batch_progress(batch), **_batch_urls(batch)}, status=202)
+
+
+class ResearchBatchDetailView(APIView):
+    """GET /api/research/batch/<id>/ -> progress counts of a batch."""
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, batch_id):
+        batch = _get_own_batch(request, batch_id)
+        return Response({**batches.batch_progress(batch), **_batch_urls(batch)})
+
+
+class ResearchBatchControlView(APIView):
+    """POST /api/research/batch/<id>/pause/ or /resume/."""
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    action = None
+
+    def post(self, request, batch_id):
+        batch = batches.set_paused(_get_own_batch(request, batch_id), paused=self.action == 'pause')
+        return Response(batches.batch_progress(batch))
+
+
+class ResearchBatchResultsView(APIView):
+    """
+    GET /api/research/batch/<id>/results/ -> NDJSON, one line per company as it finishes.
+    After a reconnect, ?skip=<job_id>,<job_id>... leaves out results the client already has.
+    """
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, batch_id):
+        batch = _get_own_batch(request, batch_id)
+        skip = []
+        for value in request.query_params.get('skip', '').split(','):
             try:
-                # ====================================================
-                # PHASE 1: Agent 1 (Scrape Primary Company)
-                # ====================================================
-                agent_1_response = None
-                for event in fetch_roc_data(company_name, requirements):
-                    if event['type'] == 'log':
-                         yield f"data: {json.dumps(event)}\n\n"
-                    elif event['type'] == 'result':
-                         agent_1_response = event['payload']
-                
-                if not agent_1_response or agent_1_response.get("status") != "success":
-                    error_msg = agent_1_response.get('message', 'Agent 1 failed.') if agent_1_response else 'Agent 1 failed.'
-                    yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
-                    return
-
-                # ====================================================
-                # PHASE 2: Store Evidence
-                # ====================================================
-                yield f"data: {json.dumps({'type': 'log', 'message': 'Saving sources...'})}\n\n"
-                try:
-                    company_obj, _ = Company.objects.get_or_create(name=company_name)
-                    for entry in agent_1_response.get("data", []):
-                        CompanyRawData.objects.create(
-                            company=company_obj,
-                            user_prompt=requirements,
-                            source_domain=entry['source_domain'],
-                            source_url=entry['source_url'],
-                            raw_text=entry['raw_text']
-                        )
-                except Exception as e:
-                     yield f"data: {json.dumps({'type': 'log', 'message': f'DB Error: {str(e)}'})}\n\n"
-
-                # ====================================================
-                # PHASE 3: Agent 2 (Validate Primary Company)
-                # ====================================================
-                final_insight = None
-                raw_texts = [e['raw_text'] for e in agent_1_response.get("data", [])]
-                
-                for event in validate_and_extract(company_name, requirements, raw_texts):
-                    if event['type'] == 'log':
-                        yield f"data: {json.dumps(event)}\n\n"
-                    elif event['type'] == 'result':
-                        final_insight = event['payload']
-
-                # ====================================================
-                # 🟢 PHASE 4: OPTIMIZED PARALLEL COMPARISON
-                # ====================================================
-                comparison_result = None
-                competitors = []
-                
-                if enable_comparison:
-                    if competitor_names_str:
-                        competitors = [c.strip() for c in competitor_names_str.split(',') if c.strip()]
-                    elif final_insight and final_insight.get("extracted_data"):
-                        auto_comps = final_insight["extracted_data"].get("Competitors")
-                        if auto_comps and isinstance(auto_comps, list):
-                            competitors = auto_comps[:3]
-                            yield f"data: {json.dumps({'type': 'log', 'message': f'Auto-detected competitors: {competitors}'})}\n\n"
-
-                if enable_comparison and competitors:
-                    try:
-                        from .agent_3_comparison import compare_companies
-                        yield f"data: {json.dumps({'type': 'log', 'message': f'Agent 3: Analyzing {len(competitors)} competitors simultaneously...'})}\n\n"
-
-                        competitor_data_list = []
-                        clean_comp_query = "official corporate profile facts strengths weaknesses market position"
-
-                        # 🟢 Helper function to run inside threads
-                        def fetch_competitor_data(comp_name):
-                            full_text = ""
-                            # We iterate the generator to completion to get the final result
-                            for event in fetch_roc_data(comp_name, clean_comp_query):
-                                if event['type'] == 'result' and event['payload'].get("status") == "success":
-                                    # Grab top 2 sources only to save time/tokens
-                                    texts = [e['raw_text'] for e in event['payload'].get("data", [])[:2]]
-                                    full_text = "\n".join(texts)
-                            return {"name": comp_name, "data": full_text}
-
-                        # 🟢 ThreadPoolExecutor runs searches in PARALLEL
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                            # Submit all tasks
-                            future_to_comp = {executor.submit(fetch_competitor_data, comp): comp for comp in competitors}
-                            
-                            for future in concurrent.futures.as_completed(future_to_comp):
-                                comp_name = future_to_comp[future]
-                                try:
-                                    data = future.result()
-                                    if data["data"]:
-                                        competitor_data_list.append(data)
-                                        yield f"data: {json.dumps({'type': 'log', 'message': f'✔ Data fetched for {comp_name}'})}\n\n"
-                                    else:
-                                        yield f"data: {json.dumps({'type': 'log', 'message': f'⚠ No data found for {comp_name}'})}\n\n"
-                                except Exception as exc:
-                                    yield f"data: {json.dumps({'type': 'log', 'message': f'Error searching {comp_name}: {exc}'})}\n\n"
-
-                        if competitor_data_list:
-                             comparison_result = compare_companies(company_name, final_insight, competitor_data_list)
-                    except Exception as e:
-                        import traceback
-                        print(f"Agent 3 Error: {traceback.format_exc()}")
-                        yield f"data: {json.dumps({'type': 'log', 'message': f'Agent 3 Error: {str(e)}'})}\n\n"
-
-                # ====================================================
-                # PHASE 5: FINAL RESPONSE
-                # ====================================================
-                yield f"data: {json.dumps({'type': 'log', 'message': 'Finalizing...'})}\n\n"
-
-                sources_formatted = []
-                if agent_1_response and "data" in agent_1_response:
-                    seen_urls = set()
-                    for item in agent_1_response["data"]:
-                        if item["source_url"] not in seen_urls:
-                            sources_formatted.append({
-                                "title": item["source_domain"],
-                                "url": item["source_url"]
-                            })
-                            seen_urls.add(item["source_url"])
-
-                final_payload = {
-                    "status": "success",
-                    "company": company_name,
-                    "scraped_sources": sources_formatted, 
-                    "total_sources": len(sources_formatted),
-                    "final_answer": final_insight,
-                    "comparison": comparison_result,
-                    "logo": None # Explicitly None as requested
-                }
-                yield f"data: {json.dumps({'type': 'complete', 'payload': final_payload})}\n\n"
-            
-            except Exception as outer_e:
-                import traceback
-                print(f"CRITICAL STREAM ERROR: {traceback.format_exc()}")
-                yield f"data: {json.dumps({'type': 'error', 'message': f'Server Error: {str(outer_e)}'})}\n\n"
+                skip.append(uuid.UUID(value.strip()))
+            except ValueError:
+                continue
 
-        return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
->>>>>>> final_version
+        response = StreamingHttpResponse(
+            batches.ndjson_results(batch.pk, skip), content_type='application/x-ndjson'
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class EvidenceSearchView(APIView):
+    """
+    GET /api/evidence/search/?q=...&company=&domain=&page=&page_size= -> ranked matches
+    from every page already stored in the evidence locker, with highlighted snippets.
+    """
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Query parameter 'q' is required."}, status=400)
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = int(request.query_params.get('page_size', 20))
+        except ValueError:
+            return Response({"detail": "page and page_size must be integers."}, status=400)
+
+        return Response(search_evidence(
+            query,
+            company=request.query_params.get('company') or None,
+            domain=request.query_params.get('domain') or None,
+            page=page,
+            page_size=page_size,
+        ))
+
+
+def _not_modified(request, etag):
+    # If-None-Match may list several validators (or be "*")
+    sent = [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]
+    return etag in sent or '*' in sent
+
+
+def _with_etag(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'  # Always revalidate, 304 when unchanged
+    return response
+
+
+class CompanyListView(APIView):
+    """
+    GET /api/companies/?search=&page=&page_size= -> golden records straight from the database.
+    Sends an ETag; a matching If-None-Match gets a 304 without reading the rows.
+    """
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+    MAX_PAGE_SIZE = 500
+
+    def get(self, request):
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 100)), 1), self.MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"detail": "page and page_size must be integers."}, status=400)
+        search = request.query_params.get('search', '').strip()
+
+        companies = Company.objects.all()
+        if search:
+            companies = companies.filter(name__icontains=search)
+
+        total, newest = golden_record.list_state(companies)
+        etag = golden_record.company_etag("list", total, newest, search, page, page_size)
+        if _not_modified(request, etag):
+            return _with_etag(Response(status=304), etag)
+
+        offset = (page - 1) * page_size
+        rows = list(companies.order_by('name').values(*golden_record.COMPANY_FIELDS)[offset:offset + page_size])
+        return _with_etag(Response({
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": (total + page_size - 1) // page_size,
+            "results": rows,
+        }), etag)
+
+
+class CompanyDetailView(APIView):
+    """GET /api/companies/<id>/ -> one golden record, with ETag / If-None-Match support."""
+    authentication_classes = [OIDCAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, company_id):
+        company = Company.objects.filter(pk=company_id).values(*golden_record.COMPANY_FIELDS).first()
+        if company is None:
+            raise Http404("Company not found")
+
+        etag = golden_record.company_etag("company", company["id"], company["last_updated"])
+        if _not_modified(request, etag):
+            return _with_etag(Response(status=304), etag)
+        return _with_etag(Response(company), etag)
@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+import httpx
+from . import standins
+
+# ==============================================================================
+# 🏁 BENCHMARK: N concurrent SSE clients against /api/research/, fully offline
+# ==============================================================================
+#   cd backend
+#   python -m benchmark.run --clients 8 --requests 80 --output bench/after.json --baseline bench/before.json
+#
+# The server runs the real pipeline (Agents 1-3, caches, DB writes) in its own process
+# against a throwaway SQLite database; search, web pages and Azure are local stand-ins.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """Linear interpolation between closest ranks (numpy's default)."""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _summary(values, scale=1000.0):
+    out = {f"p{p}": round(percentile(values, p) * scale, 1) if values else None for p in PERCENTILES}
+    out["mean"] = round(sum(values) / len(values) * scale, 1) if values else None
+    out["max"] = round(max(values) * scale, 1) if values else None
+    return out
+
+
+# ------------------------------------------------------------------------------
+# Server process
+# ------------------------------------------------------------------------------
+def _peak_rss_mb(pid):
+    # VmHWM is the process's high-water mark (Linux); elsewhere fall back to the reaped-children figure
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def start_server(args, workdir, site_urls, pages, llm_url):
+    env = {
+        **os.environ,
+        # core/settings.py reads sqlite paths relative to the working directory
+        "DATABASE_URL": args.database_url or f"sqlite:///{os.path.relpath(os.path.join(workdir, 'bench.sqlite3'), BACKEND_DIR)}",
+        "DJANGO_SECRET_KEY": os.environ.get("DJANGO_SECRET_KEY", "benchmark-only-secret"),
+        "AZURE_OPENAI_ENDPOINT": llm_url,
+        "AZURE_OPENAI_API_KEY": "benchmark",
+        "AZURE_DEPLOYMENT_NAME": "benchmark",
+        "AZURE_RATE_LIMIT_STATE": os.path.join(workdir, "azure_bucket.json"),  # Not the host's real bucket
+        "SEARCH_CACHE_BACKEND": "memory",
+        "PYTHONUNBUFFERED": "1",
+    }
+    if args.cold:
+        # Every request searches, downloads and extracts again
+        env.update(PAGE_CACHE_TTL="0", SEARCH_CACHE_TTL="0")
+
+    command = [
+        sys.executable, "-m", "benchmark.server",
+        "--sites", ",".join(site_urls), "--pages", str(len(pages)), "--search-latency", str(args.search_latency),
+    ]
+    if args.asgi:
+        command.append("--asgi")
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, text=True)
+
+    line = process.stdout.readline()
+    if not line:
+        process.wait()
+        raise RuntimeError(f"Benchmark server exited during startup (code {process.returncode}).")
+    info = json.loads(line)
+    # Keep draining stdout so the server's DEBUG prints never block it on a full pipe
+    threading.Thread(target=lambda: [None for _ in process.stdout], daemon=True).start()
+    return process, info
+
+
+def stop_server(process):
+    peak = _peak_rss_mb(process.pid)
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    if peak is None:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        raw = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak = round(raw / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return peak
+
+
+# ------------------------------------------------------------------------------
+# SSE clients
+# ------------------------------------------------------------------------------
+def one_request(client, url, body):
+    """POST one research request and read the SSE stream to its end."""
+    result = {"ok": False, "ttfe": None, "e2e": None, "events": 0, "error": None, "timing": None}
+    started = time.perf_counter()
+    try:
+        with client.stream("POST", url, json=body) as response:
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+            for line in response.iter_lines():
+                if not line.startswith("data: "):
+                    continue
+                if result["ttfe"] is None:
+                    result["ttfe"] = time.perf_counter() - started
+                result["events"] += 1
+                event = json.loads(line[6:])
+                if event.get("type") == "complete":
+                    result["ok"] = True
+                    result["timing"] = (event.get("payload") or {}).get("timing")
+                elif event.get("type") == "error":
+                    result["error"] = event.get("message")
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["e2e"] = time.perf_counter() - started
+    if not result["ok"] and not result["error"]:
+        result["error"] = "Stream ended without a complete event"
+    return result
+
+
+def drive(args, info):
+    url = f"http://127.0.0.1:{info['port']}/api/research/"
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+    results = []
+    results_lock = threading.Lock()
+
+    def client_loop():
+        with httpx.Client(cookies=info["cookies"], headers=info["headers"], timeout=args.timeout) as client:
+            while True:
+                with counter_lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                body = {
+                    "company_name": f"Benchmark Company {n % args.companies}",
+                    "requirements": args.requirements,
+                    "enable_comparison": args.comparison,
+                    "force_refresh": not args.result_cache,
+                }
+                result = one_request(client, url, body)
+                with results_lock:
+                    results.append(result)
+
+    threads = [threading.Thread(target=client_loop, name=f"bench-client-{i}") for i in range(args.clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def _span_medians(results):
+    spans = {}
+    for r in results:
+        for name, span in ((r["timing"] or {}).get("spans") or {}).items():
+            spans.setdefault(name, []).append(span["total_ms"] / 1000)
+    return {name: _summary(values) for name, values in sorted(spans.items())}
+
+
+def report(args, results, wall, peak_rss):
+    ok = [r for r in results if r["ok"]]
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "clients": args.clients, "requests": args.requests, "companies": args.companies,
+            "requirements": args.requirements, "comparison": args.comparison, "cold": args.cold,
+            "result_cache": args.result_cache, "asgi": args.asgi, "sites": args.sites,
+            "corpus": args.corpus or "synthetic", "page_latency": args.page_latency,
+            "search_latency": args.search_latency, "llm_latency": args.llm_latency, "llm_tps": args.llm_tps,
+        },
+        "requests": len(results),
+        "succeeded": len(ok),
+        "errors": errors,
+        "wall_seconds": round(wall, 2),
+        "requests_per_second": round(len(ok) / wall, 3) if wall else None,
+        "e2e_ms": _summary([r["e2e"] for r in ok]),
+        "ttfe_ms": _summary([r["ttfe"] for r in results if r["ttfe"] is not None]),
+        "server_peak_rss_mb": peak_rss,
+        "spans_ms": _span_medians(ok),
+    }
+
+
+def _delta(now, before):
+    if now is None or before in (None, 0):
+        return ""
+    return f"{(now - before) / before:+.1%}"
+
+
+def print_report(result, baseline=None):
+    rows = [
+        ("requests/s", result["requests_per_second"], (baseline or {}).get("requests_per_second")),
+        ("server peak RSS (MB)", result["server_peak_rss_mb"], (baseline or {}).get("server_peak_rss_mb")),
+    ]
+    for metric in ("e2e_ms", "ttfe_ms"):
+        for p in PERCENTILES:
+            rows.append((f"{metric} p{p}", result[metric][f"p{p}"], ((baseline or {}).get(metric) or {}).get(f"p{p}")))
+
+    print(f"\n{result['succeeded']}/{result['requests']} succeeded in {result['wall_seconds']}s"
+          + (f", errors: {result['errors']}" if result["errors"] else ""))
+    print(f"{'metric':<22}{'value':>12}" + (f"{'baseline':>12}{'change':>10}" if baseline else ""))
+    for name, value, before in rows:
+        line = f"{name:<22}{value if value is not None else '-':>12}"
+        if baseline:
+            line += f"{before if before is not None else '-':>12}{_delta(value, before):>10}"
+        print(line)
+
+
+# ------------------------------------------------------------------------------
+# Corpus recording (the only online step; run once, commit the directory or keep it local)
+# ------------------------------------------------------------------------------
+def record_corpus(urls, directory):
+    os.makedirs(directory, exist_ok=True)
+    with httpx.Client(follow_redirects=True, timeout=15, headers={"User-Agent": "Mozilla/5.0"}) as client:
+        for i, url in enumerate(urls):
+            try:
+                response = client.get(url)
+                response.raise_for_status()
+            except Exception as e:
+                print(f"Skipped {url}: {e}")
+                continue
+            with open(os.path.join(directory, f"{i:04d}.html"), "wb") as f:
+                f.write(response.content)
+            print(f"Recorded {url}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of /api/research/.")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent SSE clients.")
+    parser.add_argument("--requests", type=int, default=20, help="Total research requests.")
+    parser.add_argument("--companies", type=int, default=10, help="Distinct company names to cycle through.")
+    parser.add_argument("--requirements", default="CEO, annual revenue")
+    parser.add_argument("--comparison", action="store_true", help="Enable competitor comparison (Agent 3).")
+    parser.add_argument("--cold", action="store_true", help="Disable page and search cache reuse.")
+    parser.add_argument("--result-cache", action="store_true", help="Let repeats be served from the result cache.")
+    parser.add_argument("--asgi", action="store_true", help="Serve the async pipeline with uvicorn.")
+    parser.add_argument("--database-url", help="Benchmark database (default: throwaway SQLite).")
+    parser.add_argument("--corpus", help="Directory of recorded .html pages (default: synthetic pages).")
+    parser.add_argument("--sites", type=int, default=8, help="Local ports the corpus is spread across.")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Seconds per page response.")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Seconds per search query.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds to first token.")
+    parser.add_argument("--llm-tps", type=float, default=80.0, help="Completion tokens per second.")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request client timeout.")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON result.")
+    parser.add_argument("--baseline", help="Earlier result file to compare against.")
+    parser.add_argument("--record", nargs="+", metavar="URL", help="Record these pages into --corpus and exit.")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        if not args.corpus:
+            parser.error("--record needs --corpus DIR")
+        record_corpus(args.record, args.corpus)
+        return 0
+
+    pages = standins.load_corpus(args.corpus) if args.corpus else standins.synthetic_corpus()
+    _, site_urls = standins.start_corpus_sites(
+        pages, sites=args.sites, latency=args.page_latency, revalidate=not args.cold
+    )
+    _, llm_url = standins.start_fake_openai(latency=args.llm_latency, tokens_per_second=args.llm_tps)
+
+    workdir = tempfile.mkdtemp(prefix="marketlens-bench-")
+    process = None
+    try:
+        process, info = start_server(args, workdir, site_urls, pages, llm_url)
+        print(f"Benchmark server on :{info['port']} ({'ASGI' if args.asgi else 'WSGI'}), "
+              f"{args.clients} clients x {args.requests} requests, {len(pages)} corpus pages")
+        results, wall = drive(args, info)
+        peak_rss = stop_server(process)
+        process = None
+    finally:
+        if process is not None:
+            stop_server(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = report(args, results, wall, peak_rss)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    print(f"\nResults written to {args.output}")
+    return 0 if result["succeeded"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import signal
+import string
+import argparse
+import threading
+
+# ==============================================================================
+# 🖥️ BENCHMARK SERVER: the real Django app, with DDGS swapped for the local FakeSearch
+# ==============================================================================
+# Started by benchmark.run in its own process (so its peak RSS is measured on its own).
+# The driver sets DATABASE_URL, AZURE_OPENAI_ENDPOINT etc. in the environment first;
+# once listening, this prints one JSON line: {"port", "cookies", "headers"}.
+
+
+def _bench_session():
+    """A logged-in session plus a CSRF secret, so clients can POST like the browser app does."""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model, SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.utils.crypto import get_random_string
+
+    user, _ = get_user_model().objects.get_or_create(username="benchmark")
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session["oidc_id_token_expiration"] = time.time() + 7 * 24 * 3600  # Keeps SessionRefresh quiet
+    session.create()
+
+    csrf_secret = get_random_string(32, string.ascii_letters + string.digits)
+    return (
+        {settings.SESSION_COOKIE_NAME: session.session_key, settings.CSRF_COOKIE_NAME: csrf_secret},
+        {"X-CSRFToken": csrf_secret},
+    )
+
+
+def _serve_wsgi(port, ready):
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", port), QuietHandler)
+    server.set_app(get_wsgi_application())
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    ready(server.server_address[1])
+    server.serve_forever()
+
+
+def _serve_asgi(port, ready):
+    import socket
+    import uvicorn
+    from core.asgi import application
+
+    # Bind first so the port is known before uvicorn starts (uvicorn handles SIGTERM itself)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    ready(sock.getsockname()[1])
+    uvicorn.Server(uvicorn.Config(application, log_level="warning", lifespan="off")).run(sockets=[sock])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark target server (started by benchmark.run).")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--sites", required=True, help="Comma-separated corpus site base URLs.")
+    parser.add_argument("--pages", type=int, required=True, help="Number of pages in the corpus.")
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--asgi", action="store_true", help="Serve core.asgi with uvicorn (RESEARCH_ASYNC).")
+    args = parser.parse_args(argv)
+
+    if args.asgi:
+        os.environ["RESEARCH_ASYNC"] = "True"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0, interactive=False)
+
+    from agents import roc_tool
+    from .standins import FakeSearch
+    roc_tool._ddgs_client = FakeSearch(args.sites.split(","), args.pages, latency=args.search_latency)
+
+    cookies, headers = _bench_session()
+
+    def ready(port):
+        print(json.dumps({"port": port, "cookies": cookies, "headers": headers}), flush=True)
+
+    (_serve_asgi if args.asgi else _serve_wsgi)(args.port, ready)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
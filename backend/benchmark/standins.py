@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ==============================================================================
+# 🎭 STAND-INS: local replacements for DuckDuckGo, the open web and Azure OpenAI
+# ==============================================================================
+# Nothing here touches the network beyond 127.0.0.1, so runs are repeatable and free.
+
+SYNTHETIC_PAGES = 40
+SYNTHETIC_PARAGRAPH = (
+    "{company} is a manufacturer of industrial components founded in {year}, with around {staff:,} employees "
+    "and annual revenue of roughly INR {revenue:,} crore. Its chief executive is {ceo}. The company sells to "
+    "automotive, energy and infrastructure customers across {regions} regions and lists {product} among its "
+    "core product lines. "
+)
+
+
+def _quiet(handler_cls):
+    handler_cls.log_message = lambda self, *args: None
+    return handler_cls
+
+
+def _serve(handler_cls, port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name=handler_cls.__name__).start()
+    return server
+
+
+def _sleep(mean, jitter):
+    if mean > 0:
+        time.sleep(max(random.uniform(mean * (1 - jitter), mean * (1 + jitter)), 0))
+
+
+# ------------------------------------------------------------------------------
+# Web corpus: recorded HTML pages, each site on its own port (the fetcher's per-domain limit is per host:port)
+# ------------------------------------------------------------------------------
+def synthetic_corpus(count=SYNTHETIC_PAGES):
+    """Article-like pages long enough to pass Agent 1's 300-character floor after extraction."""
+    rng = random.Random(7)
+    pages = []
+    for i in range(count):
+        body = "".join(
+            f"<p>{SYNTHETIC_PARAGRAPH.format(company=f'Company {i}', year=1950 + rng.randint(0, 70), staff=rng.randint(50, 90000), revenue=rng.randint(10, 90000), ceo=f'Executive {rng.randint(1, 999)}', regions=rng.randint(2, 40), product=f'Line {rng.randint(1, 99)}')}</p>"
+            for _ in range(rng.randint(6, 20))
+        )
+        pages.append(
+            f"<html><head><title>Profile {i}</title></head><body><article><h1>Profile {i}</h1>{body}</article></body></html>"
+        )
+    return [page.encode("utf-8") for page in pages]
+
+
+def load_corpus(directory):
+    """Every *.html / *.htm file in `directory` (see `python -m benchmark.run --record`)."""
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith((".html", ".htm")))
+    if not names:
+        raise ValueError(f"No .html files in {directory}")
+    pages = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def start_corpus_sites(pages, sites=8, latency=0.05, jitter=0.5, revalidate=True):
+    """
+    Serves the corpus as /p/<n> on `sites` local ports, after `latency` seconds (± jitter).
+    Pages carry an ETag and answer If-None-Match with 304 (unless revalidate=False),
+    like a well-behaved origin. Returns (servers, base URLs).
+    """
+    etags = ['"%s"' % hashlib.sha1(page).hexdigest()[:16] for page in pages]
+
+    @_quiet
+    class CorpusHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            _sleep(latency, jitter)
+            match = re.match(r"^/p/(\d+)", self.path)
+            if not match:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            idx = int(match.group(1)) % len(pages)
+            if revalidate and self.headers.get("If-None-Match") == etags[idx]:
+                self.send_response(304)
+                self.send_header("ETag", etags[idx])
+                self.end_headers()
+                return
+            body = pages[idx]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etags[idx])
+            self.end_headers()
+            self.wfile.write(body)
+
+    servers = [_serve(CorpusHandler) for _ in range(sites)]
+    return servers, [f"http://127.0.0.1:{s.server_address[1]}" for s in servers]
+
+
+# ------------------------------------------------------------------------------
+# Search: a DDGS-compatible object (installed inside the server process)
+# ------------------------------------------------------------------------------
+class FakeSearch:
+    """
+    Stands in for ddgs.DDGS: text() returns hits on the corpus sites, chosen deterministically
+    from the query so a repeated query gets the same hits (and can hit the search cache).
+    """
+
+    def __init__(self, site_urls, pages, latency=0.3, jitter=0.5):
+        self.site_urls = site_urls
+        self.pages = pages
+        self.latency = latency
+        self.jitter = jitter
+
+    def text(self, query, region=None, max_results=4):
+        _sleep(self.latency, self.jitter)
+        seed = int(hashlib.sha1(query.encode("utf-8")).hexdigest()[:8], 16)
+        hits = []
+        for i in range(max_results):
+            site = self.site_urls[(seed + i) % len(self.site_urls)]
+            hits.append({
+                "title": f"{query} ({i + 1})",
+                "href": f"{site}/p/{(seed // 7 + i) % self.pages}",
+                "body": query,
+            })
+        return hits
+
+
+# ------------------------------------------------------------------------------
+# Azure OpenAI: chat completions with configurable latency and output token rate
+# ------------------------------------------------------------------------------
+TARGET_RE = re.compile(r'TARGET COMPANY: "([^"]*)"')
+
+
+def _agent_2_answer(prompt):
+    match = TARGET_RE.search(prompt)
+    company = match.group(1) if match else "The company"
+    return json.dumps({
+        "answer_found": True,
+        "summary": f"{company} is an established industrial manufacturer with a diversified customer base "
+                   f"across automotive, energy and infrastructure, and a steady revenue track record.",
+        "extracted_data": {
+            "Key_Answer": "Executive 42 (Chief Executive Officer)",
+            "Competitors": ["Benchmark Rival A", "Benchmark Rival B", "Benchmark Rival C"],
+            "Details": "Figures taken from the company profile pages in the benchmark corpus.",
+        },
+        "company_profile": {
+            "cin": None, "incorporation_date": "1998-04-01", "legal_status": "Active",
+            "estimated_revenue": "INR 4,200 Cr", "employee_count": 5200, "tech_stack": ["SAP"],
+            "official_website": None,
+        },
+        "confidence_score": "High",
+    })
+
+
+def _agent_3_answer():
+    row = {"category": "Strengths", "primary": "Scale", "competitors": {"Benchmark Rival A": "Niche focus"}}
+    return json.dumps({
+        "swot_table": [row, {**row, "category": "Weaknesses"}, {**row, "category": "Opportunities"},
+                       {**row, "category": "Threats"}],
+        "market_position_summary": "The company leads on scale; rivals compete on specialisation.",
+    })
+
+
+def start_fake_openai(latency=0.5, tokens_per_second=80.0, jitter=0.2):
+    """
+    OpenAI/Azure-compatible POST .../chat/completions (streamed or not).
+    `latency` is time to first token; the answer is then written at `tokens_per_second`
+    (a token taken as ~4 characters). Returns (server, endpoint URL).
+    """
+
+    @_quiet
+    class ChatHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = (request.get("messages") or [{}])[-1].get("content", "")
+            content = _agent_3_answer() if "swot_table" in prompt else _agent_2_answer(prompt)
+            prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+            completion_tokens = max(len(content) // 4, 1)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            _sleep(latency, jitter)
+
+            if request.get("stream"):
+                self._stream(content, usage)
+            else:
+                if tokens_per_second > 0:
+                    time.sleep(completion_tokens / tokens_per_second)
+                body = json.dumps({
+                    "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": "bench",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        def _stream(self, content, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            step = 16  # ~4 tokens per chunk
+            delay = (step / 4) / tokens_per_second if tokens_per_second > 0 else 0
+            for i in range(0, len(content), step):
+                chunk = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+                         "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                if delay:
+                    time.sleep(delay)
+            final = {"id": "bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+            self.wfile.flush()
+            self.close_connection = True
+
+    server = _serve(ChatHandler)
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
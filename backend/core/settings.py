@@ -100,6 +100,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Serve /api/research/ from the async pipeline. Only enable this when running
+# under ASGI (e.g. `uvicorn core.asgi:application`); under WSGI keep it False.
+RESEARCH_ASYNC = os.environ.get('RESEARCH_ASYNC', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -141,6 +145,14 @@ DATABASES = {
     }
 }
 
+# Full-text index over the evidence locker (agents/search/evidence_index.py):
+# SQLite FTS5, Postgres tsvector + GIN, anything else falls back to substring matching.
+EVIDENCE_SEARCH_BACKEND = {
+    'sqlite': 'fts5',
+    'postgresql': 'tsvector',
+    'postgres': 'tsvector',
+}.get(_db_scheme, 'basic')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path , include
 from django.http import JsonResponse
+from agents.metrics import metrics_view
 
 def healthz(request):
     return JsonResponse({"status": "ok"})
@@ -30,6 +31,7 @@ urlpatterns = [
     # This connects your 'agents' app URLs to the main project
     path('api/', include('agents.urls')),
     path('healthz', healthz, name='healthz'),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target (per worker process)
     # OIDC login / callback / logout endpoints provided by mozilla-django-oidc
     # Handles:  /oidc/authenticate/  /oidc/callback/  /oidc/logout/
     path('oidc/', include('mozilla_django_oidc.urls')),